@@ -0,0 +1,373 @@
+import re
+from collections import Counter
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+import utils
+
+# Phrases counted per author at upload, to find who shares the most media (see data_analysis.display_media_person)
+MEDIA_PHRASES = (
+    ["image/gif", "audio/aac", "video/mp4"]
+    + utils.ANDROID_MEDIA_OMITTED
+    + list(utils.GIF_OMITTED_LANG.values())
+    + list(utils.AUDIO_OMITTED_LANG.values())
+)
+
+LINK_REGEX = re.compile(r"https?://(?:[-\w.]|(?:%[\da-fA-F]{2}))+")
+
+HOURS_PER_DAY = 24
+
+
+class ChatCube:
+    """Message counts per (day, hour, author), along with per (year, author) link, media and emoji counters.
+    Year, month, day of month and weekday are looked up per day, so the cube holds every (year, month, day,
+    weekday, hour, author) count without storing the impossible combinations. Charts and headline numbers
+    are slices of it: selecting a year is a view, not a recompute.
+
+    Who answers whom is kept as counts of consecutive (sender, next author) messages, per year and for the
+    whole selection, along with the position of the first message of every author in each year. Everything
+    is indexed by author, so merging authors (see ``relabel``) never reads the messages again.
+    """
+
+    def __init__(
+        self,
+        days,
+        counts,
+        authors,
+        years,
+        media,
+        links,
+        emojis,
+        responders,
+        chat_responders,
+        first_message,
+    ):
+        self.days = days
+        self.counts = counts
+        self.authors = authors
+        self.years = years
+        self.media = media
+        self.links = links
+        self.emojis = emojis
+        self.responders = responders
+        self.chat_responders = chat_responders
+        self.first_message = first_message
+
+        day_years = days.astype("datetime64[Y]")
+        day_months = days.astype("datetime64[M]")
+        self.day_year = day_years.astype(int) + 1970
+        self.day_month = day_months.astype(int) % 12
+        self.day_of_month = (days - day_months).astype(int) + 1
+        # 1970-01-01 was a Thursday
+        self.day_weekday = (days.astype(int) + 3) % 7
+
+    @property
+    def nbytes(self):
+        return (
+            self.counts.nbytes
+            + self.media.nbytes
+            + self.responders.nbytes
+            + self.chat_responders.nbytes
+            + self.first_message.nbytes
+        )
+
+    @property
+    def total(self):
+        return int(self.counts.sum())
+
+    def select(self, year=None):
+        """Restrict the cube to a year.
+        Args:
+            year (int): Year to keep. None (or "All years") keeps every year.
+        Returns:
+            ChatCube: Cube sharing its counts with this one.
+        """
+        if year is None or year == "All years":
+            return self
+        year = int(year)
+        start, end = np.searchsorted(self.day_year, [year, year + 1])
+        year_idx = self.years.index(year) if year in self.years else None
+        return ChatCube(
+            self.days[start:end],
+            self.counts[start:end],
+            self.authors,
+            [year] if year_idx is not None else [],
+            self.media[year_idx : year_idx + 1] if year_idx is not None else self.media[:0],
+            self.links[year_idx : year_idx + 1] if year_idx is not None else [],
+            self.emojis[year_idx : year_idx + 1] if year_idx is not None else [],
+            self.responders[year_idx : year_idx + 1] if year_idx is not None else self.responders[:0],
+            self.responders[year_idx] if year_idx is not None else np.zeros_like(self.chat_responders),
+            self.first_message[year_idx : year_idx + 1] if year_idx is not None else self.first_message[:0],
+        )
+
+    def relabel(self, names):
+        """Rename authors, merging the ones given the same name (e.g. a phone number and its owner).
+        Only the author axis is touched: the counts of the merged authors are added up, author by author.
+        Args:
+            names (dict): New name of the authors to rename.
+        Returns:
+            ChatCube: Relabelled cube. Without any author merged, it shares the counts of this cube.
+        """
+        if not names:
+            return self
+        new_authors = list(dict.fromkeys(names.get(author, author) for author in self.authors))
+        if len(new_authors) == len(self.authors):
+            return ChatCube(
+                self.days,
+                self.counts,
+                new_authors,
+                self.years,
+                self.media,
+                self.links,
+                self.emojis,
+                self.responders,
+                self.chat_responders,
+                self.first_message,
+            )
+        targets = np.array([new_authors.index(names.get(author, author)) for author in self.authors])
+
+        def merge(counters):
+            # Counters are never updated in place: the authors not merged with another one keep theirs
+            merged = [None] * len(new_authors)
+            for target, counter in zip(targets, counters):
+                merged[target] = counter if merged[target] is None else merged[target] + counter
+            return merged
+
+        return ChatCube(
+            self.days,
+            _merge_authors(self.counts, targets, axis=2),
+            new_authors,
+            self.years,
+            _merge_authors(self.media, targets, axis=1),
+            [merge(counters) for counters in self.links],
+            [merge(counters) for counters in self.emojis],
+            _merge_authors(_merge_authors(self.responders, targets, axis=1), targets, axis=2),
+            _merge_authors(_merge_authors(self.chat_responders, targets, axis=0), targets, axis=1),
+            _merge_authors(self.first_message, targets, axis=1, ufunc=np.minimum),
+        )
+
+    def author_counts(self):
+        """Number of messages per author.
+        Returns:
+            tuple: Authors with at least one message (in order of first message) and their message counts.
+        """
+        per_author = self.counts.sum(axis=(0, 1))
+        present = np.flatnonzero(per_author)
+        return [self.authors[i] for i in present], per_author[present]
+
+    def present_author_codes(self):
+        """Codes (positions in ``authors``) of the authors with at least one message, in order of first message."""
+        return np.flatnonzero(self.counts.any(axis=(0, 1)))
+
+    def present_authors(self):
+        return [self.authors[i] for i in self.present_author_codes()]
+
+    def frequency(self, column):
+        """Number of messages per value of a calendar column and per author.
+        Args:
+            column (str): "year", "month", "weekday" or "hour_of_day".
+        Returns:
+            tuple: Values of the column (in calendar order) and counts, of shape (number of values, number of authors).
+        """
+        labels = {
+            "year": self.years,
+            "month": utils.MONTHS,
+            "weekday": utils.WEEKDAYS,
+            "hour_of_day": utils.HOURS,
+        }
+        if column not in labels:
+            raise ValueError(f"No {column} column in the cube")
+        return labels[column], self.calendar_counts[column]
+
+    @cached_property
+    def calendar_counts(self):
+        """Number of messages per value of every calendar column and per author, computed together from one
+        reduction of the cube over hours and one over days, and kept for the charts of the same selection.
+        Returns:
+            dict: Counts of shape (number of values, number of authors), by column (see ``frequency``).
+        """
+        n_authors = len(self.authors)
+        per_day = self.counts.sum(axis=1)
+        per_hour = self.counts.sum(axis=0)
+        years = np.zeros((len(self.years), n_authors), dtype=per_day.dtype)
+        months = np.zeros((len(utils.MONTHS), n_authors), dtype=per_day.dtype)
+        weekdays = np.zeros((len(utils.WEEKDAYS), n_authors), dtype=per_day.dtype)
+
+        # A cube without a year has no message (e.g. a year selected out of the chat's range)
+        if len(per_day) and len(self.years):
+            # Days are consecutive: every month of every year is a run of days, and weekdays repeat every 7 days
+            month_starts = np.flatnonzero(np.diff(self.day_month, prepend=-1))
+            per_month = np.add.reduceat(per_day, month_starts, axis=0)
+            np.add.at(years, np.searchsorted(self.years, self.day_year[month_starts]), per_month)
+            np.add.at(months, self.day_month[month_starts], per_month)
+            for weekday in range(len(utils.WEEKDAYS)):
+                weekdays[weekday] = per_day[(weekday - self.day_weekday[0]) % 7 :: 7].sum(axis=0)
+        return {"year": years, "month": months, "weekday": weekdays, "hour_of_day": per_hour}
+
+    def busiest_day(self):
+        """Day with the most messages.
+        Returns:
+            list: (day of month, month name, year) of the day, and its number of messages. Ties go to the
+                  earliest day of the month, then month, then year.
+        """
+        per_day = self.counts.sum(axis=(1, 2))
+        busiest = np.flatnonzero(per_day == per_day.max())
+        busiest = busiest[
+            np.lexsort(
+                (
+                    self.day_year[busiest],
+                    self.day_month[busiest],
+                    self.day_of_month[busiest],
+                )
+            )[0]
+        ]
+        date = (
+            int(self.day_of_month[busiest]),
+            utils.MONTHS[self.day_month[busiest]],
+            int(self.day_year[busiest]),
+        )
+        return [date, int(per_day[busiest])]
+
+    def media_counts(self, phrase):
+        """Number of occurrences of a media phrase (see MEDIA_PHRASES) per author."""
+        return self.media[:, :, MEDIA_PHRASES.index(phrase)].sum(axis=0)
+
+    def author_links(self):
+        """Counter of the websites shared by each author."""
+        return _sum_counters(self.links, len(self.authors))
+
+    def author_emojis(self):
+        """Counter of the emojis sent by each author."""
+        return _sum_counters(self.emojis, len(self.authors))
+
+    def responder_counts(self):
+        """Number of times each author was the first to answer each other author.
+        Returns:
+            tuple: Authors with at least one message (in order of first message) and the counts, of shape
+                   (sender, responder).
+        """
+        first_message = self.first_message.min(axis=0, initial=np.iinfo(self.first_message.dtype).max)
+        present = np.flatnonzero(first_message < np.iinfo(self.first_message.dtype).max)
+        present = present[np.argsort(first_message[present], kind="stable")]
+        counts = self.chat_responders[np.ix_(present, present)].astype(float)
+        # An author answering themselves (or a merged alias) is not a response
+        np.fill_diagonal(counts, 0)
+        return [self.authors[i] for i in present], counts
+
+
+def build_cube(chat_df):
+    """Aggregate a chat in a single pass.
+    Args:
+        chat_df (pd.DataFrame): Parsed chat, with "datetime", "author" and "body" columns.
+    Returns:
+        ChatCube: Counts of the chat.
+    """
+    dates = chat_df["datetime"].to_numpy(dtype="datetime64[ns]")
+    message_days = dates.astype("datetime64[D]")
+    first_day = message_days.min()
+    day_idx = (message_days - first_day).astype(np.int64)
+    hours = ((dates - message_days) // np.timedelta64(1, "h")).astype(np.int64)
+    # The author column is categorical, so this only renumbers its codes by first message
+    author_codes, authors = pd.factorize(chat_df["author"])
+    authors = list(authors)
+
+    n_days, n_authors = int(day_idx.max()) + 1, len(authors)
+    counts = np.bincount(
+        (day_idx * HOURS_PER_DAY + hours) * n_authors + author_codes,
+        minlength=n_days * HOURS_PER_DAY * n_authors,
+    )
+    counts = counts.reshape(n_days, HOURS_PER_DAY, n_authors).astype(np.int32)
+    days = first_day + np.arange(n_days)
+
+    message_years = message_days.astype("datetime64[Y]").astype(int) + 1970
+    years = sorted(int(year) for year in np.unique(message_years))
+
+    # Imported here, as it is only needed when a chat is uploaded
+    import emoji
+
+    # Text counters, one joined text per (year, author)
+    media = np.zeros((len(years), n_authors, len(MEDIA_PHRASES)), dtype=np.int64)
+    links = [[Counter() for _ in authors] for _ in years]
+    emojis = [[Counter() for _ in authors] for _ in years]
+
+    groups = np.searchsorted(years, message_years) * n_authors + author_codes
+    order = np.argsort(groups, kind="stable")
+    bodies = chat_df["body"].to_numpy(dtype=object)[order]
+    sorted_groups = groups[order]
+    bounds = np.flatnonzero(np.diff(sorted_groups)) + 1
+    for start, end in zip(np.r_[0, bounds], np.r_[bounds, len(order)]):
+        year_idx, author = divmod(int(sorted_groups[start]), n_authors)
+        text = " ".join(str(msg) for msg in bodies[start:end])
+        media[year_idx, author] = [len(re.findall(phrase, text)) for phrase in MEDIA_PHRASES]
+        links[year_idx][author] = Counter(LINK_REGEX.findall(text))
+        emojis[year_idx][author] = Counter(
+            {char: n for char, n in Counter(text).items() if emoji.is_emoji(char)}
+        )
+
+    # Consecutive (sender, next author) messages of the whole chat and of every year, in the chat's order
+    year_codes = np.searchsorted(years, message_years)
+    chat_responders = _count_pairs(author_codes, n_authors)
+    by_year = np.argsort(year_codes, kind="stable")
+    responders = _count_pairs(author_codes[by_year], n_authors, year_codes[by_year], len(years))
+
+    first_message = np.full(len(years) * n_authors, np.iinfo(np.int64).max)
+    seen, first_seen = np.unique(year_codes * n_authors + author_codes, return_index=True)
+    first_message[seen] = first_seen
+    first_message = first_message.reshape(len(years), n_authors)
+
+    return ChatCube(
+        days,
+        counts,
+        authors,
+        years,
+        media,
+        links,
+        emojis,
+        responders,
+        chat_responders,
+        first_message,
+    )
+
+
+def _count_pairs(author_codes, n_authors, group_codes=None, n_groups=None):
+    """Counts of consecutive (author, next author) messages, from one bincount over the index of every pair.
+    Args:
+        author_codes (np.ndarray): Author of every message.
+        n_authors (int): Number of authors.
+        group_codes (np.ndarray): Group (e.g. year) of every message, sorted. Only the pairs of messages of the
+            same group are then counted, group by group.
+        n_groups (int): Number of groups.
+    Returns:
+        np.ndarray: Counts of shape (author, next author), or (group, author, next author) with group_codes.
+    """
+    pairs = author_codes[:-1] * n_authors + author_codes[1:]
+    if group_codes is None:
+        return np.bincount(pairs, minlength=n_authors**2).reshape(n_authors, n_authors).astype(np.int32)
+
+    same_group = group_codes[:-1] == group_codes[1:]
+    pairs = group_codes[:-1][same_group] * n_authors**2 + pairs[same_group]
+    counts = np.bincount(pairs, minlength=n_groups * n_authors**2)
+    return counts.reshape(n_groups, n_authors, n_authors).astype(np.int32)
+
+
+def _merge_authors(values, targets, axis, ufunc=np.add):
+    """Merge the authors of values along axis, combining the ones with the same target with ufunc.
+    Only the authors merged into another one are read twice, so renaming costs one copy of values.
+    """
+    firsts = np.unique(targets, return_index=True)[1]
+    merged = np.take(values, firsts, axis=axis)
+    index = [slice(None)] * values.ndim
+    for author in np.setdiff1d(np.arange(len(targets)), firsts):
+        index[axis] = targets[author]
+        ufunc(merged[tuple(index)], np.take(values, author, axis=axis), out=merged[tuple(index)])
+    return merged
+
+
+def _sum_counters(counters_per_year, n_authors):
+    summed = [Counter() for _ in range(n_authors)]
+    for counters in counters_per_year:
+        for author, counter in enumerate(counters):
+            summed[author].update(counter)
+    return summed
@@ -0,0 +1,254 @@
+import os
+import threading
+from collections import OrderedDict
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+import aggregates
+import data_cleaning
+import dataset_store
+
+# Number of (dataset, year, phone aliases) selections whose derived results are kept in memory
+CONTEXT_CACHE_SIZE = 16
+
+# Memory (in bytes) the aggregates derived for those selections may take, before the least recently used are dropped
+CONTEXT_CACHE_BYTES = int(os.getenv("CONTEXT_CACHE_BYTES", str(64 * 1024 * 1024)))
+
+
+class AnalysisContext:
+    """What the callbacks derive from a chat for a (dataset, year or date range, phone aliases) selection.
+    Every result is computed on first use and shared by the callbacks of the same interaction. The context of a
+    year reads the aggregates from the context of every year, so the aliases are applied once for all years.
+    The aliases only rename authors in the aggregates: the messages of a selection are read from the context
+    without aliases, so changing an alias never filters or rewrites them again.
+
+    The chat and its aggregates are fetched from the dataset store once, when the context is created, and
+    shared with it: the context only adds the aggregates it derives (see ``nbytes``) while the store keeps the
+    chat in memory.
+    """
+
+    def __init__(
+        self, key, chat_df, cube, input_source, year, aliases, date_range=None
+    ):
+        self.key = key
+        self._chat_df = chat_df
+        self._stored_cube = cube
+        self.input_source = input_source
+        self.year = year
+        self.aliases = aliases
+        self.date_range = date_range
+
+    @property
+    def selection(self):
+        """Dataset key, year (or date range) and phone aliases identifying the context (and what is derived
+        from it)."""
+        period = self.date_range if self.date_range is not None else self.year
+        return self.key, period, tuple(sorted(self.aliases.items()))
+
+    @cached_property
+    def period(self):
+        """Label of the selected period: the year, "1 Mar 2021 - 30 Mar 2021" for a date range, None for the
+        whole chat."""
+        if self.date_range is None:
+            return self.year
+        times = self.chat_df["datetime"]
+        start, end = self.date_range
+        start = pd.Timestamp(start) if start is not None else times.iloc[0]
+        end = pd.Timestamp(end) if end is not None else times.iloc[-1]
+        return f"{start.day} {start:%b %Y} - {end.day} {end:%b %Y}"
+
+    @property
+    def chat_df(self):
+        """Whole chat (every year). Authors are not aliased, see ``aliases``."""
+        # Shallow copy: columns added or replaced by a callback do not reach the shared frame
+        return self._chat_df.copy(deep=False)
+
+    @property
+    def data(self):
+        """Messages of the selected year or date range (the whole chat if none is selected), indexed from 0.
+        The chat is sorted by time, so this is a slice of it (found with a binary search) sharing its memory.
+        Authors are not aliased, see ``aliases``."""
+        chat_df = self.chat_df
+        if self.year is None and self.date_range is None:
+            return chat_df
+
+        if self.date_range is not None:
+            start, end = self.date_range
+            start = np.datetime64(start) if start is not None else None
+            end = (
+                np.datetime64(end) + np.timedelta64(1, "D") if end is not None else None
+            )
+        else:
+            start, end = np.datetime64(f"{self.year}"), np.datetime64(
+                f"{self.year + 1}"
+            )
+
+        times = chat_df["datetime"].to_numpy()
+        first = np.searchsorted(times, start) if start is not None else 0
+        last = np.searchsorted(times, end) if end is not None else len(times)
+        data = chat_df.iloc[first:last]
+        data.index = pd.RangeIndex(len(data))
+        return data
+
+    @property
+    def full_cube(self):
+        """Aggregates of every year, with the phone aliases applied."""
+        all_years = self._all_years()
+        if all_years is not None:
+            return all_years.full_cube
+        if not self.aliases:
+            return self._stored_cube
+        return self._relabelled_cube
+
+    @cached_property
+    def _relabelled_cube(self):
+        return self._stored_cube.relabel(self.aliases)
+
+    @property
+    def cube(self):
+        """Aggregates of the selected year or date range, with the phone aliases applied. None if no message
+        was sent in the date range."""
+        if self.year is None and self.date_range is None:
+            return self.full_cube
+        return self._period_cube
+
+    @cached_property
+    def _period_cube(self):
+        if self.date_range is None:
+            return self.full_cube.select(self.year)
+        unaliased = self._unaliased()
+        if unaliased is not None:
+            cube = unaliased.cube
+        elif len(self.data) == 0:
+            return None
+        else:
+            # A date range does not follow the years the text counters are kept by: its messages are counted
+            cube = aggregates.build_cube(self.data)
+        return cube.relabel(self.aliases) if cube is not None else None
+
+    @cached_property
+    def users(self):
+        """Author names and phone numbers of the whole chat, before applying the aliases."""
+        return data_cleaning.split_phone_numbers(self._stored_cube.authors)
+
+    @property
+    def nbytes(self):
+        """Memory kept by the context: the aggregates derived for it, and the chat and its aggregates once the
+        dataset store no longer keeps them in memory. Cubes that are views (e.g. of a year) count the whole
+        array they keep alive.
+        """
+        stored = self._stored_cube
+        kept = {}
+        if not dataset_store.STORE.keeps(self.key, stored):
+            kept[id(self._chat_df)] = self._stored_nbytes
+        shared = {id(array) for array in _cube_arrays(stored)}
+        for name in ("_relabelled_cube", "_period_cube"):
+            cube = self.__dict__.get(name)
+            if cube is None or cube is stored:
+                continue
+            for array in _cube_arrays(cube):
+                base = array.base if isinstance(array.base, np.ndarray) else array
+                if id(base) not in shared:
+                    kept[id(base)] = base.nbytes
+        return sum(kept.values())
+
+    @cached_property
+    def _stored_nbytes(self):
+        chat_nbytes = self._chat_df.memory_usage(index=True, deep=True).sum()
+        return int(chat_nbytes) + self._stored_cube.nbytes
+
+    def _all_years(self):
+        """Context of every year with the same aliases, None if this is the one."""
+        if self.year is None and self.date_range is None:
+            return None
+        return _cached_context(self.key, None, self.aliases, None)
+
+    def _unaliased(self):
+        """Context of the same period without aliases, None if this is the one."""
+        if not self.aliases:
+            return None
+        return _cached_context(self.key, self.year, {}, self.date_range)
+
+
+def _cube_arrays(cube):
+    return (
+        cube.counts,
+        cube.media,
+        cube.responders,
+        cube.chat_responders,
+        cube.first_message,
+    )
+
+
+_contexts = OrderedDict()
+_contexts_lock = threading.Lock()
+
+
+def get_context(key, year=None, phone_dps=None, date_range=None):
+    """Get the analysis context of a selection, shared with the other callbacks of the interaction.
+    Args:
+        key (str): Key of the chat in the dataset store.
+        year (int): Selected year, None (or "All years") for every year.
+        phone_dps (list): Values of the phone number dropdowns.
+        date_range (tuple): First and last days ("YYYY-MM-DD", None for no bound) of the selected period. It
+            replaces the year when set.
+    Returns:
+        AnalysisContext: Context of the selection. None if the chat is not (or no longer) stored.
+    """
+    if date_range is not None:
+        date_range = tuple(day[:10] if day else None for day in date_range)
+        date_range = date_range if any(date_range) else None
+    year = None if year == "All years" or date_range is not None else year
+
+    try:
+        aliases = {}
+        if phone_dps:
+            # The authors are read from the context of the whole chat, which derives nothing on its own
+            authors = _cached_context(key, None, {}, None).full_cube.authors
+            aliases = data_cleaning.get_phone_aliases(authors, phone_dps)
+        return _cached_context(key, year, aliases, date_range)
+    except LookupError:
+        return None
+
+
+def _cached_context(key, year, aliases, date_range):
+    """Context of a selection from the cache, created (evicting the least recently used ones if over
+    CONTEXT_CACHE_SIZE or CONTEXT_CACHE_BYTES) if not there.
+    Raises:
+        LookupError: The context is not cached and the chat is not (or no longer) stored.
+    """
+    period = date_range if date_range is not None else year
+    selection = (key, period, tuple(sorted(aliases.items())))
+
+    with _contexts_lock:
+        context = _contexts.get(selection)
+        if context is not None:
+            _contexts.move_to_end(selection)
+            return context
+
+    chat_df, cube, input_source = dataset_store.STORE.get(key)
+    if chat_df is None:
+        raise LookupError(f"Dataset {key[:12]} is no longer stored")
+    context = AnalysisContext(
+        key, chat_df, cube, input_source, year, aliases, date_range
+    )
+
+    with _contexts_lock:
+        # Created meanwhile by another thread: that one is shared
+        context = _contexts.setdefault(selection, context)
+        _contexts.move_to_end(selection)
+        # Aggregates are derived after their context is cached, so the memory is checked as new ones come in
+        nbytes = sum(cached.nbytes for cached in _contexts.values())
+        while len(_contexts) > 1 and (
+            len(_contexts) > CONTEXT_CACHE_SIZE or nbytes > CONTEXT_CACHE_BYTES
+        ):
+            nbytes -= _contexts.popitem(last=False)[1].nbytes
+    return context
+
+
+def clear():
+    """Forget every context (e.g. to measure the cost of an interaction from scratch)."""
+    with _contexts_lock:
+        _contexts.clear()
@@ -1,20 +1,26 @@
 import os
+import logging
 import dash
 from dash import dcc
 from dash import html
-from dash.dependencies import Input, Output, State, ALL
+from dash.dependencies import Input, Output, State, ALL, ClientsideFunction
 
 import json
-import time
 import base64
-import pathlib
-import pandas as pd
-from datetime import datetime
+import functools
+from datetime import date, datetime, timedelta
 
+import jobs
+import demo
 import utils
+import progress
+import aggregates
+import figure_cache
 import data_cleaning
 import data_analysis
 import display_helpers
+import dataset_store
+import analysis_context
 
 from dotenv import load_dotenv
 
@@ -30,12 +36,63 @@ app.title = "ChatDash"
 server = app.server
 app.config.suppress_callback_exceptions = True
 
-# Path
-BASE_PATH = pathlib.Path(__file__).parent.resolve()
-DATA_PATH = BASE_PATH.joinpath("data").resolve()
+# Draw the chatting patterns in the browser (assets/usage_charts.js), from counts sent once per upload and phone
+# aliases, so that changing the year only reaches the server for the other sections. 0 draws them on the server.
+CLIENTSIDE_CHARTS = os.getenv("CLIENTSIDE_CHARTS", "1") != "0"
+
+
+def get_context(
+    store_data, years=None, phone_dps=None, start_dates=None, end_dates=None
+):
+    """Get the analysis context of the uploaded chat referenced by the "original-df" store.
+    Args:
+        store_data (str): Content of the "original-df" store (the key of the chat in the dataset store).
+        years (list): Values of the year dropdown.
+        phone_dps (list): Values of the phone number dropdowns.
+        start_dates (list): Start dates of the date range picker.
+        end_dates (list): End dates of the date range picker.
+    Returns:
+        analysis_context.AnalysisContext: Context shared by the callbacks of the interaction. None if the upload
+                                          failed or the chat is no longer stored.
+    """
+    key = json.loads(store_data)["dataset"]
+    if key == "FAIL":
+        return None
+    date_range = (start_dates[0], end_dates[0]) if start_dates else None
+    return analysis_context.get_context(
+        key, years[0] if years else None, phone_dps, date_range
+    )
+
+
+def cached_section(context, section, build, aliased=True):
+    """Children of a section for the selection of context, only built if they are not in the figure cache.
+    Sections not showing authors (aliased=False) are shared by every phone alias mapping.
+    """
+    selection = context.selection if aliased else context.selection[:2] + ((),)
+    return figure_cache.CACHE.get(selection, section, build)
+
+
+def report_progress(store_data, stage):
+    """Mark a stage (see progress.PIPELINE_STAGES) of the analysis of the upload behind store_data as done."""
+    progress.done(json.loads(store_data).get("upload"), stage)
+
+
+def reports_failure(callback):
+    """Mark the analysis of the upload as failed when callback (taking the "original-df" store first) raises,
+    so that the progress bar stops instead of waiting for a stage that will never be done.
+    """
+
+    @functools.wraps(callback)
+    def wrapper(store_data, *args):
+        try:
+            return callback(store_data, *args)
+        except Exception:
+            if store_data is not None:
+                report_progress(store_data, progress.FAILED)
+            raise
+
+    return wrapper
 
-# demo data
-default_df = pd.read_csv(DATA_PATH.joinpath("random_generator_v3.txt"), parse_dates=[0])
 
 app.index_string = """<!DOCTYPE html>
 <html>
@@ -66,191 +123,197 @@ app.index_string = """<!DOCTYPE html>
 
 
 # main app
-app.layout = html.Div(
-    id="app-container",
-    children=[
-        html.Div(
-            id="left-column",
-            className="four columns",
-            children=[
-                display_helpers.description_card(),
-                display_helpers.generate_control_card(),
-                display_helpers.get_faq(),
-            ]
-            + [
-                html.Div(
-                    ["initial child"], id="output-clientside", style={"display": "none"}
-                )
-            ],
-        ),
-        # Right column
-        html.Div(
-            id="right-column",
-            className="eight columns",
-            children=[
-                html.H6("Total Number of Messages", id="msg_header", style={}),
-                html.Hr(id="msg_hr", style={}),
-                # Overall number of messages
-                dcc.Loading(
-                    id="loading-input-1",
-                    children=[
-                        html.Div(id="loading-output-1"),
-                        html.Div(
-                            id="group-volume-data",
-                            children=display_helpers.initialise_table(default_df),
-                        ),
-                        html.Div(
-                            id="unique_days",
-                            children=display_helpers.get_busiest_day(
-                                default_df, "All years"
+def serve_layout():
+    # Sections show the demo chat until a chat is uploaded
+    snapshot = demo.get_snapshot()
+    return html.Div(
+        id="app-container",
+        children=[
+            html.Div(
+                id="left-column",
+                className="four columns",
+                children=[
+                    display_helpers.description_card(),
+                    display_helpers.generate_control_card(),
+                    display_helpers.get_faq(),
+                ]
+                + [
+                    html.Div(
+                        ["initial child"],
+                        id="output-clientside",
+                        style={"display": "none"},
+                    )
+                ],
+            ),
+            # Right column
+            html.Div(
+                id="right-column",
+                className="eight columns",
+                children=[
+                    html.H6("Total Number of Messages", id="msg_header", style={}),
+                    html.Hr(id="msg_hr", style={}),
+                    # Overall number of messages
+                    dcc.Loading(
+                        id="loading-input-1",
+                        children=[
+                            html.Div(
+                                id="group-volume-data",
+                                children=snapshot["group-volume-data"],
                             ),
-                        ),
-                    ],
-                    type="default",
-                ),
-                html.Br(),
-                html.H6("Chatting Patterns", id="chatting_patterns_header", style={}),
-                html.Hr(id="chatting_patterns_hr", style={}),
-                dcc.Loading(
-                    id="loading-input-2",
-                    children=[
-                        html.Div(id="loading-output-2"),
-                        html.Div(
-                            id="chatting",
-                            children=[
-                                html.Div(
-                                    id="chatting-patterns",
-                                    children=display_helpers.initialise_chatting(
-                                        default_df
+                            html.Div(
+                                id="unique_days",
+                                children=snapshot["unique_days"],
+                            ),
+                        ],
+                        type="default",
+                    ),
+                    html.Br(),
+                    html.H6(
+                        "Chatting Patterns", id="chatting_patterns_header", style={}
+                    ),
+                    html.Hr(id="chatting_patterns_hr", style={}),
+                    dcc.Loading(
+                        id="loading-input-2",
+                        children=[
+                            html.Div(
+                                id="chatting",
+                                children=[
+                                    html.Div(
+                                        id="chatting-patterns",
+                                        children=snapshot["chatting-patterns"],
                                     ),
-                                ),
-                            ],
-                        ),
-                    ],
-                    type="default",
-                ),
-                html.H6("First Responder", id="responder_header", style={}),
-                html.Hr(id="responder_hr", style={}),
-                html.P(
-                    "This heatmap shows what percentage of the sender's messages was first replied by each of the group members.",
-                    id="responder_phrase",
-                    style={},
-                ),
-                dcc.Loading(
-                    id="loading-input-8",
-                    children=[
-                        html.Div(id="loading-output-8"),
-                        html.Div(
-                            id="responders",
-                            children=[
-                                html.Div(
-                                    id="responding-patterns",
-                                    children=display_helpers.initialise_responder(
-                                        default_df
+                                ],
+                            ),
+                        ],
+                        type="default",
+                    ),
+                    dcc.Store(id="usage-payload"),
+                    html.H6("First Responder", id="responder_header", style={}),
+                    html.Hr(id="responder_hr", style={}),
+                    html.P(
+                        "This heatmap shows what percentage of the sender's messages was first replied by each of the group members.",
+                        id="responder_phrase",
+                        style={},
+                    ),
+                    dcc.Loading(
+                        id="loading-input-8",
+                        children=[
+                            html.Div(
+                                id="responders",
+                                children=[
+                                    html.Div(
+                                        id="responding-patterns",
+                                        children=snapshot["responding-patterns"],
+                                    )
+                                ],
+                            ),
+                        ],
+                        type="default",
+                    ),
+                    html.H6("Favourite Emojis", id="emoji_header", style={}),
+                    html.Hr(id="emoji_hr", style={}),
+                    dcc.Loading(
+                        id="loading-input-3",
+                        children=[
+                            html.Div(
+                                id="emojis",
+                                children=[
+                                    html.Div(
+                                        id="emoji-patterns",
+                                        children=snapshot["emoji-patterns"],
+                                    )
+                                ],
+                            ),
+                        ],
+                        type="default",
+                    ),
+                    html.H6("Media Sharing", id="media_header", style={}),
+                    html.Hr(id="media_hr", style={}),
+                    dcc.Loading(
+                        id="loading-input-4",
+                        children=[
+                            html.Div(
+                                id="spams",
+                                children=[
+                                    html.Div(
+                                        id="media-patterns",
+                                        children=snapshot["media-patterns"],
                                     ),
-                                )
-                            ],
-                        ),
-                    ],
-                    type="default",
-                ),
-                html.H6("Favourite Emojis", id="emoji_header", style={}),
-                html.Hr(id="emoji_hr", style={}),
-                dcc.Loading(
-                    id="loading-input-3",
-                    children=[
-                        html.Div(id="loading-output-3"),
-                        html.Div(
-                            id="emojis",
-                            children=[
-                                html.Div(
-                                    id="emoji-patterns",
-                                    children=display_helpers.initialise_emojis(
-                                        default_df
+                                ],
+                            ),
+                        ],
+                        type="default",
+                    ),
+                    html.H6("Word Cloud", id="word_cloud_header", style={}),
+                    html.Hr(id="word_cloud_hr", style={}),
+                    dcc.Loading(
+                        id="loading-input-5",
+                        children=[
+                            html.Div(
+                                id="wordcloud",
+                                children=[
+                                    html.Div(
+                                        id="word-cloud",
+                                        children=snapshot["word-cloud"],
                                     ),
-                                )
-                            ],
-                        ),
-                    ],
-                    type="default",
-                ),
-                html.H6("Media Sharing", id="media_header", style={}),
-                html.Hr(id="media_hr", style={}),
-                dcc.Loading(
-                    id="loading-input-4",
-                    children=[
-                        html.Div(id="loading-output-4"),
-                        html.Div(
-                            id="spams",
-                            children=[
-                                html.Div(
-                                    id="media-patterns",
-                                    children=display_helpers.initialise_media(
-                                        default_df
+                                ],
+                            ),
+                        ],
+                        type="default",
+                    ),
+                    dcc.Store(id="word-cloud-job"),
+                    dcc.Interval(
+                        id="word-cloud-interval",
+                        interval=display_helpers.PROGRESS_POLL_MS,
+                        disabled=True,
+                    ),
+                    html.H6(
+                        "Reliving Some of Your Messages", id="quotes_header", style={}
+                    ),
+                    html.Hr(id="quotes_hr", style={}),
+                    html.Div(
+                        id="quotes",
+                        children=[
+                            html.Button(
+                                "Generate New",
+                                id="btn-see-media",
+                                style={"margin-bottom": "30px"}
+                            ),
+                            dcc.Loading(
+                                id="loading-input-6",
+                                children=[
+                                    html.Div(
+                                        id="quotes-div",
+                                        children=snapshot["quotes-div"],
                                     ),
-                                ),
-                            ],
-                        ),
-                    ],
-                    type="default",
-                ),
-                html.H6("Word Cloud", id="word_cloud_header", style={}),
-                html.Hr(id="word_cloud_hr", style={}),
-                dcc.Loading(
-                    id="loading-input-5",
-                    children=[
-                        html.Div(id="loading-output-5"),
-                        html.Div(
-                            id="wordcloud",
-                            children=[
-                                html.Div(
-                                    id="word-cloud",
-                                    children=display_helpers.get_word_cloud(default_df),
-                                ),
-                            ],
-                        ),
-                    ],
-                    type="default",
-                ),
-                html.H6("Reliving Some of Your Messages", id="quotes_header", style={}),
-                html.Hr(id="quotes_hr", style={}),
-                html.Div(
-                    id="quotes",
+                                ],
+                                type="default",
+                            ),
+                            dcc.Store(id="quotes-job"),
+                            dcc.Interval(
+                                id="quotes-interval",
+                                interval=display_helpers.PROGRESS_POLL_MS,
+                                disabled=True,
+                            ),
+                        ],
+                    ),
+                ],
+            ),
+            html.Div(
+                id="footer",
+                className="footer",
+                children=html.P(
                     children=[
-                        html.Button(
-                            "Generate New",
-                            id="btn-see-media",
-                            style={"margin-bottom": "30px"},
-                        ),
-                        dcc.Loading(
-                            id="loading-input-6",
-                            children=[
-                                html.Div(id="loading-output-6"),
-                                html.Div(
-                                    id="quotes-div",
-                                    children=display_helpers.initialise_quotes(
-                                        default_df
-                                    ),
-                                ),
-                            ],
-                            type="default",
-                        ),
-                    ],
+                        f"\N{COPYRIGHT SIGN}{datetime.now().year} - ",
+                        html.A("natworks", href="https://github.com/natworks"),
+                    ]
                 ),
-            ],
-        ),
-        html.Div(
-            id="footer",
-            className="footer",
-            children=html.P(
-                children=[
-                    f"\N{COPYRIGHT SIGN}{datetime.now().year} - ",
-                    html.A("natworks", href="https://github.com/natworks"),
-                ]
             ),
-        ),
-    ],
-)
+        ],
+    )
+
+
+app.layout = serve_layout
 
 
 @app.callback(
@@ -259,57 +322,103 @@ app.layout = html.Div(
     State("output-data-upload", "children"),
     prevent_initial_call=True,
 )
-def parse_contents(jsonified_cleaned_data, children):
-    if jsonified_cleaned_data is not None:
-        blob = json.loads(jsonified_cleaned_data)
+def parse_contents(dataset, children):
+    if dataset is not None:
+        context = get_context(dataset)
 
-        if blob["chat_df"] == "FAIL":
+        if context is None:
             return None
 
-        chat_df = pd.read_json(blob["chat_df"], orient="split")
-
-        author_names, phone_numbers = data_cleaning.get_users(chat_df)
+        author_names, phone_numbers = context.users
+        date_picker = display_helpers.get_date_range_picker(
+            str(context.full_cube.days[0]), str(context.full_cube.days[-1])
+        )
 
-        years = list(chat_df["year"].unique())
+        years = list(context.cube.years)
         if len(years) > 1 and phone_numbers:
             years.sort(reverse=True)
             years = ["All years"] + years
-            return display_helpers.get_year_dropdown(
-                years
-            ) + display_helpers.get_numbers_dropdown(author_names, phone_numbers)
+            return (
+                display_helpers.get_year_dropdown(years)
+                + date_picker
+                + display_helpers.get_numbers_dropdown(author_names, phone_numbers)
+            )
 
         if len(years) > 1 and not phone_numbers:
             years.sort(reverse=True)
             years = ["All years"] + years
-            return display_helpers.get_year_dropdown(years)
+            return display_helpers.get_year_dropdown(years) + date_picker
 
-        return None
+        return date_picker
+
+
+# Random id of each upload, drawn in the browser so the progress can be polled before the file is analysed
+app.clientside_callback(
+    """function (contents) {
+        return Math.random().toString(36).slice(2) + Date.now().toString(36);
+    }""",
+    Output("upload-nonce", "data"),
+    Input("upload-data", "contents"),
+    prevent_initial_call=True,
+)
 
 
 @app.callback(
     Output("original-df", "data"),
-    Input("upload-data", "contents"),
+    Input("upload-nonce", "data"),
+    State("upload-data", "contents"),
+    State("upload-data", "filename"),
+    State("upload-data", "last_modified"),
     prevent_initial_call=True,
 )
-def load_data(contents):
+def load_data(nonce, contents, filename, last_modified):
     if contents is not None:
-        
+        upload = progress.upload_id(filename, last_modified, nonce)
+        progress.start(upload)
         try:
-            content_type, content_string = contents.split(",")
-        except:
-            return json.dumps({"chat_df": "FAIL", "input_source": "FAIL"})
+            return json.dumps(
+                {"dataset": analyse_upload(contents, upload), "upload": upload}
+            )
+        except Exception:
+            progress.done(upload, progress.FAILED)
+            raise
+
+
+def analyse_upload(contents, upload):
+    """Parse and aggregate an uploaded chat into the dataset store.
+    Args:
+        contents (str): Content of the upload, as a base64 data URL.
+        upload (str): Id of the upload, see ``progress.upload_id``.
+    Returns:
+        str: Key of the chat in the store, "FAIL" if it could not be read.
+    """
+    try:
+        content_type, content_string = contents.split(",")
+    except:
+        progress.done(upload, progress.FAILED)
+        return "FAIL"
+
+    chat_file = base64.b64decode(content_string)
+    key = dataset_store.dataset_key(chat_file)
+
+    # The same file uploaded again is not parsed again
+    if key not in dataset_store.STORE:
+        chat_df, input_source = data_cleaning.preprocess_input_data(chat_file)
 
-        chat_df, input_source = data_cleaning.preprocess_input_data(
-            base64.b64decode(content_string)
-        )
-        
         if chat_df is None or input_source is None:
-            json_data = {"chat_df": "FAIL", "input_source": "FAIL"}
-        else:
-            json_data = {"chat_df": chat_df.to_json(date_format="iso", orient="split")}
-            json_data["input_source"] = input_source
+            progress.done(upload, progress.FAILED)
+            return "FAIL"
+        progress.done(upload, "parse")
 
-        return json.dumps(json_data)
+        # One aggregation pass, every chart is then a slice of the cube
+        cube = aggregates.build_cube(chat_df)
+        dataset_store.STORE.put(key, chat_df, cube, input_source)
+    else:
+        progress.done(upload, "parse")
+    progress.done(upload, "aggregate")
+
+    # Only the key goes to the browser, the parsed chat stays on the server
+    return key
 
 
 @app.callback(
@@ -333,13 +442,13 @@ def load_data(contents):
     prevent_initial_call=True,
     suppress_callback_exceptions=True,
 )
-def handle_incorrect_input(jsonified_cleaned_data):
-    if jsonified_cleaned_data is None:
-        return display_helpers.initialise_table(default_df)
+def handle_incorrect_input(dataset):
+    if dataset is None:
+        return display_helpers.initialise_table(demo.load_demo()[1])
     else:
-        blob = json.loads(jsonified_cleaned_data)
+        context = get_context(dataset)
 
-        if blob["chat_df"] == "FAIL":
+        if context is None:
             return (
                 {"display": "none"},
                 {"display": "none"},
@@ -379,231 +488,344 @@ def handle_incorrect_input(jsonified_cleaned_data):
             )
 
 
+@app.callback(
+    Output({"type": "date-range", "index": ALL}, "start_date"),
+    Output({"type": "date-range", "index": ALL}, "end_date"),
+    Input({"type": "date-preset", "index": ALL}, "value"),
+    State({"type": "date-range", "index": ALL}, "max_date_allowed"),
+    prevent_initial_call=True,
+)
+def apply_date_preset(presets, last_days):
+    if not presets or not presets[0]:
+        return [None] * len(last_days), [None] * len(last_days)
+
+    # Presets end on the day of the last message
+    end = date.fromisoformat(last_days[0][:10])
+    start = end - timedelta(days=presets[0] - 1)
+    return [start.isoformat()], [end.isoformat()]
+
+
 @app.callback(
     Output("group-volume-data", "children"),
     Input("original-df", "data"),
     Input({"type": "filter-dropdown", "index": ALL}, "value"),
     Input({"type": "number-dropdowns", "index": ALL}, "value"),
+    Input({"type": "date-range", "index": ALL}, "start_date"),
+    Input({"type": "date-range", "index": ALL}, "end_date"),
     prevent_initial_call=True,
     suppress_callback_exceptions=True,
 )
-def update_messages(jsonified_cleaned_data, years, phone_dps):
-    if jsonified_cleaned_data is None:
-        return display_helpers.initialise_table(default_df)
+@reports_failure
+def update_messages(dataset, years, phone_dps, start_dates, end_dates):
+    if dataset is None:
+        return display_helpers.initialise_table(demo.load_demo()[1])
     else:
-        blob = json.loads(jsonified_cleaned_data)
+        context = get_context(dataset, years, phone_dps, start_dates, end_dates)
 
-        if blob["chat_df"] == "FAIL":
+        if context is None:
             return display_helpers.get_data_loading_error_message()
 
-        chat_df = pd.read_json(blob["chat_df"], orient="split")
+        if context.cube is None:
+            return display_helpers.get_empty_period_message(context.period)
 
-        if phone_dps:
-            data_cleaning.fix_phone_numbers(chat_df, phone_dps)
+        children = cached_section(
+            context, "group-volume-data", lambda: get_message_totals(context)
+        )
 
-        children = []
+        report_progress(dataset, "messages")
+        return children
 
-        if years and years[0] != "All years":
-            data_subset = chat_df[chat_df["year"] == years[0]]
-            figure, total_msgs = data_analysis.display_num_of_messages(
-                data_subset, plot_title=f"Total Number of Messages in {years[0]}"
-            )
-            children.append(
-                html.P(
-                    [
-                        "Your group has shared a total of ",
-                        html.Span(
-                            f"{total_msgs:,} messages",
-                            style={"font-size": "18px", "font-weight": "bold"},
-                        ),
-                        f" in {years[0]}.",
-                    ]
-                )
+
+def get_message_totals(context):
+    """Children of the "group-volume-data" section for the selection of context."""
+    children = []
+
+    if context.period is not None:
+        figure, total_msgs = data_analysis.display_num_of_messages(
+            context.cube,
+            plot_title=f"Total Number of Messages in {context.period}",
+        )
+        children.append(
+            html.P(
+                [
+                    "Your group has shared a total of ",
+                    html.Span(
+                        f"{total_msgs:,} messages",
+                        style={"font-size": "18px", "font-weight": "bold"},
+                    ),
+                    f" in {context.period}.",
+                ]
             )
-            children.append(dcc.Graph(figure=figure))
-        else:
-            figure, total_msgs = data_analysis.display_num_of_messages(
-                chat_df, plot_title=f"Total Number of Messages"
+        )
+        children.append(dcc.Graph(figure=figure))
+    else:
+        figure, total_msgs = data_analysis.display_num_of_messages(
+            context.cube, plot_title=f"Total Number of Messages"
+        )
+        children.append(
+            html.P(
+                [
+                    "Your group has shared a total of ",
+                    html.Span(
+                        f"{total_msgs:,} messages.",
+                        style={"font-size": "18px", "font-weight": "bold"},
+                    ),
+                ]
             )
-            children.append(
-                html.P(
-                    [
-                        "Your group has shared a total of ",
-                        html.Span(
-                            f"{total_msgs:,} messages.",
-                            style={"font-size": "18px", "font-weight": "bold"},
-                        ),
-                    ]
-                )
+        )
+        children.append(dcc.Graph(figure=figure))
+        # Same condition as the year dropdown, which may not be rendered yet
+        if len(context.full_cube.years) > 1:
+            yearly_breakdown, total_msgs = data_analysis.get_frequency_info(
+                context.full_cube,
+                "year",
+                "Year",
+                plot_title="Total Number of Messager Per Year and Per User",
             )
-            children.append(dcc.Graph(figure=figure))
-            if years:
-                author_names = list(chat_df["author"].unique())
-                yearly_breakdown, total_msgs = data_analysis.get_frequency_info(
-                    chat_df,
-                    "year",
-                    "Year",
-                    list(chat_df["year"].unique()),
-                    author_names,
-                    plot_title="Total Number of Messager Per Year and Per User",
-                )
-                children.append(dcc.Graph(figure=yearly_breakdown))
+            children.append(dcc.Graph(figure=yearly_breakdown))
 
-        return children
+    return children
 
 
 @app.callback(
     Output("unique_days", "children"),
-    Output("chatting-patterns", "children"),
+    *([] if CLIENTSIDE_CHARTS else [Output("chatting-patterns", "children")]),
     Output("responding-patterns", "children"),
     Output("emoji-patterns", "children"),
     Output("media-patterns", "children"),
     Input("original-df", "data"),
     Input({"type": "filter-dropdown", "index": ALL}, "value"),
     Input({"type": "number-dropdowns", "index": ALL}, "value"),
+    Input({"type": "date-range", "index": ALL}, "start_date"),
+    Input({"type": "date-range", "index": ALL}, "end_date"),
     prevent_initial_call=True,
     suppress_callback_exceptions=True,
 )
-def update_total_messages(jsonified_cleaned_data, years, phone_dps):
-
-    blob = json.loads(jsonified_cleaned_data)
+@reports_failure
+def update_total_messages(dataset, years, phone_dps, start_dates, end_dates):
 
-    if blob["chat_df"] == "FAIL":
-        return None, None, None, None, None
+    context = get_context(dataset, years, phone_dps, start_dates, end_dates)
+    n_sections = 4 if CLIENTSIDE_CHARTS else 5
 
-    chat_df = pd.read_json(blob["chat_df"], orient="split")
-    media = []
+    if context is None:
+        return (None,) * n_sections
 
-    if phone_dps:
-        data_cleaning.fix_phone_numbers(chat_df, phone_dps)
+    if context.cube is None:
+        return (display_helpers.get_empty_period_message(context.period),) + (None,) * (
+            n_sections - 1
+        )
 
-    if years and years[0] != "All years":
-        data_subset = chat_df[chat_df["year"] == years[0]]
-        usage = display_helpers.get_usage_plots(data_subset, years[0])
-        emojis = display_helpers.get_emojis(data_subset)
-        data_subset.reset_index(inplace=True)
-        unique_days = display_helpers.get_busiest_day(data_subset, years[0])
-        responder = dcc.Graph(figure=data_analysis.get_first_responders(data_subset))
-        media = display_helpers.get_biggest_spammer(
-            data_subset, time_frame=[f"In {years[0]}, ", "was", ""]
-        ) + display_helpers.get_media_info(data_subset, source=blob["input_source"])
+    if context.period is not None:
+        period = context.period
+        time_frame = [f"In {context.period}, ", "was", ""]
     else:
-        usage = display_helpers.get_usage_plots(chat_df)
-        unique_days = display_helpers.get_busiest_day(chat_df, "All years")
-        emojis = display_helpers.get_emojis(chat_df)
-        responder = dcc.Graph(figure=data_analysis.get_first_responders(chat_df))
-        media = display_helpers.get_biggest_spammer(
-            chat_df
-        ) + display_helpers.get_media_info(chat_df, source=blob["input_source"])
-
+        period = "All years"
+        time_frame = ["", "is", "have"]
+
+    unique_days = cached_section(
+        context,
+        "unique_days",
+        lambda: display_helpers.get_busiest_day(
+            context.data, context.cube, period, context.date_range is not None
+        ),
+        aliased=False,
+    )
+    responder = cached_section(
+        context,
+        "responding-patterns",
+        lambda: dcc.Graph(figure=data_analysis.get_first_responders(context.cube)),
+    )
+    emojis = cached_section(
+        context, "emoji-patterns", lambda: display_helpers.get_emojis(context.cube)
+    )
+    media = cached_section(
+        context,
+        "media-patterns",
+        lambda: display_helpers.get_biggest_spammer(context.cube, time_frame)
+        + display_helpers.get_media_info(context.cube, source=context.input_source),
+    )
+
+    report_progress(dataset, "patterns")
+    if CLIENTSIDE_CHARTS:
+        return unique_days, responder, emojis, media
+
+    usage = cached_section(
+        context,
+        "chatting-patterns",
+        lambda: display_helpers.get_usage_plots(context.cube, context.period),
+    )
     return unique_days, usage, responder, emojis, media
 
 
+if CLIENTSIDE_CHARTS:
+
+    @app.callback(
+        Output("usage-payload", "data"),
+        Input("original-df", "data"),
+        Input({"type": "number-dropdowns", "index": ALL}, "value"),
+        Input({"type": "date-range", "index": ALL}, "start_date"),
+        Input({"type": "date-range", "index": ALL}, "end_date"),
+        prevent_initial_call=True,
+    )
+    def update_usage_payload(dataset, phone_dps, start_dates, end_dates):
+        context = get_context(dataset, None, phone_dps, start_dates, end_dates)
+
+        if context is None or context.cube is None:
+            return None
+
+        if context.date_range is not None:
+            return display_helpers.get_usage_payload(context.cube, context.period)
+        return display_helpers.get_usage_payload(context.full_cube)
+
+    app.clientside_callback(
+        ClientsideFunction(namespace="usage", function_name="charts"),
+        Output("chatting-patterns", "children"),
+        Input("usage-payload", "data"),
+        Input({"type": "filter-dropdown", "index": ALL}, "value"),
+        prevent_initial_call=True,
+    )
+
+
 @app.callback(
-    Output("word-cloud", "children"),
+    Output("word-cloud-job", "data"),
     Input("original-df", "data"),
     Input({"type": "filter-dropdown", "index": ALL}, "value"),
+    Input({"type": "date-range", "index": ALL}, "start_date"),
+    Input({"type": "date-range", "index": ALL}, "end_date"),
     prevent_initial_call=True,
 )
-def update_word_cloud(jsonified_cleaned_data, years):
+def update_word_cloud(dataset, years, start_dates, end_dates):
 
-    blob = json.loads(jsonified_cleaned_data)
+    key = json.loads(dataset)["dataset"]
 
-    if blob["chat_df"] == "FAIL":
+    if key == "FAIL":
         return None
 
-    chat_df = pd.read_json(blob["chat_df"], orient="split")
+    year = years[0] if years and years[0] != "All years" else None
+    date_range = (start_dates[0], end_dates[0]) if start_dates else None
 
-    if years and years[0] != "All years":
-        data_subset = chat_df[chat_df["year"] == years[0]]
-        return display_helpers.get_word_cloud(data_subset)
-    else:
-        return display_helpers.get_word_cloud(chat_df)
+    # Drawn in the background, fill_word_cloud shows it when ready
+    job = jobs.job_id("word_cloud", key, year, date_range)
+    jobs.submit(job, render_word_cloud, key, year, date_range)
+    return job
 
 
 @app.callback(
-    Output("quotes-div", "children"),
+    Output("word-cloud", "children"),
+    Output("word-cloud-interval", "disabled"),
+    Input("word-cloud-job", "data"),
+    Input("word-cloud-interval", "n_intervals"),
+    State("original-df", "data"),
+    prevent_initial_call=True,
+)
+def fill_word_cloud(job, n_intervals, dataset):
+    return poll_job(job, dataset, "word_cloud", "Drawing the word cloud...")
+
+
+@app.callback(
+    Output("quotes-job", "data"),
     Input("original-df", "data"),
     Input("btn-see-media", "n_clicks"),
     Input({"type": "number-dropdowns", "index": ALL}, "value"),
     prevent_initial_call=True,
     suppress_callback_exceptions=True,
 )
-def display_quotes(jsonified_cleaned_data, click, phone_dps):
+def display_quotes(dataset, click, phone_dps):
 
-    if jsonified_cleaned_data is None:
-        return display_helpers.initialise_quotes(default_df)
-    else:
-        blob = json.loads(jsonified_cleaned_data)
+    # No upload yet: new quotes from the demo chat
+    key = json.loads(dataset)["dataset"] if dataset is not None else None
 
-        if blob["chat_df"] == "FAIL":
-            return None
+    if key == "FAIL":
+        return None
 
-        chat_df = pd.read_json(blob["chat_df"], orient="split")
+    # The click count is part of the job, so "Generate New" picks new quotes
+    job = jobs.job_id("quotes", key, click, tuple(phone_dps))
+    jobs.submit(job, render_quotes, key, phone_dps)
+    return job
 
-        if phone_dps:
-            data_cleaning.fix_phone_numbers(chat_df, phone_dps)
 
-        return display_helpers.initialise_quotes(chat_df)
+@app.callback(
+    Output("quotes-div", "children"),
+    Output("quotes-interval", "disabled"),
+    Input("quotes-job", "data"),
+    Input("quotes-interval", "n_intervals"),
+    State("original-df", "data"),
+    prevent_initial_call=True,
+)
+def fill_quotes(job, n_intervals, dataset):
+    return poll_job(job, dataset, "quotes", "Picking some quotes...")
 
 
-# --------- Display Loading Icons ---------#
+def poll_job(job, dataset, stage, waiting_text):
+    """Children of a section drawn by a background job, and whether to stop polling for it. Polling stops when
+    the job fails, or after jobs.JOB_STALE_SECONDS without a result."""
+    if job is None:
+        return None, True
 
+    finished, children = jobs.result(job)
+    if not finished:
+        just_submitted = dash.callback_context.triggered[0]["prop_id"].endswith(".data")
+        return (html.P(waiting_text) if just_submitted else dash.no_update), False
 
-@app.callback(
-    Output("loading-output-1", "children"), Input("loading-input-1", "loading_state")
-)
-def input_triggers_spinner(value):
-    time.sleep(1)
-    return value
+    if dataset is not None:
+        report_progress(dataset, stage)
+    return children, True
 
 
-@app.callback(
-    Output("loading-output-2", "children"), Input("loading-input-2", "loading_state")
-)
-def input_triggers_spinner(value):
-    time.sleep(1)
-    return value
+# --------- Background Jobs ---------#
 
 
-@app.callback(
-    Output("loading-output-3", "children"), Input("loading-input-3", "loading_state")
-)
-def input_triggers_spinner(value):
-    time.sleep(1)
-    return value
+def render_word_cloud(key, year, date_range=None):
+    context = analysis_context.get_context(key, year, date_range=date_range)
+    if context is None:
+        return None
+    if len(context.data) == 0:
+        return display_helpers.get_empty_period_message(context.period)
+    return display_helpers.get_word_cloud(context.data)
 
 
-@app.callback(
-    Output("loading-output-4", "children"), Input("loading-input-4", "loading_state")
-)
-def input_triggers_spinner(value):
-    time.sleep(1)
-    return value
+def render_quotes(key, phone_dps):
+    if key is None:
+        return display_helpers.initialise_quotes(demo.load_demo()[0])
+
+    context = analysis_context.get_context(key, phone_dps=phone_dps)
+    if context is None:
+        return None
+    return display_helpers.initialise_quotes(context.chat_df, context.aliases)
 
 
-@app.callback(
-    Output("loading-output-5", "children"), Input("loading-input-5", "loading_state")
-)
-def input_triggers_spinner(value):
-    time.sleep(1)
-    return value
+# --------- Instrumentation ---------#
 
 
-@app.callback(
-    Output("loading-output-6", "children"), Input("loading-input-6", "loading_state")
-)
-def input_triggers_spinner(value):
-    time.sleep(1)
-    return value
+@server.route("/stats/figure-cache")
+def figure_cache_stats():
+    """Hit rate and savings of the figure cache of the worker process serving the request."""
+    return figure_cache.CACHE.stats()
+
+
+# --------- Report Progress ---------#
 
 
 @app.callback(
-    Output("loading-output-8", "children"), Input("loading-input-8", "loading_state")
+    Output("progress-status", "children"),
+    Output("progress-interval", "disabled"),
+    Input("upload-nonce", "data"),
+    Input("progress-interval", "n_intervals"),
+    State("upload-data", "filename"),
+    State("upload-data", "last_modified"),
+    prevent_initial_call=True,
 )
-def input_triggers_spinner(value):
-    time.sleep(1)
-    return value
+def update_progress(nonce, n_intervals, filename, last_modified):
+    upload = progress.upload_id(filename, last_modified, nonce)
+    try:
+        n_done, n_stages, running, failed = progress.status(upload)
+        if not failed and running is not None:
+            return display_helpers.get_progress_status(n_done, n_stages, running), False
+    except Exception:
+        logging.exception("Progress of upload %s could not be read", upload[:12])
+    # Finished, failed or unreadable: stop polling
+    progress.forget(upload)
+    return [], True
 
 
 # --------- Handle FAQ Interaction ---------#
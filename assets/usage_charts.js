@@ -0,0 +1,276 @@
+/* draw the chatting patterns of the selected year from the usage payload (display_helpers.get_usage_payload),
+   so that changing the year does not go back to the server */
+
+if(!window.dash_clientside) {window.dash_clientside = {};}
+
+(function () {
+    // RdYlBu color table, as utils.RDYLBU
+    var COLOR_TABLE = [
+        [165, 0, 38], [166, 1, 38], [168, 3, 38], [170, 5, 38], [172, 7, 38], [174, 9, 38], [176, 11, 38], [178, 13, 38],
+        [180, 15, 38], [182, 16, 38], [184, 18, 38], [186, 20, 38], [188, 22, 38], [190, 24, 38], [192, 26, 38], [194, 28, 38],
+        [196, 30, 38], [198, 32, 38], [200, 33, 38], [202, 35, 38], [204, 37, 38], [206, 39, 38], [208, 41, 38], [210, 43, 38],
+        [212, 45, 38], [214, 47, 38], [215, 49, 39], [216, 51, 40], [217, 53, 41], [218, 56, 42], [220, 58, 43], [221, 61, 45],
+        [222, 63, 46], [223, 65, 47], [224, 68, 48], [225, 70, 49], [226, 73, 50], [228, 75, 51], [229, 77, 52], [230, 80, 53],
+        [231, 82, 54], [232, 85, 56], [233, 87, 57], [234, 89, 58], [236, 92, 59], [237, 94, 60], [238, 97, 61], [239, 99, 62],
+        [240, 101, 63], [241, 104, 64], [242, 106, 65], [244, 109, 67], [244, 111, 68], [244, 114, 69], [245, 116, 70], [245, 119, 71],
+        [245, 121, 72], [246, 124, 74], [246, 126, 75], [246, 129, 76], [247, 131, 77], [247, 134, 78], [247, 137, 79], [248, 139, 81],
+        [248, 142, 82], [248, 144, 83], [249, 147, 84], [249, 149, 85], [250, 152, 86], [250, 154, 88], [250, 157, 89], [251, 159, 90],
+        [251, 162, 91], [251, 165, 92], [252, 167, 94], [252, 170, 95], [252, 172, 96], [253, 174, 97], [253, 176, 99], [253, 178, 101],
+        [253, 180, 103], [253, 182, 105], [253, 184, 107], [253, 186, 108], [253, 188, 110], [253, 190, 112], [253, 192, 114], [253, 194, 116],
+        [253, 196, 118], [253, 198, 120], [253, 200, 121], [253, 202, 123], [253, 204, 125], [253, 206, 127], [253, 208, 129], [253, 210, 131],
+        [253, 212, 132], [253, 214, 134], [253, 216, 136], [253, 218, 138], [253, 220, 140], [253, 222, 142], [254, 224, 144], [254, 225, 145],
+        [254, 226, 147], [254, 227, 149], [254, 228, 151], [254, 230, 153], [254, 231, 155], [254, 232, 156], [254, 233, 158], [254, 234, 160],
+        [254, 236, 162], [254, 237, 164], [254, 238, 166], [254, 239, 167], [254, 241, 169], [254, 242, 171], [254, 243, 173], [254, 244, 175],
+        [254, 245, 177], [254, 247, 179], [254, 248, 180], [254, 249, 182], [254, 250, 184], [254, 251, 186], [254, 253, 188], [254, 254, 190],
+        [254, 254, 192], [253, 254, 194], [251, 253, 196], [250, 253, 198], [249, 252, 201], [248, 252, 203], [247, 251, 205], [245, 251, 207],
+        [244, 251, 210], [243, 250, 212], [242, 250, 214], [241, 249, 216], [239, 249, 218], [238, 248, 221], [237, 248, 223], [236, 247, 225],
+        [234, 247, 227], [233, 246, 230], [232, 246, 232], [231, 245, 234], [230, 245, 236], [228, 244, 239], [227, 244, 241], [226, 243, 243],
+        [225, 243, 245], [224, 243, 247], [221, 241, 247], [219, 240, 246], [217, 239, 246], [215, 238, 245], [213, 237, 245], [211, 236, 244],
+        [209, 235, 243], [207, 234, 243], [205, 233, 242], [203, 232, 242], [201, 231, 241], [199, 230, 240], [196, 229, 240], [194, 228, 239],
+        [192, 227, 239], [190, 226, 238], [188, 225, 238], [186, 224, 237], [184, 223, 236], [182, 222, 236], [180, 221, 235], [178, 220, 235],
+        [176, 219, 234], [174, 218, 233], [172, 217, 233], [169, 216, 232], [167, 214, 231], [165, 212, 230], [163, 210, 229], [161, 209, 228],
+        [159, 207, 227], [156, 205, 226], [154, 204, 225], [152, 202, 225], [150, 200, 224], [148, 198, 223], [146, 197, 222], [144, 195, 221],
+        [141, 193, 220], [139, 191, 219], [137, 190, 218], [135, 188, 217], [133, 186, 216], [131, 185, 215], [128, 183, 214], [126, 181, 213],
+        [124, 179, 212], [122, 178, 211], [120, 176, 210], [118, 174, 209], [116, 173, 209], [114, 170, 207], [112, 168, 206], [110, 166, 205],
+        [108, 164, 204], [106, 162, 203], [104, 159, 202], [103, 157, 201], [101, 155, 199], [99, 153, 198], [97, 151, 197], [95, 148, 196],
+        [93, 146, 195], [92, 144, 194], [90, 142, 193], [88, 140, 191], [86, 137, 190], [84, 135, 189], [82, 133, 188], [80, 131, 187],
+        [79, 129, 186], [77, 126, 185], [75, 124, 183], [73, 122, 182], [71, 120, 181], [69, 118, 180], [68, 115, 179], [67, 113, 178],
+        [67, 110, 176], [66, 108, 175], [65, 105, 174], [64, 103, 173], [63, 100, 172], [63, 98, 170], [62, 96, 169], [61, 93, 168],
+        [60, 91, 167], [59, 88, 166], [59, 86, 164], [58, 83, 163], [57, 81, 162], [56, 78, 161], [56, 76, 159], [55, 73, 158],
+        [54, 71, 157], [53, 68, 156], [52, 66, 155], [52, 63, 153], [51, 61, 152], [50, 58, 151], [49, 56, 150], [49, 54, 149]
+    ];
+    var COLOR_TABLE_SIZE = COLOR_TABLE.length;
+
+    // Plotly's default template (plotly.io.templates["plotly"]), which the figures drawn by the server get
+    var TEMPLATE = {
+        data: {
+            "histogram2dcontour": [{"type": "histogram2dcontour", "colorbar": {"outlinewidth": 0, "ticks": ""}, "colorscale": [[0.0, "#0d0887"], [0.1111111111111111, "#46039f"], [0.2222222222222222, "#7201a8"], [0.3333333333333333, "#9c179e"], [0.4444444444444444, "#bd3786"], [0.5555555555555556, "#d8576b"], [0.6666666666666666, "#ed7953"], [0.7777777777777778, "#fb9f3a"], [0.8888888888888888, "#fdca26"], [1.0, "#f0f921"]]}],
+            "choropleth": [{"type": "choropleth", "colorbar": {"outlinewidth": 0, "ticks": ""}}],
+            "histogram2d": [{"type": "histogram2d", "colorbar": {"outlinewidth": 0, "ticks": ""}, "colorscale": [[0.0, "#0d0887"], [0.1111111111111111, "#46039f"], [0.2222222222222222, "#7201a8"], [0.3333333333333333, "#9c179e"], [0.4444444444444444, "#bd3786"], [0.5555555555555556, "#d8576b"], [0.6666666666666666, "#ed7953"], [0.7777777777777778, "#fb9f3a"], [0.8888888888888888, "#fdca26"], [1.0, "#f0f921"]]}],
+            "heatmap": [{"type": "heatmap", "colorbar": {"outlinewidth": 0, "ticks": ""}, "colorscale": [[0.0, "#0d0887"], [0.1111111111111111, "#46039f"], [0.2222222222222222, "#7201a8"], [0.3333333333333333, "#9c179e"], [0.4444444444444444, "#bd3786"], [0.5555555555555556, "#d8576b"], [0.6666666666666666, "#ed7953"], [0.7777777777777778, "#fb9f3a"], [0.8888888888888888, "#fdca26"], [1.0, "#f0f921"]]}],
+            "heatmapgl": [{"type": "heatmapgl", "colorbar": {"outlinewidth": 0, "ticks": ""}, "colorscale": [[0.0, "#0d0887"], [0.1111111111111111, "#46039f"], [0.2222222222222222, "#7201a8"], [0.3333333333333333, "#9c179e"], [0.4444444444444444, "#bd3786"], [0.5555555555555556, "#d8576b"], [0.6666666666666666, "#ed7953"], [0.7777777777777778, "#fb9f3a"], [0.8888888888888888, "#fdca26"], [1.0, "#f0f921"]]}],
+            "contourcarpet": [{"type": "contourcarpet", "colorbar": {"outlinewidth": 0, "ticks": ""}}],
+            "contour": [{"type": "contour", "colorbar": {"outlinewidth": 0, "ticks": ""}, "colorscale": [[0.0, "#0d0887"], [0.1111111111111111, "#46039f"], [0.2222222222222222, "#7201a8"], [0.3333333333333333, "#9c179e"], [0.4444444444444444, "#bd3786"], [0.5555555555555556, "#d8576b"], [0.6666666666666666, "#ed7953"], [0.7777777777777778, "#fb9f3a"], [0.8888888888888888, "#fdca26"], [1.0, "#f0f921"]]}],
+            "surface": [{"type": "surface", "colorbar": {"outlinewidth": 0, "ticks": ""}, "colorscale": [[0.0, "#0d0887"], [0.1111111111111111, "#46039f"], [0.2222222222222222, "#7201a8"], [0.3333333333333333, "#9c179e"], [0.4444444444444444, "#bd3786"], [0.5555555555555556, "#d8576b"], [0.6666666666666666, "#ed7953"], [0.7777777777777778, "#fb9f3a"], [0.8888888888888888, "#fdca26"], [1.0, "#f0f921"]]}],
+            "mesh3d": [{"type": "mesh3d", "colorbar": {"outlinewidth": 0, "ticks": ""}}],
+            "scatter": [{"fillpattern": {"fillmode": "overlay", "size": 10, "solidity": 0.2}, "type": "scatter"}],
+            "parcoords": [{"type": "parcoords", "line": {"colorbar": {"outlinewidth": 0, "ticks": ""}}}],
+            "scatterpolargl": [{"type": "scatterpolargl", "marker": {"colorbar": {"outlinewidth": 0, "ticks": ""}}}],
+            "bar": [{"error_x": {"color": "#2a3f5f"}, "error_y": {"color": "#2a3f5f"}, "marker": {"line": {"color": "#E5ECF6", "width": 0.5}, "pattern": {"fillmode": "overlay", "size": 10, "solidity": 0.2}}, "type": "bar"}],
+            "scattergeo": [{"type": "scattergeo", "marker": {"colorbar": {"outlinewidth": 0, "ticks": ""}}}],
+            "scatterpolar": [{"type": "scatterpolar", "marker": {"colorbar": {"outlinewidth": 0, "ticks": ""}}}],
+            "histogram": [{"marker": {"pattern": {"fillmode": "overlay", "size": 10, "solidity": 0.2}}, "type": "histogram"}],
+            "scattergl": [{"type": "scattergl", "marker": {"colorbar": {"outlinewidth": 0, "ticks": ""}}}],
+            "scatter3d": [{"type": "scatter3d", "line": {"colorbar": {"outlinewidth": 0, "ticks": ""}}, "marker": {"colorbar": {"outlinewidth": 0, "ticks": ""}}}],
+            "scattermapbox": [{"type": "scattermapbox", "marker": {"colorbar": {"outlinewidth": 0, "ticks": ""}}}],
+            "scatterternary": [{"type": "scatterternary", "marker": {"colorbar": {"outlinewidth": 0, "ticks": ""}}}],
+            "scattercarpet": [{"type": "scattercarpet", "marker": {"colorbar": {"outlinewidth": 0, "ticks": ""}}}],
+            "carpet": [{"aaxis": {"endlinecolor": "#2a3f5f", "gridcolor": "white", "linecolor": "white", "minorgridcolor": "white", "startlinecolor": "#2a3f5f"}, "baxis": {"endlinecolor": "#2a3f5f", "gridcolor": "white", "linecolor": "white", "minorgridcolor": "white", "startlinecolor": "#2a3f5f"}, "type": "carpet"}],
+            "table": [{"cells": {"fill": {"color": "#EBF0F8"}, "line": {"color": "white"}}, "header": {"fill": {"color": "#C8D4E3"}, "line": {"color": "white"}}, "type": "table"}],
+            "barpolar": [{"marker": {"line": {"color": "#E5ECF6", "width": 0.5}, "pattern": {"fillmode": "overlay", "size": 10, "solidity": 0.2}}, "type": "barpolar"}],
+            "pie": [{"automargin": true, "type": "pie"}]
+        },
+        layout: {
+            "autotypenumbers": "strict",
+            "colorway": ["#636efa", "#EF553B", "#00cc96", "#ab63fa", "#FFA15A", "#19d3f3", "#FF6692", "#B6E880", "#FF97FF", "#FECB52"],
+            "font": {"color": "#2a3f5f"},
+            "hovermode": "closest",
+            "hoverlabel": {"align": "left"},
+            "paper_bgcolor": "white",
+            "plot_bgcolor": "#E5ECF6",
+            "polar": {"bgcolor": "#E5ECF6", "angularaxis": {"gridcolor": "white", "linecolor": "white", "ticks": ""}, "radialaxis": {"gridcolor": "white", "linecolor": "white", "ticks": ""}},
+            "ternary": {"bgcolor": "#E5ECF6", "aaxis": {"gridcolor": "white", "linecolor": "white", "ticks": ""}, "baxis": {"gridcolor": "white", "linecolor": "white", "ticks": ""}, "caxis": {"gridcolor": "white", "linecolor": "white", "ticks": ""}},
+            "coloraxis": {"colorbar": {"outlinewidth": 0, "ticks": ""}},
+            "colorscale": {"sequential": [[0.0, "#0d0887"], [0.1111111111111111, "#46039f"], [0.2222222222222222, "#7201a8"], [0.3333333333333333, "#9c179e"], [0.4444444444444444, "#bd3786"], [0.5555555555555556, "#d8576b"], [0.6666666666666666, "#ed7953"], [0.7777777777777778, "#fb9f3a"], [0.8888888888888888, "#fdca26"], [1.0, "#f0f921"]], "sequentialminus": [[0.0, "#0d0887"], [0.1111111111111111, "#46039f"], [0.2222222222222222, "#7201a8"], [0.3333333333333333, "#9c179e"], [0.4444444444444444, "#bd3786"], [0.5555555555555556, "#d8576b"], [0.6666666666666666, "#ed7953"], [0.7777777777777778, "#fb9f3a"], [0.8888888888888888, "#fdca26"], [1.0, "#f0f921"]], "diverging": [[0, "#8e0152"], [0.1, "#c51b7d"], [0.2, "#de77ae"], [0.3, "#f1b6da"], [0.4, "#fde0ef"], [0.5, "#f7f7f7"], [0.6, "#e6f5d0"], [0.7, "#b8e186"], [0.8, "#7fbc41"], [0.9, "#4d9221"], [1, "#276419"]]},
+            "xaxis": {"gridcolor": "white", "linecolor": "white", "ticks": "", "title": {"standoff": 15}, "zerolinecolor": "white", "automargin": true, "zerolinewidth": 2},
+            "yaxis": {"gridcolor": "white", "linecolor": "white", "ticks": "", "title": {"standoff": 15}, "zerolinecolor": "white", "automargin": true, "zerolinewidth": 2},
+            "scene": {"xaxis": {"backgroundcolor": "#E5ECF6", "gridcolor": "white", "linecolor": "white", "showbackground": true, "ticks": "", "zerolinecolor": "white", "gridwidth": 2}, "yaxis": {"backgroundcolor": "#E5ECF6", "gridcolor": "white", "linecolor": "white", "showbackground": true, "ticks": "", "zerolinecolor": "white", "gridwidth": 2}, "zaxis": {"backgroundcolor": "#E5ECF6", "gridcolor": "white", "linecolor": "white", "showbackground": true, "ticks": "", "zerolinecolor": "white", "gridwidth": 2}},
+            "shapedefaults": {"line": {"color": "#2a3f5f"}},
+            "annotationdefaults": {"arrowcolor": "#2a3f5f", "arrowhead": 0, "arrowwidth": 1},
+            "geo": {"bgcolor": "white", "landcolor": "#E5ECF6", "subunitcolor": "white", "showland": true, "showlakes": true, "lakecolor": "white"},
+            "title": {"x": 0.05},
+            "mapbox": {"style": "light"}
+        }
+    };
+
+    var BOLD = {"font-size": "18px", "font-weight": "bold"};
+
+    // Decoded counts, by payload
+    var decoded = new WeakMap();
+
+    function decodeCounts(payload) {
+        if (!decoded.has(payload)) {
+            var raw = atob(payload.counts);
+            var bytes = new Uint8Array(raw.length);
+            for (var i = 0; i < raw.length; i++) {
+                bytes[i] = raw.charCodeAt(i);
+            }
+            var ArrayType = payload.dtype === "uint16" ? Uint16Array : Uint32Array;
+            decoded.set(payload, new ArrayType(bytes.buffer));
+        }
+        return decoded.get(payload);
+    }
+
+    function component(type, namespace, props) {
+        return {type: type, namespace: namespace, props: props};
+    }
+
+    function span(text) {
+        return component("Span", "dash_html_components", {children: String(text), style: BOLD});
+    }
+
+    function paragraph(children) {
+        return component("P", "dash_html_components", {children: children});
+    }
+
+    function graph(figure) {
+        return component("Graph", "dash_core_components", {figure: figure});
+    }
+
+    // Same colors as utils.get_colors
+    function getColors(n) {
+        var colors = [];
+        for (var i = 1; i <= n; i++) {
+            var rgb = COLOR_TABLE[Math.min(Math.floor(i / n * COLOR_TABLE_SIZE), COLOR_TABLE_SIZE - 1)];
+            colors.push("rgb(" + rgb[0] + ", " + rgb[1] + ", " + rgb[2] + ")");
+        }
+        return colors;
+    }
+
+    // Counts per (column value, author) of the selected years, for every column
+    function selectYears(payload, yearIndices) {
+        var counts = decodeCounts(payload);
+        var nAuthors = payload.authors.length;
+        var nValues = payload.labels.reduce(function (n, values) { return n + values.length; }, 0);
+        var selected = new Float64Array(nValues * nAuthors);
+        yearIndices.forEach(function (yearIdx) {
+            var offset = yearIdx * nValues * nAuthors;
+            for (var i = 0; i < selected.length; i++) {
+                selected[i] += counts[offset + i];
+            }
+        });
+        return selected;
+    }
+
+    // Same figure as data_analysis.get_frequency_info
+    function frequencyChart(payload, selected, block, presentAuthors, colors, columnRenamed, plotTitle) {
+        var nAuthors = payload.authors.length;
+        var offset = 0;
+        for (var b = 0; b < block; b++) {
+            offset += payload.labels[b].length;
+        }
+        var labels = payload.labels[block];
+
+        var available = [];
+        var top = null;
+        var topValue = -1;
+        labels.forEach(function (label, i) {
+            var value = 0;
+            for (var a = 0; a < nAuthors; a++) {
+                value += selected[(offset + i) * nAuthors + a];
+            }
+            if (value > 0) {
+                available.push(i);
+                if (value > topValue) {
+                    top = label;
+                    topValue = value;
+                }
+            }
+        });
+
+        var data = presentAuthors.map(function (a, c) {
+            return {
+                marker: {color: colors[c]},
+                name: payload.authors[a],
+                x: available.map(function (i) { return String(labels[i]); }),
+                y: available.map(function (i) { return selected[(offset + i) * nAuthors + a]; }),
+                type: "bar"
+            };
+        });
+        var layout = {
+            barmode: "stack",
+            uniformtext: {minsize: 8, mode: "hide"},
+            title: {text: plotTitle, y: 0.9, x: 0.5, xanchor: "center", yanchor: "top"},
+            plot_bgcolor: "rgb(255,255, 255)",
+            yaxis: {
+                title: {text: "Number of Messages"},
+                showgrid: true,
+                gridwidth: 1,
+                gridcolor: "rgb(220,220,220)"
+            },
+            xaxis: {title: {text: columnRenamed}},
+            template: TEMPLATE
+        };
+        return [{data: data, layout: layout}, top];
+    }
+
+    window.dash_clientside.usage = {
+        // Same children as display_helpers.get_usage_plots
+        charts: function (payload, years) {
+            // Failed upload: the section is emptied, as by the server
+            if (!payload) {
+                return null;
+            }
+            var year = years && years.length && years[0] !== "All years" ? years[0] : null;
+            var yearIndices = payload.years.map(function (y, i) { return i; });
+            // A payload of a date range is shown as a whole, whatever the year
+            var period = payload.period ? payload.period : year;
+            if (!payload.period && year !== null) {
+                yearIndices = [payload.years.indexOf(year)];
+            }
+            var selected = selectYears(payload, yearIndices);
+
+            // Authors with messages in the selected years, counted on the hours block
+            var nAuthors = payload.authors.length;
+            var hoursOffset = payload.labels[0].length + payload.labels[1].length;
+            var presentAuthors = [];
+            for (var a = 0; a < nAuthors; a++) {
+                for (var h = 0; h < payload.labels[2].length; h++) {
+                    if (selected[(hoursOffset + h) * nAuthors + a] > 0) {
+                        presentAuthors.push(a);
+                        break;
+                    }
+                }
+            }
+            var colors = getColors(presentAuthors.length);
+
+            var plotTitleAdd = period !== null ? "in " + period : "";
+            var month = frequencyChart(payload, selected, 0, presentAuthors, colors, "Month",
+                                       "Busiest Month " + plotTitleAdd);
+            var day = frequencyChart(payload, selected, 1, presentAuthors, colors, "Weekday",
+                                     "Busiest Day of The Week " + plotTitleAdd);
+            var hour = frequencyChart(payload, selected, 2, presentAuthors, colors, "Hour of Day",
+                                      "Busiest Hour of The Day " + plotTitleAdd);
+            var topHourEnd = String(hour[1] + 1);
+
+            var monthText, dayText, hourText;
+            if (period !== null) {
+                monthText = ["In " + period + ", ", span(month[1]), " was the"];
+                dayText = ["In " + period + ", ", span(day[1]), " was the"];
+                hourText = [
+                    span(hour[1] + ":00 to " + topHourEnd + ":00"),
+                    " was when the chat was the busiest in " + period + "."
+                ];
+            } else {
+                monthText = ["Overall, ", span(month[1]), " is the "];
+                dayText = ["Over the years, ", span(day[1]), " has been the"];
+                hourText = [
+                    "From ",
+                    span(hour[1] + ":00"),
+                    " to ",
+                    span(topHourEnd + ":00"),
+                    " is when the chat is normally most alive."
+                ];
+            }
+
+            return [
+                paragraph(monthText.concat([" busiest month of the year."])),
+                graph(month[0]),
+                paragraph(dayText.concat([" busiest day of the week."])),
+                graph(day[0]),
+                paragraph(hourText),
+                graph(hour[0])
+            ];
+        }
+    };
+})();
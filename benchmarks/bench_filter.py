@@ -0,0 +1,82 @@
+"""
+Time of selecting the messages of a period of a chat: the boolean scan of the "year" column the callbacks used to
+do, against the slice of the time-sorted chat found with a binary search (``analysis_context.AnalysisContext.data``),
+for a year and for the "Last 30 days" preset. The slice shares the memory of the chat, its strings included,
+instead of copying it.
+
+Usage: python benchmarks/bench_filter.py [n_messages ...]   (default: 100000 1000000 4000000)
+"""
+import os
+import sys
+import time
+import tempfile
+
+import numpy as np
+
+from synthetic import make_chat_df
+
+os.environ.setdefault("DATASET_DIR", tempfile.mkdtemp())
+
+import aggregates
+import analysis_context
+import dataset_store
+
+# Number of runs each selection is timed over (the best one is kept)
+N_RUNS = 5
+
+
+def scan_year(chat_df, year):
+    return chat_df[chat_df["year"] == year].reset_index(drop=True)
+
+
+def slice_period(chat_df, cube, year=None, date_range=None):
+    # Contexts share the chat fetched from the dataset store when they are created
+    context = analysis_context.AnalysisContext(
+        "bench-filter", chat_df, cube, "whatsapp", year, {}, date_range=date_range
+    )
+    return context.data
+
+
+def timed(func, *args, **kwargs):
+    best = float("inf")
+    for _ in range(N_RUNS):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+if __name__ == "__main__":
+    sizes = [int(n) for n in sys.argv[1:]] or [100_000, 1_000_000, 4_000_000]
+
+    for n_messages in sizes:
+        chat_df = make_chat_df(n_messages)
+        cube = aggregates.build_cube(chat_df)
+        dataset_store.STORE.put("bench-filter", chat_df, cube, "whatsapp")
+        chat_df = dataset_store.STORE.get("bench-filter")[0]
+        times = chat_df["datetime"].to_numpy()
+        year = int(chat_df["year"].iloc[-1]) - 1
+        last_day = chat_df["datetime"].iloc[-1]
+        last_30_days = (
+            str((last_day - np.timedelta64(29, "D")).date()),
+            str(last_day.date()),
+        )
+
+        scan_time, scanned = timed(scan_year, chat_df, year)
+        slice_time, sliced = timed(slice_period, chat_df, cube, year=year)
+        range_time, last_month = timed(
+            slice_period, chat_df, cube, date_range=last_30_days
+        )
+        assert scanned.equals(sliced)
+
+        print(f"{n_messages:,} messages")
+        print(f"  year {year} (boolean scan): {scan_time * 1000:8.2f}ms")
+        print(
+            f"  year {year} (binary search): {slice_time * 1000:8.2f}ms  "
+            f"zero-copy: {np.shares_memory(sliced['datetime'].to_numpy(), times)}  "
+            f"strings shared: {np.shares_memory(sliced['body'].to_numpy(), chat_df['body'].to_numpy())}"
+        )
+        print(
+            f"  last 30 days (binary search): {range_time * 1000:8.2f}ms  "
+            f"{len(last_month):,} messages"
+        )
@@ -0,0 +1,101 @@
+"""
+Compare the per-author loop formerly used by ``data_analysis.get_frequency_info`` (one mask of the chat, one
+``value_counts`` and ``DataFrame.append`` calls per author) with the author-by-value matrices now read from the
+cube (``aggregates.ChatCube.calendar_counts``), for the three charts of the chatting patterns, and check that
+both draw the same bars.
+
+Usage: python benchmarks/bench_frequency.py [n_messages] [n_authors]   (default: 1000000 500)
+"""
+import sys
+import time
+import warnings
+
+import numpy as np
+import plotly.graph_objects as go
+
+from synthetic import make_chat_df
+import aggregates
+import data_analysis
+import utils
+
+COLUMNS = [
+    ("month", "Month", utils.MONTHS),
+    ("weekday", "Weekday", utils.WEEKDAYS),
+    ("hour_of_day", "Hour of Day", utils.HOURS),
+]
+
+
+def legacy_get_frequency_info(chat_data, column, column_renamed, sorting_order, author_names):
+    """Per-author loop, as it was before the cube (the figure layout is left out)."""
+    markers = utils.get_colors(len(author_names))
+
+    all_col_names = set(chat_data[column].unique())
+    data = []
+    values = [0] * len(all_col_names)
+    for c, author in enumerate(author_names):
+        individual_info = chat_data[chat_data["author"] == author][column].value_counts().to_frame()
+        individual_info.reset_index(inplace=True)
+        individual_info.columns = [column_renamed, "Messages"]
+
+        person = set(individual_info[column_renamed].unique())
+
+        if all_col_names != person:
+            diff = all_col_names - person
+            for d in diff:
+                individual_info = individual_info.append({column_renamed: d, "Messages": 0}, ignore_index=True)
+        tmp = individual_info.set_index(column_renamed, drop=False)
+        available_data = individual_info[column_renamed].to_list()
+        ordered_data = [v for v in sorting_order if v in available_data]
+        sorted_data = tmp.loc[ordered_data]
+        values += sorted_data.to_numpy()[:, 1]
+        data.append(
+            go.Bar(
+                name=author,
+                x=[str(e) for e in ordered_data],
+                y=list(sorted_data["Messages"]),
+                marker_color=markers[c],
+            )
+        )
+
+    return go.Figure(data=data), ordered_data[np.argmax(values)]
+
+
+def bars(fig):
+    return [(bar.name, list(bar.x), [int(y) for y in bar.y], bar.marker.color) for bar in fig.data]
+
+
+if __name__ == "__main__":
+    n_messages = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    n_authors = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+
+    chat_df = make_chat_df(n_messages, n_authors)
+    # The loop was written for string calendar columns (value_counts of a categorical also lists empty values)
+    chat_df["weekday"] = chat_df["weekday"].astype(str)
+    chat_df["month"] = chat_df["month"].astype(str)
+    start = time.perf_counter()
+    cube = aggregates.build_cube(chat_df)
+    print(
+        f"{n_messages:,} messages, {n_authors} authors (cube built once per upload in "
+        f"{time.perf_counter() - start:.2f}s)"
+    )
+
+    legacy_total = cube_total = 0.0
+    for column, column_renamed, sorting_order in COLUMNS:
+        start = time.perf_counter()
+        with warnings.catch_warnings():
+            # DataFrame.append is deprecated
+            warnings.simplefilter("ignore", FutureWarning)
+            legacy_fig, legacy_top = legacy_get_frequency_info(
+                chat_df, column, column_renamed, sorting_order, cube.present_authors()
+            )
+        legacy_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        fig, top = data_analysis.get_frequency_info(cube, column, column_renamed)
+        cube_time = time.perf_counter() - start
+
+        assert bars(fig) == bars(legacy_fig) and str(top) == str(legacy_top)
+        legacy_total += legacy_time
+        cube_total += cube_time
+        print(f"  {column:>12}: per-author loop {legacy_time:7.2f}s  cube {cube_time:7.3f}s  same bars: True")
+    print(f"  {'usage plots':>12}: per-author loop {legacy_total:7.2f}s  cube {cube_total:7.3f}s")
@@ -0,0 +1,89 @@
+"""
+Compare the character loop formerly used by ``header_extractor._extract_header_parts`` with the
+regex tokenizer now used, over header lines of a synthetic export.
+
+Usage: python benchmarks/bench_header_parts.py [n_lines]
+"""
+import re
+import sys
+import time
+
+from synthetic import make_whatsapp_export
+from parser import header_extractor
+
+
+def legacy_extract_header_parts(header):
+    """Character loop tokenizer, as it was before the regex tokenizer."""
+
+    def get_last_idx_digit(v, i):
+        if i + 1 < len(v):
+            if v[i + 1].isdigit():
+                return get_last_idx_digit(v, i + 1)
+        return i
+
+    hformat_elements = []
+    hformat_template = ""
+    i = 0
+    while i < len(header):
+        if header[i].isdigit():
+            j = get_last_idx_digit(header, i)
+            hformat_elements.append(int(header[i : j + 1]))
+            hformat_template += "{}"
+            i = j
+        else:
+            if header[i] in ["[", "]"]:
+                hformat_template += "\\" + header[i]
+            else:
+                hformat_template += header[i]
+        i += 1
+    items = re.findall(r"[-|\]]\s[^:]*:", hformat_template)
+    if len(items) != 1:
+        return None
+    hformat_template = hformat_template.replace(items[0][2:-1], "%name")
+    code = " %p"
+    hformat_template = (
+        hformat_template.replace(" PM", code)
+        .replace(" AM", code)
+        .replace(" A.M.", code)
+        .replace(" P.M.", code)
+        .replace(" am", code)
+        .replace(" pm", code)
+        .replace(" a.m.", code)
+        .replace(" p.m.", code)
+    )
+    return hformat_elements, hformat_template
+
+
+def timed(func, headers):
+    start = time.perf_counter()
+    results = [func(header) for header in headers]
+    return results, time.perf_counter() - start
+
+
+def main(n_lines):
+    lines = make_whatsapp_export(n_lines).split("\n")
+    headers = [header_extractor._extract_possible_header_from_line(line) for line in lines]
+    headers = [header for header in headers if header]
+
+    legacy, legacy_time = timed(legacy_extract_header_parts, headers)
+    tokenized, tokenized_time = timed(header_extractor._extract_header_parts, headers)
+    # Usernames carry digits ("Person 3"), which only the legacy loop counts as date elements
+    assert [t for _, t in legacy] == [t for _, t in tokenized]
+    assert all(a[: len(b)] == b for (a, _), (b, _) in zip(legacy, tokenized))
+
+    print(f"{len(headers):,} headers")
+    print(f"character loop:  {legacy_time:.2f}s")
+    print(f"regex tokenizer: {tokenized_time:.2f}s ({legacy_time / tokenized_time:.1f}x)")
+
+    long_digits = "1/1/19, 9:41 PM - " + "9" * 5000 + ":"
+    try:
+        legacy_extract_header_parts(long_digits)
+        print("character loop handles a 5000 digit username")
+    except RecursionError:
+        print("character loop hits the recursion limit on a 5000 digit username")
+    header_extractor._extract_header_parts(long_digits)
+    print("regex tokenizer handles a 5000 digit username")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
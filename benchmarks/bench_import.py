@@ -0,0 +1,88 @@
+"""
+Cold start cost of the app (what every gunicorn worker and job process pays when it is spawned), measured with
+``python -X importtime -c "import app"``.
+
+Fails (exit code 1) when the median import time goes over IMPORT_BUDGET_MS, or when one of the LAZY_MODULES is
+imported at startup instead of on first use.
+
+Usage: python benchmarks/bench_import.py [n_runs]   (default: 5)
+"""
+import os
+import sys
+import statistics
+import subprocess
+
+# Budget of the median time of ``import app``, in milliseconds (about 500ms on a laptop, 750ms before the heavy
+# dependencies were imported on first use)
+IMPORT_BUDGET_MS = 650
+
+# Dependencies that must only be imported when first needed. pyarrow is left out, as recent pandas versions import
+# it at startup, and PIL.Image stands for Pillow, as plotly imports PIL (but not PIL.Image) at startup.
+LAZY_MODULES = [
+    "matplotlib",
+    "wordcloud",
+    "plotly.express",
+    "plotly.figure_factory",
+    "PIL.Image",
+    "requests",
+    "emoji",
+]
+
+# Number of modules listed in the report
+TOP_MODULES = 15
+
+REPO_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_times():
+    """Import ``app`` in a fresh interpreter.
+    Returns:
+        dict: Cumulative import time (in microseconds) of every imported module, by module name.
+    """
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        cwd=REPO_PATH,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+        check=True,
+    ).stderr
+
+    times = {}
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+if __name__ == "__main__":
+    n_runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    # The first run also compiles the bytecode, so it is left out
+    import_times()
+    runs = [import_times() for _ in range(n_runs)]
+    total_ms = statistics.median(run["app"] for run in runs) / 1000
+
+    print(
+        f"import app: {total_ms:.0f}ms (median of {n_runs} runs, budget {IMPORT_BUDGET_MS}ms)"
+    )
+    top_level = {
+        name: statistics.median(run.get(name, 0) for run in runs) / 1000
+        for name in runs[0]
+        if "." not in name and name != "app"
+    }
+    for name, ms in sorted(top_level.items(), key=lambda item: -item[1])[:TOP_MODULES]:
+        print(f"  {name:<24}{ms:8.1f}ms")
+
+    eager = [
+        name
+        for name in LAZY_MODULES
+        if any(module == name or module.startswith(name + ".") for module in runs[0])
+    ]
+    if eager:
+        print(f"Imported at startup instead of on first use: {', '.join(eager)}")
+    if total_ms > IMPORT_BUDGET_MS or eager:
+        sys.exit(1)
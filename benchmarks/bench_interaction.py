@@ -0,0 +1,89 @@
+"""
+CPU time of the callbacks run when the year dropdown of an uploaded chat changes, with the analysis context
+shared by the callbacks (``analysis_context.get_context``) and with every callback deriving its own, and when
+the same view is shown again (served by ``figure_cache``) or shown with other phone aliases (only the aggregates
+are relabelled).
+
+Usage: python benchmarks/bench_interaction.py [n_messages]   (default: 1000000)
+"""
+import os
+import sys
+import time
+import tempfile
+
+from synthetic import make_chat_df
+
+os.environ.setdefault("DATASET_DIR", tempfile.mkdtemp())
+os.environ.setdefault("JOB_WORKERS", "0")
+
+import aggregates
+import analysis_context
+import dataset_store
+import figure_cache
+import app
+
+N_AUTHORS = 12
+N_PHONE_NUMBERS = 4
+
+
+def interaction(dataset, year, phone_dps, shared):
+    """CPU seconds of the callbacks reading the chat (the jobs included, but not the HTTP calls of the quotes)."""
+    key = app.json.loads(dataset)["dataset"]
+    callbacks = [
+        lambda: app.update_messages(dataset, [year], phone_dps, [], []),
+        lambda: app.update_total_messages(dataset, [year], phone_dps, [], []),
+        lambda: app.render_word_cloud(key, year),
+        lambda: analysis_context.get_context(key, phone_dps=phone_dps).chat_df,
+    ]
+    analysis_context.clear()
+    figure_cache.CACHE.clear()
+    start = time.process_time()
+    for callback in callbacks:
+        if not shared:
+            analysis_context.clear()
+        callback()
+    return time.process_time() - start
+
+
+def context_reads(key, year, phone_dps, shared, n_callbacks=4):
+    """CPU seconds of reading the messages, aggregates and authors of the selection from its context, as every
+    callback of the interaction does (what a shared context saves, without drawing the sections)."""
+    analysis_context.clear()
+    start = time.process_time()
+    for _ in range(n_callbacks):
+        if not shared:
+            analysis_context.clear()
+        context = analysis_context.get_context(key, year, phone_dps)
+        context.data, context.cube, context.full_cube, context.users
+    return time.process_time() - start
+
+
+if __name__ == "__main__":
+    n_messages = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+
+    chat_df = make_chat_df(n_messages, N_AUTHORS, n_phone_numbers=N_PHONE_NUMBERS)
+    key = "bench-interaction"
+    dataset_store.STORE.put(key, chat_df, aggregates.build_cube(chat_df), "whatsapp")
+    dataset = '{"dataset": "%s"}' % key
+
+    phone_dps = ["Person 0"] * N_PHONE_NUMBERS
+    year = int(chat_df["year"].iloc[-1])
+    for shared in (False, True):
+        cpu = min(interaction(dataset, year, phone_dps, shared) for _ in range(3))
+        print(f"{'shared' if shared else 'per callback':>12} context: {cpu:.3f}s CPU per interaction")
+    for shared in (False, True):
+        cpu = min(context_reads(key, year, phone_dps, shared) for _ in range(3))
+        print(f"{'shared' if shared else 'per callback':>12} context: {cpu * 1000:.1f}ms CPU reading it")
+
+    # Same view again: the sections come from the figure cache (the word cloud is left to its job cache)
+    interaction(dataset, year, phone_dps, True)
+    start = time.process_time()
+    app.update_messages(dataset, [year], phone_dps, [], [])
+    app.update_total_messages(dataset, [year], phone_dps, [], [])
+    print(f"{'repeat view':>12}: {time.process_time() - start:.3f}s CPU per interaction")
+
+    start = time.process_time()
+    app.update_messages(dataset, [year], ["Person 1"] * N_PHONE_NUMBERS, [], [])
+    app.update_total_messages(dataset, [year], ["Person 1"] * N_PHONE_NUMBERS, [], [])
+    print(f"{'alias change':>12}: {time.process_time() - start:.3f}s CPU per interaction")
+    print(figure_cache.CACHE.stats())
@@ -0,0 +1,152 @@
+"""
+Compare the row-by-row timestamp construction (``parse_line``) with the
+columnar one (``file_converter.iter_parse_chat`` + ``file_converter._batch_to_df``).
+
+Usage: python benchmarks/bench_parser.py [n_messages]
+"""
+import gc
+import re
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from synthetic import make_whatsapp_export
+from parser import file_converter, parser_utils
+
+
+def parse_line(text, header, msg_end):
+    """Get date, username and message from an intervention, one row at a time (how the parser used to build
+    rows, the reference for the vectorized ``file_converter._build_dates``).
+    Args:
+        text (str): Chat text the header was found in.
+        header (re.Match): Header match of the intervention.
+        msg_end (int): Position where the message ends.
+    Returns:
+        dict: date, username and message.
+    """
+    result_ = header.groupdict()
+    if "ampm" in result_:
+        hour = int(result_["hour"])
+        mode = result_.get("ampm").lower()
+        if hour == 12 and mode == "am":
+            hour = 0
+        elif hour != 12 and mode == "pm":
+            hour += 12
+    else:
+        hour = int(result_["hour"])
+
+    # Check format of year. If year is 2-digit represented we add 2000
+    if len(result_["year"]) == 2:
+        year = int(result_["year"]) + 2000
+    else:
+        year = int(result_["year"])
+
+    if "seconds" not in result_:
+        date = datetime(
+            year,
+            int(result_["month"]),
+            int(result_["day"]),
+            hour,
+            int(result_["minutes"]),
+        )
+    else:
+        date = datetime(
+            year,
+            int(result_["month"]),
+            int(result_["day"]),
+            hour,
+            int(result_["minutes"]),
+            int(result_["seconds"]),
+        )
+    username = result_[parser_utils.COLNAMES_DF.USERNAME]
+    message = file_converter._get_message(text, header, msg_end)
+    line_dict = {
+        parser_utils.COLNAMES_DF.DATE: date,
+        parser_utils.COLNAMES_DF.USERNAME: username,
+        parser_utils.COLNAMES_DF.MESSAGE: message,
+    }
+    return line_dict
+
+
+def parse_row_by_row(text, regex):
+    headers = list(re.finditer(regex, text))
+    records = []
+    for i in range(len(headers)):
+        msg_end = headers[i + 1].start() if i < len(headers) - 1 else len(text)
+        records.append(parse_line(text, headers[i], msg_end))
+    return pd.DataFrame.from_records(records)
+
+
+def parse_columnar(text, regex):
+    frames = [
+        file_converter._batch_to_df(batch)
+        for batch in file_converter.iter_parse_chat([text], regex)
+    ]
+    return pd.concat(frames, ignore_index=True)
+
+
+def dates_row_by_row(text, headers):
+    return [
+        parse_line(text, header, header.end())[
+            parser_utils.COLNAMES_DF.DATE
+        ]
+        for header in headers
+    ]
+
+
+def dates_columnar(headers, group_names):
+    dates = []
+    for start in range(0, len(headers), file_converter.BATCH_SIZE):
+        batch_headers = headers[start : start + file_converter.BATCH_SIZE]
+        batch = file_converter._transpose(
+            group_names,
+            [header.groups() for header in batch_headers],
+            [""] * len(batch_headers),
+        )
+        dates.append(file_converter._build_dates(batch))
+    return np.concatenate(dates)
+
+
+def timed(func, *args):
+    gc.collect()
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main(n_messages):
+    text = make_whatsapp_export(n_messages)
+    # Same detection as file_converter.convert_file_to_df: header format, then date order, on the head of the chat
+    sample_text = text[: file_converter.HEADER_SAMPLE_SIZE]
+    hformat, _ = file_converter.detect_date_order(*file_converter._detect_header(sample_text), sample_text)
+    regex, _ = file_converter.generate_regex(hformat)
+
+    print(f"{n_messages:,} messages")
+
+    # Timestamp construction only, on the same header matches
+    headers = list(re.finditer(regex, text))
+    group_names = sorted(re.compile(regex).groupindex, key=re.compile(regex).groupindex.get)
+    row_dates, row_time = timed(dates_row_by_row, text, headers)
+    columnar_dates, columnar_time = timed(dates_columnar, headers, group_names)
+    assert list(pd.to_datetime(row_dates)) == list(columnar_dates)
+    print(
+        f"timestamps  row-by-row: {row_time:.2f}s  columnar: {columnar_time:.2f}s "
+        f"({row_time / columnar_time:.1f}x)"
+    )
+    del headers, row_dates, columnar_dates
+
+    # Whole parse, including header scan and message extraction
+    rows, row_time = timed(parse_row_by_row, text, regex)
+    columns, columnar_time = timed(parse_columnar, text, regex)
+    pd.testing.assert_frame_equal(rows, columns)
+    print(
+        f"full parse  row-by-row: {row_time:.2f}s  columnar: {columnar_time:.2f}s "
+        f"({row_time / columnar_time:.1f}x)"
+    )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,87 @@
+"""
+Compare the per-message loop formerly used by ``data_analysis.get_first_responders`` with the pair counts of the
+cube (``aggregates._count_pairs``, one bincount over the index of every consecutive pair of messages), and check
+that both give the same first-responder matrix, for the whole chat and for a year.
+
+The loop stopped at ``chat_data.shape[0] - 2``, leaving out the last pair of messages; it is run here with the
+bound fixed, and the difference with the original bound is checked to be that pair.
+
+The repository has no test suite: these assertions are the only check of the pair counts. Both sides read the
+chat in its stored order, sorted by time (``data_cleaning.sort_by_time``); for an export with messages out of
+order, the pairs differ from those of the file order the loop used to read.
+
+Usage: python benchmarks/bench_responders.py [n_messages ...]   (default: 10000 100000)
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from synthetic import make_chat_df
+import aggregates
+
+N_AUTHORS = 20
+
+
+def legacy_get_first_responders(chat_data, last_idx):
+    """Per-message loop, as it was before the cube (the figure is left out), counting the messages up to last_idx."""
+    authors = list(chat_data["author"].unique())
+
+    responder_matrix = np.zeros((len(authors), len(authors)))
+    authors_id = {name: idx for idx, name in enumerate(authors)}
+
+    col_id = chat_data.columns.get_loc("author")
+
+    for author_idx, author in enumerate(authors):
+        indices = chat_data[chat_data["author"] == author].index.values.astype(int)
+        for idx in indices:
+            if idx < last_idx:
+                responder = chat_data.iloc[idx + 1, col_id]
+                if responder != author:
+                    responder_matrix[author_idx][authors_id[responder]] += 1
+    return authors, responder_matrix
+
+
+def check(chat_data, cube):
+    """Assert the cube matches the loop with the fixed bound, and differs from the original one by the last pair.
+    Returns:
+        float: Time of the loop, in seconds.
+    """
+    start = time.perf_counter()
+    authors, expected = legacy_get_first_responders(chat_data, chat_data.shape[0] - 1)
+    loop_time = time.perf_counter() - start
+
+    cube_authors, counts = cube.responder_counts()
+    assert cube_authors == authors and np.array_equal(counts, expected)
+
+    _, original = legacy_get_first_responders(chat_data, chat_data.shape[0] - 2)
+    sender, responder = (authors.index(a) for a in chat_data["author"].iloc[-2:])
+    last_pair = np.zeros_like(expected)
+    last_pair[sender, responder] = sender != responder
+    assert np.array_equal(expected - original, last_pair)
+    return loop_time
+
+
+if __name__ == "__main__":
+    sizes = [int(n) for n in sys.argv[1:]] or [10_000, 100_000]
+
+    for n_messages in sizes:
+        chat_df = make_chat_df(n_messages, N_AUTHORS)
+
+        start = time.perf_counter()
+        author_codes, authors = pd.factorize(chat_df["author"])
+        aggregates._count_pairs(author_codes, len(authors))
+        pairs_time = time.perf_counter() - start
+
+        cube = aggregates.build_cube(chat_df)
+        loop_time = check(chat_df, cube)
+
+        year = int(chat_df["year"].iloc[-1])
+        year_df = chat_df[chat_df["year"] == year].reset_index(drop=True)
+        check(year_df, cube.select(year))
+
+        print(
+            f"{n_messages:,} messages: per-message loop {loop_time:7.2f}s  pair bincount {pairs_time * 1000:7.2f}ms  "
+            f"speedup x{loop_time / pairs_time:,.0f}  same matrices (chat and {year}): True"
+        )
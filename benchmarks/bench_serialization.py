@@ -0,0 +1,45 @@
+"""
+Compare the JSON serialization of parsed chats (what the original-df store used to hold) with the Arrow IPC
+one (``dataset_store.serialize_chat`` / ``dataset_store.deserialize_chat``): time, size and dtypes.
+
+Usage: python benchmarks/bench_serialization.py [n_messages ...]   (default: 10000 1000000)
+"""
+import sys
+import time
+
+import pandas as pd
+
+from synthetic import make_chat_df
+import dataset_store
+
+
+def json_roundtrip(chat_df):
+    start = time.perf_counter()
+    payload = chat_df.to_json(date_format="iso", orient="split")
+    dumped = time.perf_counter()
+    loaded = pd.read_json(payload, orient="split")
+    return dumped - start, time.perf_counter() - dumped, len(payload.encode()), loaded
+
+
+def arrow_roundtrip(chat_df):
+    start = time.perf_counter()
+    payload = dataset_store.serialize_chat(chat_df)
+    dumped = time.perf_counter()
+    loaded = dataset_store.deserialize_chat(payload)
+    return dumped - start, time.perf_counter() - dumped, payload.size, loaded
+
+
+if __name__ == "__main__":
+    sizes = [int(n) for n in sys.argv[1:]] or [10_000, 1_000_000]
+
+    for n_messages in sizes:
+        chat_df = make_chat_df(n_messages)
+        print(f"{n_messages:,} messages")
+        for name, roundtrip in [("json", json_roundtrip), ("arrow", arrow_roundtrip)]:
+            dump_time, load_time, size, loaded = roundtrip(chat_df)
+            same_dtypes = (loaded.dtypes == chat_df.dtypes).all()
+            print(
+                f"  {name:>5}: serialize {dump_time:7.3f}s  deserialize {load_time:7.3f}s  "
+                f"size {size / 2**20:8.1f}MB  dtypes preserved: {same_dtypes}"
+            )
+        pd.testing.assert_frame_equal(arrow_roundtrip(chat_df)[3], chat_df)
@@ -0,0 +1,79 @@
+"""
+Synthetic chats used by the benchmarks. Run the benchmarks from the repository root, e.g.
+``python benchmarks/bench_parser.py``.
+"""
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+WORDS = ["hello", "there", "what", "time", "tomorrow", "haha", "ok", "see", "you", "soon"]
+
+
+def make_whatsapp_export(n_messages, n_authors=10, seed=0):
+    """Build an Android-style WhatsApp export (``12/31/19, 9:41 PM - Name: message``).
+    Args:
+        n_messages (int): Number of messages in the export.
+        n_authors (int): Number of group members.
+        seed (int): Seed for the random generator.
+    Returns:
+        str: Exported chat as text.
+    """
+    rng = np.random.default_rng(seed)
+    minutes = np.cumsum(rng.integers(0, 30, size=n_messages))
+    dates = np.datetime64("2017-01-01T00:00") + minutes.astype("timedelta64[m]")
+    authors = rng.integers(0, n_authors, size=n_messages)
+    lengths = rng.integers(1, 12, size=n_messages)
+
+    lines = []
+    for date, author, length in zip(dates.tolist(), authors, lengths):
+        hour = date.hour % 12 or 12
+        ampm = "AM" if date.hour < 12 else "PM"
+        body = " ".join(WORDS[(author + k) % len(WORDS)] for k in range(length))
+        lines.append(
+            f"{date.month}/{date.day}/{date:%y}, {hour}:{date.minute:02d} {ampm} - Person {author}: {body}\n"
+        )
+    return "".join(lines)
+
+
+def make_chat_df(n_messages, n_authors=10, seed=0, n_phone_numbers=0):
+    """Build a parsed chat (as returned by ``data_cleaning.preprocess_input_data``) without going through the parser.
+    Args:
+        n_messages (int): Number of messages in the chat.
+        n_authors (int): Number of group members.
+        seed (int): Seed for the random generator.
+        n_phone_numbers (int): Number of group members shown by phone number instead of name.
+    Returns:
+        pd.DataFrame: Parsed chat.
+    """
+    import pandas as pd
+    import data_cleaning
+
+    rng = np.random.default_rng(seed)
+    minutes = np.cumsum(rng.integers(0, 30, size=n_messages))
+    names = [f"Person {k}" for k in range(n_authors - n_phone_numbers)] + [
+        f"+44 7700 900{k:03d}" for k in range(n_phone_numbers)
+    ]
+    bodies = np.array(
+        [" ".join(WORDS[k % len(WORDS)] for k in range(n)) for n in range(1, 12)],
+        dtype=object,
+    )
+    chat_df = pd.DataFrame(
+        {
+            "date": np.datetime64("2017-01-01T00:00", "ns") + minutes.astype("timedelta64[m]"),
+            "username": pd.array(
+                np.array(names, dtype=object)[
+                    rng.integers(0, n_authors, size=n_messages)
+                ],
+                dtype="category",
+            ),
+            "message": pd.array(
+                bodies[rng.integers(0, len(bodies), size=n_messages)], dtype="string"
+            ),
+        }
+    )
+    chat_df = data_cleaning.process_input(chat_df)
+    chat_df.reset_index(inplace=True)
+    return chat_df
@@ -1,37 +1,26 @@
-import re
 import os
-import requests
+from collections import Counter
 import numpy as np
 import pandas as pd
 from io import BytesIO
-from PIL import Image, ImageDraw, ImageFont
 
-import emoji
+# plotly.express, plotly.figure_factory, wordcloud, PIL and requests are imported by the functions using them, so
+# that they are only loaded when the first figure needing them is drawn
 import plotly
-import plotly.express as px
 import plotly.graph_objects as go
-import plotly.figure_factory as ff
-from wordcloud import WordCloud
 from dotenv import load_dotenv
 
 load_dotenv()
 
 import utils
+import aggregates
 import data_cleaning
 
 ACCESS_KEY = os.getenv("ACCESS_KEY")
 
 
-def get_busiest_day(chat_data: pd.DataFrame):
-    unique_days = [
-        [date, len(counts)]
-        for date, counts in chat_data.groupby(
-            ["day_of_month", "month", "year"]
-        ).groups.items()
-    ]
-    count = [info[1] for info in unique_days]
-    idx = count.index(max(count))
-    return unique_days[idx]
+def get_busiest_day(cube: aggregates.ChatCube):
+    return cube.busiest_day()
 
 
 def get_gap_string(timedelta):
@@ -64,16 +53,28 @@ def get_biggest_msg_gap(chat_data: pd.DataFrame):
 
 
 def display_num_of_messages(
-    chat_data: pd.DataFrame, per_year: bool = False, plot_title=""
+    cube: aggregates.ChatCube, per_year: bool = False, plot_title=""
 ):
     """
     Biggest Message block
     """
+    import plotly.express as px
+
     column = "year" if per_year else "author"
-    msg_count = chat_data[column].value_counts().to_frame()
-    msg_count.reset_index(inplace=True)
-    msg_count.columns = [column.capitalize(), "Count"]
-    total_msgs = msg_count["Count"].sum()
+    if per_year:
+        labels, counts = cube.frequency("year")
+        counts = counts.sum(axis=1)
+    else:
+        labels, counts = cube.author_counts()
+    order = np.argsort(-counts, kind="stable")
+    msg_count = pd.DataFrame(
+        {
+            column.capitalize(): [labels[i] for i in order],
+            "Count": counts[order],
+        }
+    )
+    msg_count = msg_count[msg_count["Count"] > 0]
+    total_msgs = int(msg_count["Count"].sum())
 
     fig = px.bar(
         msg_count,
@@ -109,48 +110,43 @@ def display_num_of_messages(
     return fig, total_msgs
 
 
-def get_frequency_info(
-    chat_data, column, column_renamed, sorting_order, author_names, plot_title=""
-):
-    c_gaps = [
-        (np.asarray(utils.CMAP((i + 1) / len(author_names))[:-1]) * 255).astype(
-            np.uint8
-        )
-        for i in range(len(author_names))
+def get_named_authors(cube: aggregates.ChatCube):
+    """Authors with at least one message who are not shown by phone number.
+    Returns:
+        tuple: Codes of the authors (positions in ``cube.authors``) and their names.
+    """
+    author_codes = [
+        code
+        for code in cube.present_author_codes()
+        if not data_cleaning.is_phone_number(cube.authors[code])
+    ]
+    return author_codes, [cube.authors[code] for code in author_codes]
+
+
+def get_frequency_info(cube: aggregates.ChatCube, column, column_renamed, plot_title=""):
+    author_codes = cube.present_author_codes()
+    markers = utils.get_colors(len(author_codes))
+
+    labels, counts = cube.frequency(column)
+    values = counts.sum(axis=1)
+    available = np.flatnonzero(values)
+    ordered_data = [labels[i] for i in available]
+    values = values[available]
+
+    # One stacked trace per row of the (author, value) matrix. Traces are given as dicts, validated once by
+    # the figure rather than once more as go.Bar objects, which matters for groups with hundreds of members.
+    x = [str(e) for e in ordered_data]
+    rows = counts[np.ix_(available, author_codes)].T.tolist()
+    data = [
+        {
+            "type": "bar",
+            "name": cube.authors[author_code],
+            "x": x,
+            "y": row,
+            "marker": {"color": markers[c]},
+        }
+        for c, (author_code, row) in enumerate(zip(author_codes, rows))
     ]
-    markers = ["rgb({}, {}, {})".format(e[0], e[1], e[2]) for e in c_gaps]
-
-    all_col_names = set(chat_data[column].unique())
-    data = []
-    values = [0] * len(all_col_names)
-    for c, author in enumerate(author_names):
-        individual_info = (
-            chat_data[chat_data["author"] == author][column].value_counts().to_frame()
-        )
-        individual_info.reset_index(inplace=True)
-        individual_info.columns = [column_renamed, "Messages"]
-
-        person = set(individual_info[column_renamed].unique())
-
-        if all_col_names != person:
-            diff = all_col_names - person
-            for d in diff:
-                individual_info = individual_info.append(
-                    {column_renamed: d, "Messages": 0}, ignore_index=True
-                )
-        tmp = individual_info.set_index(column_renamed, drop=False)
-        available_data = individual_info[column_renamed].to_list()
-        ordered_data = [v for v in sorting_order if v in available_data]
-        sorted_data = tmp.loc[ordered_data]
-        values += sorted_data.to_numpy()[:, 1]
-        data.append(
-            go.Bar(
-                name=author,
-                x=[str(e) for e in ordered_data],
-                y=list(sorted_data["Messages"]),
-                marker_color=markers[c],
-            )
-        )
 
     fig = go.Figure(data=data)
     fig.update_layout(barmode="stack")
@@ -177,23 +173,10 @@ def get_frequency_info(
     return fig, ordered_data[np.argmax(values)]
 
 
-def get_first_responders(chat_data: pd.DataFrame, authors: list = None):
-
-    if authors is None:
-        authors = list(chat_data["author"].unique())
-
-    responder_matrix = np.zeros((len(authors), len(authors)))
-    authors_id = {name: idx for idx, name in enumerate(authors)}
+def get_first_responders(cube: aggregates.ChatCube):
+    import plotly.figure_factory as ff
 
-    col_id = chat_data.columns.get_loc("author")
-
-    for author_idx, author in enumerate(authors):
-        indices = chat_data[chat_data["author"] == author].index.values.astype(int)
-        for idx in indices:
-            if idx < chat_data.shape[0] - 2:
-                responder = chat_data.iloc[idx + 1, col_id]
-                if responder != author:
-                    responder_matrix[author_idx][authors_id[responder]] += 1
+    authors, responder_matrix = cube.responder_counts()
 
     total_replied_msgs = np.sum(responder_matrix, axis=0)
     total_replied_msgs[np.where(total_replied_msgs == 0.0)] = 1e-3
@@ -216,45 +199,27 @@ def get_first_responders(chat_data: pd.DataFrame, authors: list = None):
     return fig
 
 
-def display_favourite_emojis(chat_data: pd.DataFrame):
-    text = " ".join(str(msg) for msg in chat_data.body)
-    all_emojis = "".join(word for word in text if emoji.is_emoji(word))
-
-    unique_emojis = list(set(all_emojis))
-    emoji_count = []
-
-    for emoj in unique_emojis:
-        count = all_emojis.count(emoj)
-        emoji_count.append(count)
-
-    arg_sorted = np.argsort(
-        emoji_count,
-    )[::-1]
-    top_emojis = [unique_emojis[arg_sorted[i]] for i in range(5)]
+def display_favourite_emojis(cube: aggregates.ChatCube):
+    all_emojis = Counter()
+    for author_emojis in cube.author_emojis():
+        all_emojis.update(author_emojis)
+    top_emojis = [emoj for emoj, _ in all_emojis.most_common(5)]
     return top_emojis
 
 
-def display_biggest_spammer(chat_data: pd.DataFrame):
-    author_names, _ = data_cleaning.get_users(chat_data)
+def display_biggest_spammer(cube: aggregates.ChatCube):
+    import plotly.express as px
+
+    author_codes, author_names = get_named_authors(cube)
+    author_links = cube.author_links()
     links_per_user = []
     favourite_site = []
 
-    for author in author_names:
-        author_msgs = chat_data[chat_data["author"] == author]
-        author_msgs_list = " ".join(str(msg) for msg in author_msgs.body)
-        websites = re.findall(
-            "https?://(?:[-\w.]|(?:%[\da-fA-F]{2}))+", author_msgs_list
-        )
-        unique_websites = list(set(websites))
-        links_per_user.append(len(websites))
-        if len(websites) > 0:
-            counts = [websites.count(site) for site in unique_websites]
-            sorted_idx = np.argsort(
-                counts,
-            )[::-1]
-            favourite_site.append(
-                [unique_websites[sorted_idx[0]], counts[sorted_idx[0]]]
-            )
+    for author_code in author_codes:
+        websites = author_links[author_code]
+        links_per_user.append(sum(websites.values()))
+        if websites:
+            favourite_site.append(list(websites.most_common(1)[0]))
         else:
             favourite_site.append([0, 0])
 
@@ -263,7 +228,7 @@ def display_biggest_spammer(chat_data: pd.DataFrame):
         pd.DataFrame.from_dict({"authors": author_names, "links": links_per_user}),
         values="links",
         names="authors",
-        color_discrete_sequence=px.colors.sequential.RdBu,
+        color_discrete_sequence=plotly.colors.sequential.RdBu,
     )
     fig.update_layout(
         title={
@@ -283,19 +248,13 @@ def display_biggest_spammer(chat_data: pd.DataFrame):
     )
 
 
-def handle_signal_media(chat_data: pd.DataFrame):
-    author_names, _ = data_cleaning.get_users(chat_data)
-    gifs_per_author = []
-    audios_per_author = []
+def handle_signal_media(cube: aggregates.ChatCube):
+    import plotly.express as px
 
-    for author in author_names:
-        author_msgs = chat_data[chat_data["author"] == author]
-        author_msgs_list = " ".join(str(msg) for msg in author_msgs.body)
-        gifs = re.findall("image/gif", author_msgs_list)
-        audios = re.findall("audio/aac", author_msgs_list)
-        videos = re.findall("video/mp4", author_msgs_list)
-        gifs_per_author.append(len(gifs) + len(videos))
-        audios_per_author.append(len(audios))
+    author_idx, author_names = get_named_authors(cube)
+    gifs = cube.media_counts("image/gif") + cube.media_counts("video/mp4")
+    gifs_per_author = gifs[author_idx].tolist()
+    audios_per_author = cube.media_counts("audio/aac")[author_idx].tolist()
 
     idx_gif_spammer = gifs_per_author.index(max(gifs_per_author))
     gif_person = author_names[idx_gif_spammer]
@@ -307,7 +266,7 @@ def handle_signal_media(chat_data: pd.DataFrame):
         pd.DataFrame.from_dict({"authors": author_names, "media": gifs_per_author}),
         values="media",
         names="authors",
-        color_discrete_sequence=px.colors.sequential.RdBu,
+        color_discrete_sequence=plotly.colors.sequential.RdBu,
     )
 
     fig_gifs.update_layout(
@@ -325,7 +284,7 @@ def handle_signal_media(chat_data: pd.DataFrame):
         pd.DataFrame.from_dict({"authors": author_names, "media": audios_per_author}),
         values="media",
         names="authors",
-        color_discrete_sequence=px.colors.sequential.RdBu,
+        color_discrete_sequence=plotly.colors.sequential.RdBu,
     )
     fig_audios.update_layout(
         title={
@@ -341,15 +300,11 @@ def handle_signal_media(chat_data: pd.DataFrame):
     return gif_person, fig_gifs, audio_person, fig_audios
 
 
-def handle_android_media(chat_data: pd.DataFrame, prase: str):
-    author_names, _ = data_cleaning.get_users(chat_data)
-    media_per_author = []
+def handle_android_media(cube: aggregates.ChatCube, prase: str):
+    import plotly.express as px
 
-    for author in author_names:
-        author_msgs = chat_data[chat_data["author"] == author]
-        author_msgs_list = " ".join(str(msg) for msg in author_msgs.body)
-        media = re.findall(prase, author_msgs_list)
-        media_per_author.append(len(media))
+    author_idx, author_names = get_named_authors(cube)
+    media_per_author = cube.media_counts(prase)[author_idx].tolist()
 
     idx_media_spammer = media_per_author.index(max(media_per_author))
     media_person = author_names[idx_media_spammer]
@@ -358,7 +313,7 @@ def handle_android_media(chat_data: pd.DataFrame, prase: str):
         pd.DataFrame.from_dict({"authors": author_names, "media": media_per_author}),
         values="media",
         names="authors",
-        color_discrete_sequence=px.colors.sequential.RdBu,
+        color_discrete_sequence=plotly.colors.sequential.RdBu,
     )
     fig.update_layout(
         title={
@@ -373,22 +328,16 @@ def handle_android_media(chat_data: pd.DataFrame, prase: str):
     return media_person, fig, max(media_per_author), []
 
 
-def handle_iphone_media(chat_data: pd.DataFrame, language: str):
-    author_names, _ = data_cleaning.get_users(chat_data)
+def handle_iphone_media(cube: aggregates.ChatCube, language: str):
+    import plotly.express as px
+
+    author_idx, author_names = get_named_authors(cube)
 
     gif_phrase = utils.GIF_OMITTED_LANG.get(language)
     audio_phrase = utils.AUDIO_OMITTED_LANG.get(language)
 
-    gifs_per_author = []
-    audios_per_author = []
-
-    for author in author_names:
-        author_msgs = chat_data[chat_data["author"] == author]
-        author_msgs_list = " ".join(str(msg) for msg in author_msgs.body)
-        gifs = re.findall(gif_phrase, author_msgs_list)
-        audios = re.findall(audio_phrase, author_msgs_list)
-        gifs_per_author.append(len(gifs))
-        audios_per_author.append(len(audios))
+    gifs_per_author = cube.media_counts(gif_phrase)[author_idx].tolist()
+    audios_per_author = cube.media_counts(audio_phrase)[author_idx].tolist()
 
     idx_gif_spammer = gifs_per_author.index(max(gifs_per_author))
     gif_person = author_names[idx_gif_spammer]
@@ -400,7 +349,7 @@ def handle_iphone_media(chat_data: pd.DataFrame, language: str):
         pd.DataFrame.from_dict({"authors": author_names, "media": gifs_per_author}),
         values="media",
         names="authors",
-        color_discrete_sequence=px.colors.sequential.RdBu,
+        color_discrete_sequence=plotly.colors.sequential.RdBu,
     )
     fig_gif.update_layout(
         title={
@@ -417,7 +366,7 @@ def handle_iphone_media(chat_data: pd.DataFrame, language: str):
         pd.DataFrame.from_dict({"authors": author_names, "media": audios_per_author}),
         values="media",
         names="authors",
-        color_discrete_sequence=px.colors.sequential.RdBu,
+        color_discrete_sequence=plotly.colors.sequential.RdBu,
     )
     fig_audio.update_layout(
         title={
@@ -433,22 +382,20 @@ def handle_iphone_media(chat_data: pd.DataFrame, language: str):
     return gif_person, fig_gif, audio_person, fig_audio
 
 
-def display_media_person(chat_data: pd.DataFrame, input_source: str):
+def display_media_person(cube: aggregates.ChatCube, input_source: str):
 
     if input_source == "signal":
-        return handle_signal_media(chat_data)
+        return handle_signal_media(cube)
     else:
-        body = " ".join(str(msg) for msg in chat_data.body)
-
         try:
             for android_media in utils.ANDROID_MEDIA_OMITTED:
-                if android_media in body:
-                    return handle_android_media(chat_data, android_media)
+                if cube.media_counts(android_media).sum() > 0:
+                    return handle_android_media(cube, android_media)
 
             for iphone_media in list(utils.IPHONE_MEDIA_OMITTED.keys()):
-                if iphone_media in body:
+                if cube.media_counts(iphone_media).sum() > 0:
                     return handle_iphone_media(
-                        chat_data, utils.IPHONE_MEDIA_OMITTED[iphone_media]
+                        cube, utils.IPHONE_MEDIA_OMITTED[iphone_media]
                     )
         except:
             return None, None, None, None
@@ -457,11 +404,13 @@ def display_media_person(chat_data: pd.DataFrame, input_source: str):
 
 
 def generate_word_cloud(chat_data: pd.DataFrame):
+    from wordcloud import WordCloud
+
     text = " ".join(str(msg) for msg in chat_data.body)
 
     # Generate a word cloud image
     wc = WordCloud(
-        stopwords=utils.stopwords,
+        stopwords=utils.get_stopwords(),
         background_color="white",
         width=1600,
         height=1000,
@@ -497,7 +446,10 @@ def split_sentence(input_phrase, char_per_line=22):
     return sentences
 
 
-def display_quote(chat_data: pd.DataFrame):
+def display_quote(chat_data: pd.DataFrame, aliases: dict = None):
+    import requests
+    from PIL import Image, ImageDraw, ImageFont
+
     count = 0
     images = {}
     captions = {}
@@ -521,6 +473,8 @@ def display_quote(chat_data: pd.DataFrame):
         i = np.random.randint(0, chat_data.shape[0], size=1)[0]
         txt = "'{}'".format(chat_data.iloc[i, body_idx])
         author = chat_data.iloc[i, author_idx]
+        if aliases:
+            author = aliases.get(author, author)
 
         if (
             5 < len(txt) < 200
@@ -1,43 +1,138 @@
+import os
 import re
+import numpy as np
 import pandas as pd
-from io import StringIO
+from io import BytesIO, TextIOWrapper
+from zipfile import ZipFile
+from dotenv import load_dotenv
+
+load_dotenv()
 
 from parser import file_converter
 import utils
 
+# Number of processes used to parse large WhatsApp exports (see file_converter.PARALLEL_MIN_SIZE)
+PARSER_PROCESSES = int(os.getenv("PARSER_PROCESSES", "1"))
+
+# Number of bytes looked at to route an upload to the right parser
+SNIFF_SIZE = 4096
+
+ZIP_MAGIC = b"PK\x03\x04"
+
+BOM_ENCODINGS = [
+    (b"\xef\xbb\xbf", "utf-8-sig"),
+    (b"\xff\xfe", "utf-16"),
+    (b"\xfe\xff", "utf-16"),
+]
+
+# Columns identifying the CSV format (e.g. the demo chat) as opposed to exported WhatsApp text
+SIGNAL_COLUMNS = {"datetime", "author", "body"}
+
 
 def preprocess_input_data(chat_file):
 
     chat_df = None
     source = None
 
+    file_format, encoding = sniff_format(chat_file[:SNIFF_SIZE])
+
     try:
-        chat = pd.read_csv(
-            StringIO(chat_file.decode("utf-8")), sep=",", parse_dates=[0]
-        )
-        return chat, "signal"
-    except:
-        pass
-    try:
-        og_df = file_converter.convert_text_to_df(
-            StringIO(chat_file.decode("utf-8")).read()
+        if file_format == "zip":
+            return preprocess_input_data(read_zipped_chat(chat_file))
+
+        # The file is decoded while it is being parsed (see file_converter.convert_file_to_df)
+        text_file = TextIOWrapper(BytesIO(chat_file), encoding=encoding)
+
+        if file_format == "signal":
+            chat = pd.read_csv(
+                text_file, sep=",", parse_dates=[0], dtype={"author": "category"}
+            )
+            return sort_by_time(chat), "signal"
+
+        og_df = file_converter.convert_file_to_df(
+            text_file, processes=PARSER_PROCESSES
         )
         chat = process_input(og_df.iloc[1:])
         chat.reset_index(inplace=True)
-        return chat, "whatsapp"
+        return sort_by_time(chat), "whatsapp"
     except:
         return chat_df, source
 
 
+def sort_by_time(chat_df):
+    """Keep the messages in time order, so that any period of the chat is a slice of it (see
+    analysis_context.AnalysisContext.data).
+    Exports with messages out of order (e.g. a phone clock changed while chatting) are reordered, so the first
+    responders (see aggregates._count_pairs) are then counted over consecutive messages in time, not in the
+    order of the file.
+    Args:
+        chat_df (pd.DataFrame): Parsed chat.
+    Returns:
+        pd.DataFrame: The chat, sorted by "datetime" (messages sent at the same time keep their order).
+    """
+    if chat_df["datetime"].is_monotonic_increasing:
+        return chat_df
+    return chat_df.sort_values("datetime", kind="stable", ignore_index=True)
+
+
+def sniff_format(head):
+    """Guess the format and encoding of an uploaded file from its first bytes.
+    Args:
+        head (bytes): Start of the file (a few KB).
+    Returns:
+        tuple: Format ("zip", "signal" or "whatsapp") and encoding to decode the file with. iOS and Android
+               exports are not told apart, the header detection handles both.
+    """
+    if head.startswith(ZIP_MAGIC):
+        return "zip", None
+
+    encoding = "utf-8"
+    for bom, bom_encoding in BOM_ENCODINGS:
+        if head.startswith(bom):
+            encoding = bom_encoding
+            break
+    else:
+        # UTF-16 without BOM has a NUL byte next to every ASCII character
+        if head[1::2].count(0) > len(head) // 4:
+            encoding = "utf-16-le"
+        elif head[::2].count(0) > len(head) // 4:
+            encoding = "utf-16-be"
+
+    # Characters cut at the end of the sample are dropped
+    text = head.decode(encoding, errors="ignore")
+    first_line = text.lstrip().split("\n", 1)[0].strip()
+    columns = {column.strip().lower() for column in first_line.split(",")}
+    if SIGNAL_COLUMNS <= columns:
+        return "signal", encoding
+    return "whatsapp", encoding
+
+
+def read_zipped_chat(chat_file):
+    """Get the chat from a zipped WhatsApp export.
+    Args:
+        chat_file (bytes): Zip file content.
+    Returns:
+        bytes: Content of the chat text file (``_chat.txt`` on iOS, the only ``.txt`` on Android).
+    """
+    with ZipFile(BytesIO(chat_file)) as archive:
+        names = [name for name in archive.namelist() if name.endswith(".txt")]
+        names.sort(key=lambda name: not name.endswith("_chat.txt"))
+        return archive.read(names[0])
+
+
 def process_input(chat_data: pd.DataFrame):
 
-    (
-        chat_data["day_of_month"],
-        chat_data["weekday"],
-        chat_data["month"],
-        chat_data["year"],
-        chat_data["hour_of_day"],
-    ) = zip(*chat_data["date"].map(seprate_date))
+    # Calendar columns: month and weekday as ordered categoricals, the rest as small integers
+    dates = chat_data["date"].dt
+    chat_data["day_of_month"] = dates.day.astype(np.int8)
+    chat_data["weekday"] = pd.Categorical.from_codes(
+        dates.weekday, categories=utils.WEEKDAYS, ordered=True
+    )
+    chat_data["month"] = pd.Categorical.from_codes(
+        dates.month - 1, categories=utils.MONTHS, ordered=True
+    )
+    chat_data["year"] = dates.year.astype(np.int16)
+    chat_data["hour_of_day"] = dates.hour.astype(np.int8)
 
     chat_data.rename(
         columns={"date": "datetime", "username": "author", "message": "body"},
@@ -46,36 +141,26 @@ def process_input(chat_data: pd.DataFrame):
     return chat_data
 
 
-def seprate_date(tstamp):
-    return (
-        str(tstamp.day),
-        utils.WEEKDAYS[tstamp.weekday()],
-        utils.MONTHS[tstamp.month - 1],
-        str(tstamp.year),
-        str(tstamp.hour),
-    )
-
-
-def get_users(chat_data):
-    list_of_authors = list(chat_data["author"].unique())
+def split_phone_numbers(list_of_authors):
     author_names = []
     phone_numbers = []
     for author in list_of_authors:
-        is_name_numerical = re.search(r"(\+\d+)", author)
-        if is_name_numerical is None:
-            author_names.append(author)
-        else:
+        if is_phone_number(author):
             phone_numbers.append(author)
+        else:
+            author_names.append(author)
     return author_names, phone_numbers
 
 
-def fix_phone_numbers(chat_data, phone_dropdowns):
-    _, phone_numbers = get_users(chat_data)
-    num_name_pairs = {
+def is_phone_number(author):
+    return re.search(r"(\+\d+)", author) is not None
+
+
+def get_phone_aliases(list_of_authors, phone_dropdowns):
+    _, phone_numbers = split_phone_numbers(list_of_authors)
+    return {
         pn: name
         for pn, name in zip(phone_numbers, phone_dropdowns)
         if name != "Use number"
     }
 
-    for num, name in num_name_pairs.items():
-        chat_data.loc[chat_data["author"] == num, "author"] = name
@@ -0,0 +1,260 @@
+import os
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import aggregates
+
+# Memory (in bytes) the parsed chats kept in the store may take, before the least recently used are dropped
+DATASET_STORE_BYTES = int(os.getenv("DATASET_STORE_BYTES", str(512 * 1024 * 1024)))
+
+# Folder where parsed chats are persisted, so that every worker process can load them
+DATASET_DIR = os.getenv(
+    "DATASET_DIR", os.path.join(tempfile.gettempdir(), "chatdash_datasets")
+)
+
+# Disk space (in bytes) the persisted chats may take, before the least recently used are deleted
+DATASET_DIR_BYTES = int(os.getenv("DATASET_DIR_BYTES", str(2 * 1024 * 1024 * 1024)))
+
+# Extension of the persisted chats (Arrow IPC file format, a.k.a. Feather v2)
+DATASET_EXTENSION = ".arrow"
+
+
+def dataset_key(chat_file):
+    """Key of an uploaded chat in the store.
+    Args:
+        chat_file (bytes): Content of the uploaded file.
+    Returns:
+        str: Hex digest of the content, so uploading the same file twice reuses the parsed chat.
+    """
+    return hashlib.sha256(chat_file).hexdigest()
+
+
+def serialize_chat(chat_df):
+    """Serialize a parsed chat to the Arrow IPC format.
+    Datetimes are stored as int64 nanoseconds, categoricals as dictionaries and strings as a single
+    offsets + bytes buffer, so nothing has to be parsed or re-inferred when reading it back.
+    Args:
+        chat_df (pd.DataFrame): Parsed chat.
+    Returns:
+        pyarrow.Buffer: Serialized chat (supports the buffer protocol, e.g. ``bytes(buffer)``).
+    """
+    import pyarrow as pa
+
+    sink = pa.BufferOutputStream()
+    _write_chat(chat_df, sink)
+    return sink.getvalue()
+
+
+def deserialize_chat(source):
+    """Read back a chat serialized with ``serialize_chat``.
+    Args:
+        source (bytes, pyarrow.Buffer or str): Serialized chat, or path of a file holding it. Files are
+            memory-mapped, so fixed-width columns are not copied.
+    Returns:
+        pd.DataFrame: Parsed chat, with the dtypes it was serialized with.
+    """
+    return _read_chat(source)[0]
+
+
+class DatasetStore:
+    """Parsed chats and their aggregates kept server-side, so that only their key travels to the browser.
+    Chats live in memory (LRU bounded by ``max_bytes``) and are persisted to ``directory`` (LRU bounded by
+    ``max_dir_bytes``), from where a worker process that did not parse a chat loads it.
+    """
+
+    def __init__(
+        self,
+        max_bytes=DATASET_STORE_BYTES,
+        directory=DATASET_DIR,
+        max_dir_bytes=DATASET_DIR_BYTES,
+    ):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.max_dir_bytes = max_dir_bytes
+        self._datasets = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+
+    def __contains__(self, key):
+        with self._lock:
+            if key in self._datasets:
+                return True
+        return os.path.exists(self._path(key))
+
+    def keeps(self, key, cube):
+        """Whether the chat of key, whose aggregates are cube, is kept in memory (not only on disk)."""
+        with self._lock:
+            stored = self._datasets.get(key)
+        return stored is not None and stored[1] is cube
+
+    def put(self, key, chat_df, cube, input_source):
+        """Add a parsed chat, evicting the least recently used ones if over the memory budget.
+        Args:
+            key (str): Key of the chat, see ``dataset_key``.
+            chat_df (pd.DataFrame): Parsed chat. The store takes ownership of it.
+            cube (aggregates.ChatCube): Aggregates of the chat.
+            input_source (str): Source of the chat ("whatsapp" or "signal").
+        """
+        self._persist(key, chat_df, input_source)
+        self._keep(key, chat_df, cube, input_source)
+
+    def get(self, key):
+        """Get a parsed chat.
+        Args:
+            key (str): Key of the chat, see ``dataset_key``.
+        Returns:
+            tuple: Read-only view of the chat, its aggregates and its source. (None, None, None) if the chat is
+                   not (or no longer) stored.
+        """
+        with self._lock:
+            stored = self._datasets.get(key)
+            if stored is not None:
+                self._datasets.move_to_end(key)
+
+        if stored is None:
+            stored = self._load(key)
+            if stored is None:
+                return None, None, None
+            self._keep(key, *stored)
+
+        chat_df, cube, input_source = stored[:3]
+        # Shallow copy: columns added or replaced by a callback do not reach the stored frame
+        return chat_df.copy(deep=False), cube, input_source
+
+    def _keep(self, key, chat_df, cube, input_source):
+        _freeze(chat_df)
+        cube.counts.flags.writeable = False
+        nbytes = int(chat_df.memory_usage(index=True, deep=True).sum()) + cube.nbytes
+        with self._lock:
+            if key in self._datasets:
+                self._nbytes -= self._datasets.pop(key)[3]
+            self._datasets[key] = (chat_df, cube, input_source, nbytes)
+            self._nbytes += nbytes
+            # The chat just added is kept even if it is over the budget on its own
+            while self._nbytes > self.max_bytes and len(self._datasets) > 1:
+                evicted_key, (*_, evicted_nbytes) = self._datasets.popitem(last=False)
+                self._nbytes -= evicted_nbytes
+                logging.info("Dataset %s evicted from the store", evicted_key[:12])
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + DATASET_EXTENSION)
+
+    def _persist(self, key, chat_df, input_source):
+        """Write the chat atomically, so a concurrent reader never sees a partial file."""
+        path = self._path(key)
+        if _touch(path):
+            return
+        try:
+            # Uploaded chats are private: the folder is only readable by the user running the app (chmod
+            # fails, and nothing is written, if it was created by someone else)
+            os.makedirs(self.directory, mode=0o700, exist_ok=True)
+            os.chmod(self.directory, 0o700)
+            with tempfile.NamedTemporaryFile(dir=self.directory, delete=False) as tmp_file:
+                _write_chat(chat_df, tmp_file, {"input_source": input_source})
+            os.replace(tmp_file.name, path)
+        except OSError:
+            logging.info("Dataset %s could not be persisted", key[:12])
+        self._prune(keep=path)
+
+    def _prune(self, keep):
+        """Delete the least recently used persisted chats (but keep) while they take more than ``max_dir_bytes``."""
+        try:
+            with os.scandir(self.directory) as entries:
+                files = [
+                    (entry.stat().st_mtime, entry.stat().st_size, entry.path)
+                    for entry in entries
+                    if entry.name.endswith(DATASET_EXTENSION)
+                ]
+        except OSError:
+            return
+        total = sum(size for _, size, _ in files)
+        # The oldest files go first, loading a chat refreshes its modification time (see _load)
+        for _, size, path in sorted(files):
+            if total <= self.max_dir_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            logging.info("Dataset file %s deleted", os.path.basename(path)[:12])
+
+    def _load(self, key):
+        path = self._path(key)
+        if not _touch(path):
+            return None
+        try:
+            chat_df, metadata = _read_chat(path)
+        except FileNotFoundError:
+            # Deleted by another worker pruning the folder
+            return None
+        logging.info("Dataset %s loaded from %s", key[:12], path)
+        return chat_df, aggregates.build_cube(chat_df), metadata["input_source"]
+
+
+def _write_chat(chat_df, sink, metadata=None):
+    """Write chat_df to sink in the Arrow IPC file format, with metadata (str to str) in its schema."""
+    # pyarrow is imported on first use, so serving the demo dashboard does not load it
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(chat_df, preserve_index=False)
+    if metadata:
+        table = table.replace_schema_metadata(
+            {
+                **table.schema.metadata,
+                **{k.encode(): v.encode() for k, v in metadata.items()},
+            }
+        )
+    with pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+
+
+def _read_chat(source):
+    """Read a chat written by ``_write_chat``, returning it along with the metadata of its schema."""
+    import pyarrow as pa
+
+    if isinstance(source, str):
+        source = pa.memory_map(source, "r")
+    table = pa.ipc.open_file(source).read_all()
+    metadata = {k.decode(): v.decode() for k, v in table.schema.metadata.items()}
+    return table.to_pandas(split_blocks=True, self_destruct=True), metadata
+
+
+def _touch(path):
+    """Refresh the modification time of path, the recency used to prune the folder. False if it does not exist."""
+    try:
+        os.utime(path)
+        return True
+    except OSError:
+        return False
+
+
+def _freeze(chat_df):
+    """Mark the arrays of chat_df as read-only, so in-place writes through any view of it raise instead of
+    corrupting the store. Nothing is copied when handing out a view.
+    """
+    # A string array cannot be made read-only (pandas revalidates, in place, the values of every slice of it):
+    # strings are kept as object columns, plain numpy arrays of the same str objects
+    for column, dtype in chat_df.dtypes.items():
+        if isinstance(dtype, pd.StringDtype):
+            chat_df[column] = chat_df[column].astype(object)
+
+    # pandas has no public way to make a column read-only, its blocks are
+    for block in chat_df._mgr.blocks:
+        values = block.values
+        if isinstance(values, pd.Categorical):
+            # The codes are a read-only view of the array backing the categorical
+            values = values.codes.base
+        if isinstance(values, np.ndarray):
+            values.flags.writeable = False
+
+
+STORE = DatasetStore()
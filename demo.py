@@ -0,0 +1,122 @@
+"""
+Demo dashboard shown before any upload. Its sections are computed once by a build step and snapshotted to disk:
+
+    python demo.py
+
+The snapshot is rebuilt (by the build step, or by the first worker needing it) only when the demo data or
+SNAPSHOT_VERSION changes.
+"""
+import os
+import pickle
+import hashlib
+import logging
+import pathlib
+import tempfile
+import threading
+from functools import lru_cache
+
+import pandas as pd
+
+import aggregates
+import display_helpers
+
+# Path
+BASE_PATH = pathlib.Path(__file__).parent.resolve()
+DATA_PATH = BASE_PATH.joinpath("data").resolve()
+
+DEMO_DATA_PATH = DATA_PATH.joinpath("random_generator_v3.txt")
+
+# Snapshot of the demo sections
+DEMO_SNAPSHOT_PATH = pathlib.Path(
+    os.getenv("DEMO_SNAPSHOT_PATH", str(DATA_PATH.joinpath("demo_snapshot.pkl")))
+)
+
+# Bumped when the sections drawn from the same demo data change, so that older snapshots are rebuilt
+SNAPSHOT_VERSION = 2
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def load_demo():
+    """Demo chat and its aggregates, read on first use.
+    Returns:
+        tuple: Demo chat (pd.DataFrame) and its aggregates (aggregates.ChatCube).
+    """
+    demo_df = pd.read_csv(DEMO_DATA_PATH, parse_dates=[0], dtype={"author": "category"})
+    return demo_df, aggregates.build_cube(demo_df)
+
+
+def build_snapshot():
+    """Compute the children of every demo section.
+    Returns:
+        dict: Children of the sections, by component id, along with the hash of the demo data they come from.
+    """
+    demo_df, demo_cube = load_demo()
+    return {
+        "data_hash": _data_hash(),
+        "version": SNAPSHOT_VERSION,
+        "group-volume-data": display_helpers.initialise_table(demo_cube),
+        "unique_days": display_helpers.get_busiest_day(
+            demo_df, demo_cube, "All years"
+        ),
+        "chatting-patterns": display_helpers.initialise_chatting(demo_cube),
+        "responding-patterns": display_helpers.initialise_responder(demo_cube),
+        "emoji-patterns": display_helpers.initialise_emojis(demo_cube),
+        "media-patterns": display_helpers.initialise_media(demo_cube),
+        "word-cloud": display_helpers.get_word_cloud(demo_df),
+        "quotes-div": display_helpers.initialise_quotes(demo_df),
+    }
+
+
+def save_snapshot(snapshot):
+    """Write the snapshot atomically, so a worker never reads a partial file."""
+    with tempfile.NamedTemporaryFile(
+        dir=DEMO_SNAPSHOT_PATH.parent, delete=False
+    ) as tmp_file:
+        pickle.dump(snapshot, tmp_file)
+    os.replace(tmp_file.name, DEMO_SNAPSHOT_PATH)
+
+
+def get_snapshot():
+    """Children of the demo sections, read from disk on first use and rebuilt if the demo data changed.
+    Returns:
+        dict: Children of the sections, by component id.
+    """
+    global _snapshot
+    with _snapshot_lock:
+        if _snapshot is None:
+            _snapshot = _read_snapshot()
+            if _snapshot is None:
+                logging.info("Demo snapshot missing or out of date, rebuilding it")
+                _snapshot = build_snapshot()
+                save_snapshot(_snapshot)
+        return _snapshot
+
+
+def _read_snapshot():
+    try:
+        with open(DEMO_SNAPSHOT_PATH, "rb") as snapshot_file:
+            snapshot = pickle.load(snapshot_file)
+        if snapshot.get("version") != SNAPSHOT_VERSION:
+            return None
+        return snapshot if snapshot.get("data_hash") == _data_hash() else None
+    except FileNotFoundError:
+        return None
+    except Exception:
+        # Whatever the snapshot was written by (e.g. a module or class since renamed), it is rebuilt
+        logging.exception("Demo snapshot %s could not be read", DEMO_SNAPSHOT_PATH)
+        return None
+
+
+def _data_hash():
+    return hashlib.sha256(DEMO_DATA_PATH.read_bytes()).hexdigest()
+
+
+if __name__ == "__main__":
+    if _read_snapshot() is None:
+        save_snapshot(build_snapshot())
+        print(f"Demo snapshot written to {DEMO_SNAPSHOT_PATH}")
+    else:
+        print("Demo snapshot up to date")
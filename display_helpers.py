@@ -6,6 +6,8 @@ import pathlib
 from calendar import isleap
 from datetime import datetime
 
+import numpy as np
+
 import utils
 import data_analysis
 
@@ -13,6 +15,16 @@ import data_analysis
 BASE_PATH = pathlib.Path(__file__).parent.resolve()
 ASSETS_PATH = BASE_PATH.joinpath("assets").resolve()
 
+# How often (in ms) the browser asks for the progress of an upload
+PROGRESS_POLL_MS = 500
+
+# Calendar columns of the chatting patterns, in the order of their blocks in the usage payload
+USAGE_COLUMNS = ["month", "weekday", "hour_of_day"]
+
+# Periods offered next to the date range picker, with their number of days up to the last message (0 for the
+# whole chat)
+DATE_PRESETS = [("Whole chat", 0), ("Last 30 days", 30), ("Last 90 days", 90)]
+
 
 def description_card():
     """
@@ -175,33 +187,25 @@ def get_faq():
     )
 
 
-def get_usage_plots(chat_df, year: str = ""):
-    author_names = list(chat_df["author"].unique())
-
+def get_usage_plots(cube, year: str = ""):
     plot_title_add = f"in {year}" if year else ""
 
     month_chart, top_month = data_analysis.get_frequency_info(
-        chat_df,
+        cube,
         "month",
         "Month",
-        utils.MONTHS,
-        author_names,
         plot_title=f"Busiest Month {plot_title_add}",
     )
     day_chart, top_day = data_analysis.get_frequency_info(
-        chat_df,
+        cube,
         "weekday",
         "Weekday",
-        utils.WEEKDAYS,
-        author_names,
         plot_title=f"Busiest Day of The Week {plot_title_add}",
     )
     hour_chart, top_hour = data_analysis.get_frequency_info(
-        chat_df,
+        cube,
         "hour_of_day",
         "Hour of Day",
-        utils.HOURS,
-        author_names,
         plot_title=f"Busiest Hour of The Day {plot_title_add}",
     )
 
@@ -262,21 +266,55 @@ def get_usage_plots(chat_df, year: str = ""):
     ]
 
 
-def get_emojis(chat_df):
-    top_emojis = data_analysis.display_favourite_emojis(chat_df)
+def get_usage_payload(cube, period=None):
+    """What the chatting patterns are drawn from in the browser (see assets/usage_charts.js), sent once per chat
+    and phone aliases so that changing the year does not reach the server.
+    Args:
+        cube (aggregates.ChatCube): Aggregates of every year (or of a date range), with the phone aliases applied.
+        period (str): Label of the date range of the cube. Its years are then always shown together.
+    Returns:
+        dict: Years, authors, values of USAGE_COLUMNS and counts per (year, column value, author) as base64
+              little-endian unsigned integers. The colors and the Plotly template are in the script.
+    """
+    labels = [list(cube.frequency(column)[0]) for column in USAGE_COLUMNS]
+    counts = np.zeros(
+        (len(cube.years), sum(len(values) for values in labels), len(cube.authors)),
+        dtype=np.int64,
+    )
+    for year_idx, year in enumerate(cube.years):
+        year_cube = cube.select(year)
+        counts[year_idx] = np.concatenate(
+            [year_cube.frequency(column)[1] for column in USAGE_COLUMNS]
+        )
+
+    dtype = "uint16" if counts.max(initial=0) < 2**16 else "uint32"
+    return {
+        "years": list(cube.years),
+        "authors": list(cube.authors),
+        "labels": labels,
+        "dtype": dtype,
+        "counts": base64.b64encode(
+            counts.astype(np.dtype(dtype).newbyteorder("<")).tobytes()
+        ).decode(),
+        "period": period,
+    }
+
+
+def get_emojis(cube):
+    top_emojis = data_analysis.display_favourite_emojis(cube)
     as_str = "                   ".join(em for em in top_emojis)
     return html.H1(
         as_str, style={"width": "100%", "text-align": "center", "font-size": "86px"}
     )
 
 
-def get_biggest_spammer(chat_df, time_frame=["", "is", "have"]):
+def get_biggest_spammer(cube, time_frame=["", "is", "have"]):
     (
         spammer,
         favourite_source,
         source_quantity,
         fig,
-    ) = data_analysis.display_biggest_spammer(chat_df)
+    ) = data_analysis.display_biggest_spammer(cube)
     return [
         html.P(
             [
@@ -291,9 +329,9 @@ def get_biggest_spammer(chat_df, time_frame=["", "is", "have"]):
     ]
 
 
-def get_media_info(chat_df, source):
+def get_media_info(cube, source):
     gif_person, fig_gif, audio_person, fig_audio = data_analysis.display_media_person(
-        chat_df, source
+        cube, source
     )
 
     if fig_gif is None:
@@ -367,14 +405,18 @@ def get_word_cloud(df):
     )
 
 
-def get_busiest_day(df, years):
-    date, msg_count = data_analysis.get_busiest_day(df)
+def get_busiest_day(df, cube, years, date_range=False):
+    date, msg_count = data_analysis.get_busiest_day(cube)
     time_gap_text, gap_start, gap_end = data_analysis.get_biggest_msg_gap(df)
 
     day = utils.day_text(str(date[0]))
 
     right_now = datetime.now(tz=None)
-    if years == "All years" or years == str(right_now.year):
+    if date_range:
+        # years is the label of the date range, see analysis_context.AnalysisContext.period
+        times = df["datetime"]
+        days_so_far = (times.iloc[-1].normalize() - times.iloc[0].normalize()).days + 1
+    elif years == "All years" or years == right_now.year:
         days_so_far = (
             right_now - df.iloc[0, df.columns.get_loc("datetime")].replace(tzinfo=None)
         ).days
@@ -436,10 +478,10 @@ def get_busiest_day(df, years):
         )
 
 
-def initialise_table(df):
+def initialise_table(cube):
     children = []
     figure, total_msgs = data_analysis.display_num_of_messages(
-        df, plot_title="Total Number of Messages"
+        cube, plot_title="Total Number of Messages"
     )
     children.append(
         html.P(
@@ -456,21 +498,21 @@ def initialise_table(df):
     return children
 
 
-def initialise_chatting(df):
-    return get_usage_plots(df)
+def initialise_chatting(cube):
+    return get_usage_plots(cube)
 
 
-def initialise_responder(df):
-    fig = data_analysis.get_first_responders(df)
+def initialise_responder(cube):
+    fig = data_analysis.get_first_responders(cube)
     return dcc.Graph(figure=fig)
 
 
-def initialise_emojis(df):
-    return get_emojis(df)
+def initialise_emojis(cube):
+    return get_emojis(cube)
 
 
-def initialise_media(df):
-    return get_biggest_spammer(df) + get_media_info(df, source="android")
+def initialise_media(cube):
+    return get_biggest_spammer(cube) + get_media_info(cube, source="android")
 
 
 def get_image_html(images, captions):
@@ -510,9 +552,9 @@ def get_image_html(images, captions):
     return images_to_display
 
 
-def initialise_quotes(df):
+def initialise_quotes(df, aliases=None):
 
-    quotes = data_analysis.display_quote(df)
+    quotes = data_analysis.display_quote(df, aliases)
 
     if quotes is None:
         return None
@@ -529,7 +571,9 @@ def generate_control_card():
         children=[
             dcc.Upload(
                 id="upload-data",
-                children=html.Div(["Drag and Drop or ", html.A("chat file (.txt)")]),
+                children=html.Div(
+                    ["Drag and Drop or ", html.A("chat file (.txt or .zip)")]
+                ),
                 style={
                     "width": "100%",
                     "height": "60px",
@@ -542,14 +586,51 @@ def generate_control_card():
                 },
                 # Allow multiple files to be uploaded
                 multiple=False,
-                accept=".txt",
+                accept=".txt,.zip",
             ),
             dcc.Store(id="original-df"),
+            dcc.Store(id="upload-nonce"),
+            dcc.Interval(
+                id="progress-interval", interval=PROGRESS_POLL_MS, disabled=True
+            ),
+            html.Div(id="progress-status", children=[]),
             html.Div(id="output-data-upload", children=[]),
         ],
     )
 
 
+def get_progress_status(n_done, n_stages, text):
+    return [
+        html.Progress(value=str(n_done), max=str(n_stages), style={"width": "100%"}),
+        html.P(text),
+    ]
+
+
+def get_date_range_picker(first_day, last_day):
+    return [
+        html.Br(),
+        html.P("Or pick a period (it replaces the selected year)"),
+        dcc.RadioItems(
+            id={"type": "date-preset", "index": 0},
+            options=[{"label": label, "value": days} for label, days in DATE_PRESETS],
+            value=0,
+            labelStyle={"display": "inline-block", "margin-right": "10px"},
+        ),
+        dcc.DatePickerRange(
+            id={"type": "date-range", "index": 0},
+            min_date_allowed=first_day,
+            max_date_allowed=last_day,
+            initial_visible_month=last_day,
+            display_format="D MMM YYYY",
+            clearable=True,
+        ),
+    ]
+
+
+def get_empty_period_message(period):
+    return html.P(f"No messages were sent in {period}.")
+
+
 def get_year_dropdown(years):
     return [
         html.Br(),
@@ -0,0 +1,95 @@
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+
+import plotly
+
+# Memory (in bytes) the serialized sections kept in the cache may take, before the least recently used are dropped
+FIGURE_CACHE_BYTES = int(os.getenv("FIGURE_CACHE_BYTES", str(64 * 1024 * 1024)))
+
+
+class FigureCache:
+    """Serialized children (figures included) of the dashboard sections, by selection and section.
+    A view already drawn, e.g. a year the user flips back to, is then served without any pandas or Plotly work.
+    Every worker process has its own cache, as for the analysis contexts.
+    """
+
+    def __init__(self, max_bytes=FIGURE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._sections = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self.seconds_saved = 0.0
+
+    def get(self, selection, section, build):
+        """Get the children of a section, building them only if they are not cached.
+        Args:
+            selection (tuple): Dataset key, year and phone aliases, see ``AnalysisContext.selection``.
+            section (str): Id of the component whose children are built, e.g. "chatting-patterns".
+            build (callable): Builds the children of the section when they are not cached.
+        Returns:
+            Children of the section (components, or their JSON form when served from the cache).
+        """
+        key = selection + (section,)
+        with self._lock:
+            cached = self._sections.get(key)
+            if cached is not None:
+                self._sections.move_to_end(key)
+                payload, build_seconds = cached
+                self.hits += 1
+                self.bytes_saved += len(payload)
+                self.seconds_saved += build_seconds
+        if cached is not None:
+            return json.loads(payload)
+
+        start = time.perf_counter()
+        children = build()
+        build_seconds = time.perf_counter() - start
+        payload = json.dumps(children, cls=plotly.utils.PlotlyJSONEncoder)
+
+        with self._lock:
+            self.misses += 1
+            if key in self._sections:
+                self._nbytes -= len(self._sections.pop(key)[0])
+            self._sections[key] = (payload, build_seconds)
+            self._nbytes += len(payload)
+            while self._nbytes > self.max_bytes and len(self._sections) > 1:
+                _, (evicted_payload, _) = self._sections.popitem(last=False)
+                self._nbytes -= len(evicted_payload)
+        return children
+
+    def stats(self):
+        """Hit rate and savings of the cache since the worker process started.
+        Returns:
+            dict: Hits, misses, hit rate, bytes of serialized sections served from the cache, build time saved
+                  (in seconds), and the number and size of the cached sections.
+        """
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / requests if requests else 0.0,
+                "bytes_saved": self.bytes_saved,
+                "seconds_saved": round(self.seconds_saved, 3),
+                "sections": len(self._sections),
+                "nbytes": self._nbytes,
+                "max_bytes": self.max_bytes,
+                "pid": os.getpid(),
+            }
+
+    def clear(self):
+        """Forget every section and reset the counters."""
+        with self._lock:
+            self._sections.clear()
+            self._nbytes = 0
+            self.hits = self.misses = self.bytes_saved = 0
+            self.seconds_saved = 0.0
+
+
+CACHE = FigureCache()
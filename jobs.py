@@ -0,0 +1,223 @@
+import os
+import time
+import pickle
+import hashlib
+import logging
+import tempfile
+import functools
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# Number of processes running background jobs. 0 runs the jobs synchronously, inside the request.
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+
+# Folder where job claims and results are kept, shared by every worker process
+JOBS_DIR = os.getenv("JOBS_DIR", os.path.join(tempfile.gettempdir(), "chatdash_jobs"))
+
+# Seconds after which a job that has not finished is considered lost (e.g. its worker was killed): it is reported
+# as failed, and can be resubmitted
+JOB_STALE_SECONDS = 600
+
+# Disk space (in bytes) the job results may take, before the oldest are deleted
+JOBS_DIR_BYTES = int(os.getenv("JOBS_DIR_BYTES", str(256 * 1024 * 1024)))
+
+# Memory (in bytes) the parsed chats kept by each job process may take (see dataset_store.DATASET_STORE_BYTES)
+JOB_STORE_BYTES = int(os.getenv("JOB_STORE_BYTES", str(64 * 1024 * 1024)))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def job_id(name, *args):
+    """Id of a job, identical for identical jobs so they are only run once.
+    Args:
+        name (str): Name of the job, e.g. "word_cloud".
+        *args: Arguments identifying the job (dataset key, year, ...), with a stable repr.
+    Returns:
+        str: Hex digest of the name and arguments.
+    """
+    return hashlib.sha1(repr((name,) + args).encode()).hexdigest()
+
+
+def submit(job, function, *args):
+    """Run function(*args) in the background, unless the same job already ran or is running.
+    A job that failed is run again when submitted again.
+    Args:
+        job (str): Id of the job, see ``job_id``.
+        function (callable): Module-level function, its result must be picklable.
+        *args: Arguments of the function.
+    """
+    if os.path.exists(_result_path(job)):
+        return
+    _remove(_failure_path(job))
+    if not _claim(job):
+        return
+
+    if JOB_WORKERS == 0:
+        _run(job, function, args)
+        return
+
+    executor = _get_executor()
+    try:
+        future = executor.submit(_run, job, function, args)
+    except BrokenProcessPool:
+        # A job process died since the pool was last used: the jobs are run by a new pool
+        _discard_executor(executor)
+        executor = _get_executor()
+        future = executor.submit(_run, job, function, args)
+    future.add_done_callback(functools.partial(_check_run, job, executor))
+
+
+def result(job):
+    """Get the result of a job.
+    Args:
+        job (str): Id of the job, see ``job_id``.
+    Returns:
+        tuple: Whether the job finished and its result (None if it failed or is not finished). A job with no
+               result JOB_STALE_SECONDS after it was submitted (or no longer submitted) failed.
+    """
+    if os.path.exists(_failure_path(job)):
+        return True, None
+    try:
+        with open(_result_path(job), "rb") as result_file:
+            return True, pickle.load(result_file)
+    except (OSError, EOFError):
+        pass
+
+    try:
+        lost = time.time() - os.path.getmtime(_claim_path(job)) >= JOB_STALE_SECONDS
+    except OSError:
+        # The claim is released when the job fails, but the result may have been written meanwhile
+        lost = not os.path.exists(_result_path(job))
+    return (True, None) if lost else (False, None)
+
+
+def _get_executor():
+    global _executor
+    # Created on first use, so that every gunicorn worker gets its own pool. Job processes are started from
+    # a fork server rather than forked from the (multi-threaded) worker, so they do not inherit its locks
+    # and its memory (parsed chats, caches).
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=JOB_WORKERS,
+                mp_context=multiprocessing.get_context("forkserver"),
+                initializer=_init_job_process,
+            )
+        return _executor
+
+
+def _discard_executor(executor):
+    """Forget a broken pool, unless it was already replaced, so the next job starts a new one."""
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False)
+
+
+def _init_job_process():
+    # Job processes load the chats they need from disk, they get a smaller budget than the workers
+    import dataset_store
+
+    dataset_store.STORE.max_bytes = JOB_STORE_BYTES
+
+
+def _claim(job):
+    """Mark a job as submitted. Only one process succeeds, unless the previous claim is stale."""
+    # Results are drawn from uploaded chats: the folder is only readable by the user running the app
+    os.makedirs(JOBS_DIR, mode=0o700, exist_ok=True)
+    os.chmod(JOBS_DIR, 0o700)
+    path = _claim_path(job)
+    try:
+        os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        return True
+    except FileExistsError:
+        if time.time() - os.path.getmtime(path) < JOB_STALE_SECONDS:
+            return False
+        os.utime(path)
+        return True
+
+
+def _run(job, function, args):
+    try:
+        value = function(*args)
+    except Exception:
+        logging.exception("Job %s failed", job[:12])
+        _fail(job)
+        return
+
+    # Written atomically, so a poll never reads a partial result
+    with tempfile.NamedTemporaryFile(dir=JOBS_DIR, delete=False) as tmp_file:
+        pickle.dump(value, tmp_file)
+    os.replace(tmp_file.name, _result_path(job))
+    _prune()
+
+
+def _check_run(job, executor, future):
+    """Done callback of a job run by the pool: a job whose process died (or whose result could not be sent
+    back) failed, and a dead process breaks the pool."""
+    if future.cancelled():
+        _fail(job)
+        return
+    error = future.exception()
+    if error is None:
+        return
+    logging.error("Job %s failed: %r", job[:12], error)
+    _fail(job)
+    if isinstance(error, BrokenProcessPool):
+        _discard_executor(executor)
+
+
+def _fail(job):
+    # Failures are not kept: the marker tells the poll to stop, and the released claim lets the job run again
+    # when submitted again
+    open(_failure_path(job), "w").close()
+    _remove(_claim_path(job))
+
+
+def _prune():
+    """Delete the oldest results (and their claims) while they take more than JOBS_DIR_BYTES, and the claims
+    and failure markers older than JOB_STALE_SECONDS.
+    """
+    deadline = time.time() - JOB_STALE_SECONDS
+    results = []
+    try:
+        with os.scandir(JOBS_DIR) as entries:
+            for entry in entries:
+                stat = entry.stat()
+                if entry.name.endswith(".pkl"):
+                    results.append((stat.st_mtime, stat.st_size, entry.name[:-4]))
+                elif stat.st_mtime < deadline:
+                    _remove(entry.path)
+    except OSError:
+        return
+
+    total = sum(size for _, size, _ in results)
+    for _, size, job in sorted(results):
+        if total <= JOBS_DIR_BYTES:
+            break
+        _remove(_result_path(job))
+        _remove(_claim_path(job))
+        total -= size
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _result_path(job):
+    return os.path.join(JOBS_DIR, job + ".pkl")
+
+
+def _claim_path(job):
+    return os.path.join(JOBS_DIR, job + ".claim")
+
+
+def _failure_path(job):
+    return os.path.join(JOBS_DIR, job + ".failed")
@@ -1,10 +1,17 @@
 import re
+import logging
+import multiprocessing
+import numpy as np
 import pandas as pd
-from datetime import datetime
+from itertools import chain, islice, repeat
+from concurrent.futures import ProcessPoolExecutor
+from pandas.api.types import union_categoricals
 
+from . import format_registry
 from . import header_extractor
 
 from . import parser_utils
+from .parser_utils import generate_regex
 
 """
 The code found here has been copied/modified from:
@@ -12,109 +19,496 @@ https://github.com/lucasrodes/whatstk/blob/main/whatstk/whatsapp/parser.py
 """
 
 
-def convert_text_to_df(chat_info_as_text):
+CHUNK_SIZE = 1 << 20
+"""Number of characters read at a time when streaming a chat file."""
 
-    header_information = header_extractor.extract_header_from_text(chat_info_as_text)
-    
+BATCH_SIZE = 50000
+"""Maximum number of messages held in a single columnar batch."""
+
+HEADER_SAMPLE_SIZE = 1 << 22
+"""Number of characters read from the start of a chat file to detect its header format."""
+
+DATE_ORDER_SAMPLE_SIZE = 2000
+"""Number of headers checked to decide the date order."""
+
+PARALLEL_MIN_SIZE = 1 << 24
+"""Number of characters below which a chat is parsed serially, as the process pool would not pay off."""
+
+SHARD_SYNC_SIZE = 4096
+"""Number of characters scanned before a shard boundary to check no header spans over it."""
+
+ALERTS = "alerts"
+"""Batch key under which alert/notification lines are collected"""
+
+CHAT_COLUMNS = [
+    parser_utils.COLNAMES_DF.DATE,
+    parser_utils.COLNAMES_DF.USERNAME,
+    parser_utils.COLNAMES_DF.MESSAGE,
+]
+ALERT_COLUMNS = [parser_utils.COLNAMES_DF.DATE, parser_utils.COLNAMES_DF.MESSAGE]
+
+
+def convert_text_to_df(chat_info_as_text, with_alerts=False, processes=None):
+
+    header_information = _detect_header(chat_info_as_text)
+
+    return _convert(
+        header_information,
+        chat_info_as_text,
+        lambda r, r_x: _parse_chat_text(chat_info_as_text, r, r_x, processes),
+        with_alerts,
+    )
+
+
+def convert_file_to_df(chat_file, chunk_size=CHUNK_SIZE, with_alerts=False, processes=None):
+    """Parse a chat from a text file object without loading it into memory at once.
+    Args:
+        chat_file (io.TextIOBase): Seekable text stream with the exported chat. Each part of it is read (and
+                                   decoded) once, unless the date order has to be changed after the sample.
+        chunk_size (int): Number of characters read per chunk.
+        with_alerts (bool): Also return the alert/notification lines (joins, leaves, number changes...).
+        processes (int): If more than one, read the whole file and parse it in that many processes when it is
+                         larger than ``PARALLEL_MIN_SIZE``.
+    Returns:
+        pandas.DataFrame: Parsed chat, same as ``convert_text_to_df``. If ``with_alerts``, a tuple with the
+                          chat and a DataFrame with the date and message of each alert.
+    """
+    # The header format is detected on the start of the file only
+    sample_text = chat_file.read(HEADER_SAMPLE_SIZE)
+    header_information = _detect_header(sample_text)
+
+    if processes is not None and processes > 1:
+        text = sample_text + chat_file.read()
+        return _convert(
+            header_information,
+            sample_text,
+            lambda r, r_x: _parse_chat_text(text, r, r_x, processes),
+            with_alerts,
+        )
+
+    # The sample is the first chunk, the rest of the file is read from where the sample ends
+    position = chat_file.tell()
+
+    def parse(r, r_x):
+        chat_file.seek(position)
+        chunks = chain([sample_text], iter(lambda: chat_file.read(chunk_size), ""))
+        return _parse_chat_chunks(chunks, r, r_x)
+
+    return _convert(header_information, sample_text, parse, with_alerts)
+
+
+def _detect_header(sample_text):
+    """Get the header format from the registry of known formats, auto-detecting it if none matches.
+    Args:
+        sample_text (str): Text from the start of the chat.
+    Returns:
+        tuple: hformat and date codes. None if no header was found.
+    """
+    header_information = format_registry.REGISTRY.fingerprint(sample_text)
     if header_information is None:
-        return None
+        header_information = header_extractor.extract_header_from_text(sample_text)
+    return header_information
 
-    hformat, dates_codes= header_information[0], header_information[1]
-   
-    try:
-        # Generate regex for given hformat
-        r, r_x = generate_regex(hformat=hformat)
-        # Parse chat to DataFrame
-        df = _parse_chat(chat_info_as_text, r)
-    except:
-        day_pos = dates_codes.index("%d")
-        year_pos = dates_codes.index("%y")
-        month_pos = dates_codes.index("%m")
 
-        if (day_pos < year_pos < month_pos) or (month_pos < year_pos < day_pos):
-            hformat = hformat.replace("%y", "tmonth").replace("%m", "%y").replace("tmonth", "%m")
+def _convert(header_information, sample_text, parse, with_alerts=False):
+    """Parse a chat into a DataFrame, choosing the date order beforehand on a sample of headers.
+    The chat is parsed once with the chosen order. Only if a date out of range turns up after the sample, it is
+    parsed again with day and month swapped, and fails if that order does not fit either.
+    Args:
+        header_information (tuple): hformat and date codes found by the header extractor.
+        sample_text (str): Text from the chat used to decide the date order.
+        parse (callable): Parses the chat given the header and warning regular expressions, returning the chat
+                          and alerts dataframes.
+        with_alerts (bool): Also return the alerts dataframe.
+    Returns:
+        pandas.DataFrame: Chat dataframe, or tuple with chat and alerts dataframes if ``with_alerts``.
+    """
+    if header_information is None:
+        return (None, None) if with_alerts else None
+
+    ranked, confidence = _rank_date_orders(
+        header_information[0], header_information[1], sample_text
+    )
+    logging.info("Date order chosen was %s (confidence %.2f)", ranked[0], confidence)
 
+    for attempt, hformat in enumerate(ranked):
+        # Generate regex for given hformat
         r, r_x = generate_regex(hformat=hformat)
-        df = _parse_chat(chat_info_as_text, r)
+        try:
+            # Parse chat to DataFrame
+            df, alerts = parse(r, r_x)
+            break
+        except ValueError:
+            if attempt == len(ranked) - 1:
+                raise
+            logging.warning("Date out of range with %s after the sample, parsing again", hformat)
 
-    # try again with a different date order
+    if not df.empty:
+        format_registry.REGISTRY.register(hformat)
 
-    df = _remove_alerts_from_df(r_x, df)
-    df = _add_schema(df)
-    
+    if with_alerts:
+        return df, alerts
     return df
 
 
-def generate_regex(hformat):
-    r"""Generate regular expression from hformat.
+def detect_date_order(hformat, dates_codes, sample_text, sample_size=DATE_ORDER_SAMPLE_SIZE):
+    """Choose the order of day and month in the header using a sample of headers.
+    The detected format and the one with its day and month swapped are ranked by (i) the share of sampled
+    headers with date elements in range (e.g. month <= 12, day within the month), (ii) the share of consecutive
+    headers in chronological order and (iii) the shortest time span covered by the sample. Ties keep the
+    detected format. The year is not reordered: the header extractor tells it apart as the largest element,
+    and with 2-digit years a day/year swap would always look in range.
     Args:
-        hformat (str): Simplified syntax for the header, e.g. ``'%y-%m-%d, %H:%M:%S - %name:'``.
+        hformat (str): Header format found by the header extractor.
+        dates_codes (list): Date codes in the order they appear in the header.
+        sample_text (str): Text from the chat holding some of its headers.
+        sample_size (int): Maximum number of headers checked.
     Returns:
-        str: Regular expression corresponding to the specified syntax.
-    Example:
-        Generate regular expression corresponding to ``'hformat=%y-%m-%d, %H:%M:%S - %name:'``.
-        ..  code-block:: python
-            >>> from whatstk.whatsapp.parser import generate_regex
-            >>> generate_regex('%y-%m-%d, %H:%M:%S - %name:')
-            ('(?P<year>\\d{2,4})-(?P<month>\\d{1,2})-(?P<day>\\d{1,2}), (?P<hour>\\d{1,2}):(?P<minutes>\\d{2}):(?
-            P<seconds>\\d{2}) - (?P<username>[^:]*): ', '(?P<year>\\d{2,4})-(?P<month>\\d{1,2})-(?P<day>\\d{1,2}), (?
-            P<hour>\\d{1,2}):(?P<minutes>\\d{2}):(?P<seconds>\\d{2}) - ')
+        tuple: Chosen hformat and confidence score. The confidence is the share of sampled headers valid
+               under the chosen format, halved when the swapped order has as many sampled dates in range (the
+               order is then only told by chronology and span).
     """
-    items = re.findall(r"\%\w*", hformat)
-    for i in items:
-        hformat = hformat.replace(i, parser_utils.regex_simplifier[i])
+    ranked, confidence = _rank_date_orders(hformat, dates_codes, sample_text, sample_size)
+    return ranked[0], confidence
+
+
+def _rank_date_orders(hformat, dates_codes, sample_text, sample_size=DATE_ORDER_SAMPLE_SIZE):
+    """Candidate header formats of ``detect_date_order``, best first, and the confidence in the best one."""
+    date_order = [code for code in dates_codes if code in ("%d", "%m", "%y")]
+    candidates = [hformat]
+    if "%d" in date_order and "%m" in date_order:
+        swapped = [{"%d": "%m", "%m": "%d"}.get(code, code) for code in date_order]
+        candidates.append(_reorder_date_codes(hformat, swapped))
+
+    scores = [_date_order_score(candidate, sample_text, sample_size) for candidate in candidates]
+    ranking = sorted(range(len(candidates)), key=lambda idx: (scores[idx], -idx), reverse=True)
+    confidence = scores[ranking[0]][0]
+    if len(ranking) > 1 and scores[ranking[1]][0] == confidence:
+        confidence /= 2
+    return [candidates[idx] for idx in ranking], confidence
+
 
-    hformat = hformat + " "
-    hformat_x = hformat.split("(?P<username>[^:]*)")[0]
-    return hformat, hformat_x
+def _reorder_date_codes(hformat, order):
+    codes = iter(order)
+    return re.sub(r"%[dmy]", lambda _: next(codes), hformat)
 
 
-def _parse_chat(text, regex):
-    """Parse chat using given regex.
+def _date_order_score(hformat, sample_text, sample_size):
+    """Rank a candidate header format on a sample of headers.
     Args:
-        text (str) Whole log chat text.
-        regex (str): Regular expression
+        hformat (str): Candidate header format.
+        sample_text (str): Text from the chat holding some of its headers.
+        sample_size (int): Maximum number of headers checked.
     Returns:
-        pandas.DataFrame: DataFrame with messages sent by users, index is the date the messages was sent.
-    Raises:
-        RegexError: When provided regex could not match the text.
+        tuple: Share of headers with date elements in range, share of consecutive valid dates in
+               chronological order and negated span of the valid dates in days.
     """
-    result = []
-    headers = list(re.finditer(regex, text))
-    for i in range(len(headers)):
-        try:
-            line_dict = _parse_line(text, headers, i)
-        except KeyError:
-            pass
-        result.append(line_dict)
-    df_chat = pd.DataFrame.from_records(result)
-    df_chat = df_chat[
-        [
-            parser_utils.COLNAMES_DF.DATE,
-            parser_utils.COLNAMES_DF.USERNAME,
-            parser_utils.COLNAMES_DF.MESSAGE,
-        ]
+    header_regex = re.compile(generate_regex(hformat)[0])
+    groups = [
+        header.groups() for header in islice(header_regex.finditer(sample_text), sample_size)
     ]
-    return df_chat
+    if not groups:
+        return 0.0, 0.0, 0.0
+    batch = _transpose(_group_names(header_regex), groups, [])
+    dates, invalid = _dates_and_validity(batch)
+    dates = dates[~invalid]
+    if len(dates) < 2:
+        return 1 - invalid.mean(), 0.0, 0.0
+    in_order = (np.diff(dates) >= np.timedelta64(0)).mean()
+    span = (dates.max() - dates.min()) / np.timedelta64(1, "D")
+    return 1 - invalid.mean(), in_order, -span
+
+
+def _parse_chat_chunks(chunks, regex, regex_x):
+    """Parse chat chunks batch by batch, appending each batch to the chat and alerts frames.
+    Args:
+        chunks (iterable): Chat text split in consecutive pieces.
+        regex (str): Regular expression for headers.
+        regex_x (str): Regular expression to detect whatsapp warnings.
+    Returns:
+        tuple: Chat dataframe and alerts dataframe, both with schema applied.
+    """
+    frames, alert_frames = [], []
+    for batch in iter_parse_chat(chunks, regex, regex_x):
+        frames.append(_add_schema(_batch_to_df(batch)))
+        alert_frames.append(_add_alerts_schema(_alerts_batch_to_df(batch[ALERTS])))
+    if not frames:
+        frames = [_add_schema(pd.DataFrame(columns=CHAT_COLUMNS))]
+        alert_frames = [_add_alerts_schema(pd.DataFrame(columns=ALERT_COLUMNS))]
+    return (
+        _concat_chats(frames),
+        pd.concat(alert_frames, ignore_index=True),
+    )
 
 
-def _remove_alerts_from_df(r_x, df):
-    """Try to get rid of alert/notification messages.
+def _parse_chat_text(text, regex, regex_x, processes=None):
+    """Parse the whole chat text, splitting it in shards parsed by a process pool if requested.
+    Shards start at header boundaries and their results are concatenated in order, so the output is the same
+    as the serial parse. Texts shorter than ``PARALLEL_MIN_SIZE`` are always parsed serially.
     Args:
-        r_x (str): Regular expression to detect whatsapp warnings.
-        df (pandas.DataFrame): DataFrame with all interventions.
+        text (str): Whole log chat text.
+        regex (str): Regular expression for headers.
+        regex_x (str): Regular expression to detect whatsapp warnings.
+        processes (int): Number of processes to use, None or 1 to parse serially.
     Returns:
-        pandas.DataFrame: Fixed version of input dataframe.
+        tuple: Chat dataframe and alerts dataframe.
     """
-    df_new = df.copy()
-    df_new.loc[:, parser_utils.COLNAMES_DF.MESSAGE] = df_new[
-        parser_utils.COLNAMES_DF.MESSAGE
-    ].apply(lambda x: _remove_alerts_from_line(r_x, x))
-    return df_new
+    if processes is None or processes < 2 or len(text) < PARALLEL_MIN_SIZE:
+        return _parse_chat_chunks([text], regex, regex_x)
+
+    boundaries = _shard_boundaries(text, re.compile(regex), processes)
+    shards = [text[start:end] for start, end in zip(boundaries[:-1], boundaries[1:])]
+    # Parsing runs inside the (multi-threaded) server: the processes are started from a fork server, as the jobs
+    # (see jobs._get_executor), so they do not inherit its locks and memory
+    with ProcessPoolExecutor(
+        max_workers=min(processes, len(shards)), mp_context=multiprocessing.get_context("forkserver")
+    ) as pool:
+        results = list(
+            pool.map(_parse_chat_chunks, [[shard] for shard in shards], repeat(regex), repeat(regex_x))
+        )
+    return (
+        _concat_chats([df for df, _ in results]),
+        pd.concat([alerts for _, alerts in results], ignore_index=True),
+    )
+
+
+def _shard_boundaries(text, header_regex, n_shards):
+    """Split text positions in roughly equal shards that start at a header.
+    A header is only used as boundary if scanning from a bit earlier also finds it, i.e. no header found by
+    the serial scan spans over it.
+    Args:
+        text (str): Whole log chat text.
+        header_regex (re.Pattern): Compiled regular expression for headers.
+        n_shards (int): Number of shards wanted.
+    Returns:
+        list: Start position of each shard followed by the length of the text.
+    """
+    boundaries = [0]
+    for k in range(1, n_shards):
+        pos = max(k * len(text) // n_shards, boundaries[-1] + 1)
+        while pos < len(text):
+            header = header_regex.search(text, pos)
+            if header is None:
+                pos = len(text)
+                break
+            sync_start = max(boundaries[-1], header.start() - SHARD_SYNC_SIZE)
+            synced = any(
+                h.start() == header.start()
+                for h in header_regex.finditer(text, sync_start, header.end())
+            )
+            if synced:
+                boundaries.append(header.start())
+                break
+            pos = header.end()
+    boundaries.append(len(text))
+    return boundaries
+
+
+def iter_parse_chat(chunks, regex, regex_x=None, batch_size=BATCH_SIZE):
+    """Parse chat incrementally, yielding columnar batches of messages.
+    Only the text following the last header found so far is kept between chunks, so headers and messages
+    spanning a chunk boundary are completed once the next chunk arrives.
+    Args:
+        chunks (iterable): Chat text split in consecutive pieces.
+        regex (str): Regular expression for headers.
+        regex_x (str): Regular expression to detect whatsapp warnings. When given, alert lines trailing a
+                       message are cut from it and collected under the ``alerts`` key of the batch.
+        batch_size (int): Maximum number of messages per batch.
+    Yields:
+        dict: Raw captured header groups (e.g. year, hour, username) and message, each as a list of str.
+    """
+    header_regex = re.compile(regex)
+    alert_regex = re.compile(regex_x) if regex_x else None
+    group_names = _group_names(header_regex)
+    alert_names = _group_names(alert_regex) if alert_regex else []
+    raw = _empty_raw_batch()
+    buffer = ""
+    for chunk in chunks:
+        buffer += chunk
+        previous = None
+        for header in header_regex.finditer(buffer):
+            if previous is not None:
+                _collect_message(raw, buffer, previous, header.start(), alert_regex)
+                if len(raw["messages"]) >= batch_size:
+                    yield _new_batch(group_names, alert_names, raw)
+                    raw = _empty_raw_batch()
+            previous = header
+        # Keep last header, its message may continue in the next chunk
+        if previous is not None:
+            buffer = buffer[previous.start() :]
+
+    previous = None
+    for header in header_regex.finditer(buffer):
+        if previous is not None:
+            _collect_message(raw, buffer, previous, header.start(), alert_regex)
+            if len(raw["messages"]) >= batch_size:
+                yield _new_batch(group_names, alert_names, raw)
+                raw = _empty_raw_batch()
+        previous = header
+    if previous is not None:
+        _collect_message(raw, buffer, previous, len(buffer), alert_regex)
+
+    if raw["messages"]:
+        yield _new_batch(group_names, alert_names, raw)
+
+
+def _group_names(regex):
+    return sorted(regex.groupindex, key=regex.groupindex.get)
+
+
+def _empty_raw_batch():
+    return {"groups": [], "messages": [], "alert_groups": [], "alert_messages": []}
+
+
+def _collect_message(raw, text, header, msg_end, alert_regex):
+    """Collect the header groups and message of one intervention, splitting off trailing alerts.
+    Args:
+        raw (dict): Raw batch being filled.
+        text (str): Chat text the header was found in.
+        header (re.Match): Header match of the intervention.
+        msg_end (int): Position where the message ends.
+        alert_regex (re.Pattern): Compiled regular expression to detect whatsapp warnings, or None.
+    """
+    message = _get_message(text, header, msg_end)
+    if alert_regex is not None:
+        alert = alert_regex.search(message)
+        if alert is not None:
+            alerts = list(alert_regex.finditer(message, alert.start()))
+            for i in range(len(alerts)):
+                alert_end = alerts[i + 1].start() if i < len(alerts) - 1 else len(message)
+                raw["alert_groups"].append(alerts[i].groups())
+                raw["alert_messages"].append(message[alerts[i].end() : alert_end].strip())
+            message = message[: alert.start()]
+    raw["groups"].append(header.groups())
+    raw["messages"].append(message)
+
+
+def _new_batch(group_names, alert_names, raw):
+    """Transpose header groups collected per message into columns.
+    Args:
+        group_names (list): Names of the header groups, in capture order.
+        alert_names (list): Names of the alert groups, in capture order.
+        raw (dict): Raw batch with the groups and messages collected so far.
+    Returns:
+        dict: Group name (and message) to list of values, with the alerts found as a batch of their own.
+    """
+    batch = _transpose(group_names, raw["groups"], raw["messages"])
+    batch[ALERTS] = _transpose(alert_names, raw["alert_groups"], raw["alert_messages"])
+    return batch
+
+
+def _transpose(names, groups, messages):
+    columns = list(zip(*groups)) or [()] * len(names)
+    batch = dict(zip(names, map(list, columns)))
+    batch[parser_utils.COLNAMES_DF.MESSAGE] = messages
+    return batch
+
+
+def _batch_to_df(batch):
+    """Build date, username and message columns from a raw batch.
+    Args:
+        batch (dict): Batch yielded by ``iter_parse_chat``.
+    Returns:
+        pandas.DataFrame: DataFrame with messages sent by users.
+    """
+    return pd.DataFrame(
+        {
+            parser_utils.COLNAMES_DF.DATE: _build_dates(batch),
+            parser_utils.COLNAMES_DF.USERNAME: batch[parser_utils.COLNAMES_DF.USERNAME],
+            parser_utils.COLNAMES_DF.MESSAGE: batch[parser_utils.COLNAMES_DF.MESSAGE],
+        }
+    )
+
+
+def _alerts_batch_to_df(batch):
+    """Build date and message columns from a raw alerts batch.
+    Args:
+        batch (dict): Alerts batch, found under the ``alerts`` key of a batch yielded by ``iter_parse_chat``.
+    Returns:
+        pandas.DataFrame: DataFrame with alert/notification messages.
+    """
+    return pd.DataFrame(
+        {
+            parser_utils.COLNAMES_DF.DATE: _build_dates(batch),
+            parser_utils.COLNAMES_DF.MESSAGE: batch[parser_utils.COLNAMES_DF.MESSAGE],
+        }
+    )
+
+
+def _build_dates(batch):
+    """Build message dates from the captured header groups in one vectorized step.
+    Args:
+        batch (dict): Batch yielded by ``iter_parse_chat``.
+    Returns:
+        numpy.ndarray: Dates of the messages, as datetime64[ns].
+    Raises:
+        ValueError: When a date element is out of range (e.g. day and month swapped).
+    """
+    dates, invalid = _dates_and_validity(batch)
+    if invalid.any():
+        raise ValueError("Date elements out of range in header")
+    return dates
+
+
+def _dates_and_validity(batch):
+    """Build message dates from the captured header groups, flagging the ones out of range.
+    Args:
+        batch (dict): Batch yielded by ``iter_parse_chat``.
+    Returns:
+        tuple: Dates as datetime64[ns] (meaningless where invalid) and boolean array of invalid dates.
+    """
+    hour = _to_int_array(batch["hour"])
+    if "ampm" in batch:
+        mode = pd.Series(batch["ampm"], dtype=object).str.lower().to_numpy()
+        hour[(hour == 12) & (mode == "am")] = 0
+        hour[(hour != 12) & (mode == "pm")] += 12
+
+    # Check format of year. If year is 2-digit represented we add 2000
+    year = _to_int_array(batch["year"])
+    year[year < 100] += 2000
+
+    month = _to_int_array(batch["month"])
+    day = _to_int_array(batch["day"])
+    minutes = _to_int_array(batch["minutes"])
+    if "seconds" in batch:
+        seconds = _to_int_array(batch["seconds"])
+    else:
+        seconds = np.zeros_like(minutes)
+
+    months = ((year - 1970) * 12 + month - 1).astype("datetime64[M]")
+    days = months.astype("datetime64[D]") + (day - 1)
+    # A day past the end of its month rolls over into the next one
+    invalid = (
+        (month < 1)
+        | (month > 12)
+        | (day < 1)
+        | (days.astype("datetime64[M]") != months)
+        | (hour > 23)
+        | (minutes > 59)
+        | (seconds > 59)
+    )
+
+    time_of_day = (hour * 3600 + minutes * 60 + seconds).astype("timedelta64[s]")
+    dates = (days.astype("datetime64[s]") + time_of_day).astype("datetime64[ns]")
+    return dates, invalid
+
+
+def _to_int_array(values):
+    """Convert a list of digit strings to an int64 array.
+    Args:
+        values (list): Strings captured by the digit groups of the header.
+    Returns:
+        numpy.ndarray: Integer values.
+    """
+    array = np.fromstring(" ".join(values), dtype=np.int64, sep=" ")
+    if len(array) != len(values):
+        raise ValueError("Non numeric date element in header")
+    return array
 
 
 def _add_schema(df):
-    """Add default chat schema to df.
+    """Add default chat schema to df. Usernames are categorical: each message holds the integer code of its
+    author, and every name is stored once.
     Args:
         df (pandas.DataFrame): Chat dataframe.
     Returns:
@@ -123,90 +517,55 @@ def _add_schema(df):
     df = df.astype(
         {
             parser_utils.COLNAMES_DF.DATE: "datetime64[ns]",
-            parser_utils.COLNAMES_DF.USERNAME: pd.StringDtype(),
+            parser_utils.COLNAMES_DF.USERNAME: "category",
             parser_utils.COLNAMES_DF.MESSAGE: pd.StringDtype(),
         }
     )
     return df
 
 
-def _parse_line(text, headers, i):
-    """Get date, username and message from the i:th intervention.
+def _concat_chats(frames):
+    """Concatenate chat dataframes, merging the username categories of the frames so the column stays
+    categorical (``pd.concat`` falls back to object when they differ). Categories are sorted, like those of a
+    single frame, so they do not depend on where the chat was split in batches or shards.
     Args:
-        text (str): Whole log chat text.
-        headers (list): All headers.
-        i (int): Index denoting the message number.
-    Returns:
-        dict: i:th date, username and message.
-    """
-    result_ = headers[i].groupdict()
-    if "ampm" in result_:
-        hour = int(result_["hour"])
-        mode = result_.get("ampm").lower()
-        if hour == 12 and mode == "am":
-            hour = 0
-        elif hour != 12 and mode == "pm":
-            hour += 12
-    else:
-        hour = int(result_["hour"])
-
-    # Check format of year. If year is 2-digit represented we add 2000
-    if len(result_["year"]) == 2:
-        year = int(result_["year"]) + 2000
-    else:
-        year = int(result_["year"])
-
-    if "seconds" not in result_:
-        date = datetime(
-            year,
-            int(result_["month"]),
-            int(result_["day"]),
-            hour,
-            int(result_["minutes"]),
-        )
-    else:
-        date = datetime(
-            year,
-            int(result_["month"]),
-            int(result_["day"]),
-            hour,
-            int(result_["minutes"]),
-            int(result_["seconds"]),
-        )
-    username = result_[parser_utils.COLNAMES_DF.USERNAME]
-    message = _get_message(text, headers, i)
-    line_dict = {
-        parser_utils.COLNAMES_DF.DATE: date,
-        parser_utils.COLNAMES_DF.USERNAME: username,
-        parser_utils.COLNAMES_DF.MESSAGE: message,
-    }
-    return line_dict
+        frames (list): Chat dataframes with schema applied, in chat order.
+    Returns:
+        pandas.DataFrame: Chat dataframe.
+    """
+    username = parser_utils.COLNAMES_DF.USERNAME
+    df = pd.concat([frame.drop(columns=username) for frame in frames], ignore_index=True)
+    df.insert(
+        CHAT_COLUMNS.index(username), username, union_categoricals([frame[username] for frame in frames], sort_categories=True)
+    )
+    return df
 
 
-def _remove_alerts_from_line(r_x, line_df):
-    """Remove line content that is not desirable (automatic alerts etc.).
+def _add_alerts_schema(df):
+    """Add default alerts schema to df.
     Args:
-        r_x (str): Regula expression to detect WhatsApp warnings.
-        line_df (str): Message sent as string.
+        df (pandas.DataFrame): Alerts dataframe.
     Returns:
-        str: Cleaned message string.
+        pandas.DataFrame: Alerts dataframe with correct dtypes.
     """
-    if re.search(r_x, line_df):
-        return line_df[: re.search(r_x, line_df).start()]
-    else:
-        return line_df
+    df = df.astype(
+        {
+            parser_utils.COLNAMES_DF.DATE: "datetime64[ns]",
+            parser_utils.COLNAMES_DF.MESSAGE: pd.StringDtype(),
+        }
+    )
+    return df
 
 
-def _get_message(text, headers, i):
-    """Get i:th message from text.
+def _get_message(text, header, msg_end):
+    """Get the message following a header from text.
     Args:
-        text (str): Whole log chat text.
-        headers (list): All headers.
-        i (int): Index denoting the message number.
+        text (str): Chat text the header was found in.
+        header (re.Match): Header match of the message.
+        msg_end (int): Position where the message ends.
     Returns:
-        str: i:th message.
+        str: Message.
     """
-    msg_start = headers[i].end()
-    msg_end = headers[i + 1].start() if i < len(headers) - 1 else headers[i].endpos
+    msg_start = header.end()
     msg = text[msg_start:msg_end].strip()
     return msg
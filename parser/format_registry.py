@@ -0,0 +1,192 @@
+import os
+import re
+import json
+import logging
+import tempfile
+
+from .parser_utils import generate_regex, regex_simplifier
+
+"""
+Registry of known header formats (hformat strings, e.g. ``'%m/%d/%y, %I:%M %p - %name:'``), shared across uploads
+and processes through a JSON file, so that exports from a known locale skip header auto-detection.
+"""
+
+
+REGISTRY_PATH = os.getenv(
+    "HEADER_FORMATS_PATH",
+    os.path.join(tempfile.gettempdir(), "chatdash_header_formats", "header_formats.json"),
+)
+"""JSON file where header formats found by auto-detection are persisted. Its folder is created private (0700), and
+the file is ignored unless both are only writable by the user running the app."""
+
+KNOWN_FORMATS = [
+    # Android
+    "%m/%d/%y, %I:%M %p - %name:",
+    "%d/%m/%y, %H:%M - %name:",
+    "%d/%m/%y %H:%M - %name:",
+    # iOS
+    "\\[%d/%m/%y, %H:%M:%S\\] %name:",
+    "\\[%d/%m/%y %H:%M:%S\\] %name:",
+    "\\[%m/%d/%y, %I:%M:%S %p\\] %name:",
+]
+"""Formats registered out of the box (iOS/Android exports in en, pt and fr)."""
+
+FINGERPRINT_LINES = 50
+"""Number of lines from the start of the chat tried against the known formats."""
+
+FINGERPRINT_SHARE = 0.5
+"""Share of those lines a known format has to match to be picked."""
+
+MIN_FINGERPRINT_MATCHES = 3
+"""Minimum number of lines a known format has to match to be picked."""
+
+MAX_FORMATS = 64
+"""Maximum number of formats in the registry (every one is tried on each upload), the ones out of the box included."""
+
+MAX_FORMAT_LENGTH = 64
+"""Maximum length of a format in the registry."""
+
+FORMAT_CODES = re.compile(r"%\w*")
+"""Codes of a format, replaced by ``generate_regex``."""
+
+FORMAT_LITERALS = re.compile(r"(?:\\\[|\\\]|[^\\\[\](){}*+?|^$])*")
+"""Text allowed between the codes of a format: escaped brackets and characters with no meaning in a regex, so a
+format read from the registry file can neither repeat nor group anything."""
+
+
+class HeaderFormatRegistry:
+    """Known header formats with their compiled header regexes."""
+
+    def __init__(self, path=REGISTRY_PATH, known_formats=KNOWN_FORMATS):
+        self.path = path
+        self._patterns = {}
+        self._mtime = None
+        for hformat in known_formats:
+            self._add(hformat)
+
+    def fingerprint(self, text):
+        """Find the known format matching the most lines at the start of text.
+        Args:
+            text (str): Start of the loaded chat.
+        Returns:
+            tuple: hformat and date codes, as returned by ``header_extractor.extract_header_from_text``. None if no
+                   known format matches enough lines.
+        """
+        self._reload()
+        lines = [line for line in text.split("\n", FINGERPRINT_LINES)[:FINGERPRINT_LINES] if line.strip()]
+        if not lines:
+            return None
+
+        best_format, best_matches = None, 0
+        for hformat, pattern in self._patterns.items():
+            matches = sum(1 for line in lines if pattern.match(line))
+            if matches > best_matches:
+                best_format, best_matches = hformat, matches
+
+        if best_matches < max(MIN_FINGERPRINT_MATCHES, FINGERPRINT_SHARE * len(lines)):
+            return None
+        logging.info("Format fingerprinted as %s", best_format)
+        return best_format, dates_codes_from_hformat(best_format)
+
+    def register(self, hformat):
+        """Add a format to the registry and persist it, if not known yet (and if the registry is not full).
+        Args:
+            hformat (str): Header format.
+        """
+        self._reload()
+        if hformat in self._patterns:
+            return
+        if self._add(hformat):
+            self._save()
+
+    def _add(self, hformat):
+        """Compile a format and add it, unless it is not a valid format or the registry is full.
+        Returns:
+            bool: Whether the format was added.
+        """
+        if len(self._patterns) >= MAX_FORMATS:
+            logging.info("Header format registry is full, %r is not added.", hformat)
+            return False
+        try:
+            self._patterns[hformat] = _compile(hformat)
+        except (TypeError, ValueError, KeyError, re.error):
+            logging.warning("Invalid header format %r skipped.", hformat)
+            return False
+        return True
+
+    def _reload(self):
+        """Pick up formats registered by other processes since the file was last read."""
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+        if mtime == self._mtime:
+            return
+        self._mtime = mtime
+        if not (_private(self.path) and _private(os.path.dirname(os.path.abspath(self.path)))):
+            logging.warning("Header format registry %s is writable by other users, it is ignored.", self.path)
+            return
+        try:
+            with open(self.path) as registry_file:
+                hformats = json.load(registry_file)
+        except (OSError, ValueError):
+            logging.info("Header format registry could not be read.")
+            return
+        if not isinstance(hformats, list):
+            logging.warning("Header format registry %s is not a list, it is ignored.", self.path)
+            return
+        for hformat in hformats:
+            if hformat not in self._patterns:
+                self._add(hformat)
+
+    def _save(self):
+        """Write the formats atomically, so concurrent readers never see a partial file."""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        try:
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+            if not _private(directory):
+                logging.warning("Header format registry not saved: %s is writable by other users.", directory)
+                return
+            with tempfile.NamedTemporaryFile("w", dir=directory, delete=False) as tmp_file:
+                json.dump(list(self._patterns), tmp_file)
+            os.replace(tmp_file.name, self.path)
+            self._mtime = os.path.getmtime(self.path)
+        except OSError:
+            logging.info("Header format registry could not be saved.")
+
+
+def _compile(hformat):
+    """Header regex of a format, after checking it only has known codes, one name and no regex syntax.
+    Raises:
+        ValueError: hformat is not a valid format.
+    """
+    if not isinstance(hformat, str) or len(hformat) > MAX_FORMAT_LENGTH:
+        raise ValueError("Header format must be a string of at most %d characters" % MAX_FORMAT_LENGTH)
+    codes = FORMAT_CODES.findall(hformat)
+    if codes.count("%name") != 1 or not set(codes) <= set(regex_simplifier):
+        raise ValueError("Header format must have one %name and known date codes")
+    if not all(FORMAT_LITERALS.fullmatch(text) for text in FORMAT_CODES.split(hformat)):
+        raise ValueError("Header format must not have regex syntax outside its codes")
+    return re.compile(generate_regex(hformat)[0])
+
+
+def _private(path):
+    """Whether path belongs to the user running the app and is not writable by anyone else."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return False
+    return stat.st_uid == os.getuid() and not stat.st_mode & 0o022
+
+
+def dates_codes_from_hformat(hformat):
+    """Date codes in the order they appear in hformat.
+    Args:
+        hformat (str): Header format.
+    Returns:
+        list: Date codes, e.g. ``['%d', '%m', '%y', '%H', '%M']``.
+    """
+    return [code for code in re.findall(r"%\w", hformat) if code not in ("%p", "%P", "%n")]
+
+
+REGISTRY = HeaderFormatRegistry()
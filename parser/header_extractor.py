@@ -1,5 +1,6 @@
 import re
 import logging
+from collections import Counter
 
 import pandas as pd
 
@@ -11,24 +12,49 @@ https://github.com/lucasrodes/whatstk/blob/main/whatstk/whatsapp/auto_header.py
 
 separators = {".", ",", "-", "/", ":", "[", "]"}
 
+NAME_REGEX = re.compile(r"[-|\]]\s[^:]*:")
+"""Separator, name and colon ending the header"""
 
-def extract_header_from_text(text):
+DIGITS_REGEX = re.compile(r"(\d+)")
+
+AMPM_REGEX = re.compile(r" (?:PM|AM|A\.M\.|P\.M\.|am|pm|a\.m\.|p\.m\.)")
+
+BRACKETS_ESCAPE = str.maketrans({"[": "\\[", "]": "\\]"})
+
+
+SAMPLE_WINDOWS = 16
+"""Maximum number of windows of text sampled to detect the header format."""
+
+SAMPLE_WINDOW_SIZE = 1 << 14
+"""Number of characters in each sampled window."""
+
+MIN_SAMPLE_HEADERS = 200
+"""Minimum number of headers extracted before detection may stop early."""
+
+MODE_SHARE = 0.9
+"""Share of sampled headers the modal template must reach to be considered settled."""
+
+
+def extract_header_from_text(text, sample=True):
     """
     Extract header from text.
     Args:
         text (str): Loaded chat as string (whole text).
-        encoding (str): Encoding to use for UTF when reading/writing (ex. ‘utf-8’).
-                             `List of Python standard encodings
-                             <https://docs.python.org/3/library/codecs.html#standard-encodings>`_.
+        sample (bool): Only look at windows of text spread over the chat (head, tail, middle...), stopping as
+                       soon as the modal header template is settled. Detection time is then bounded regardless
+                       of the size of the chat. If the sampled windows never settle it (e.g. no sampled day
+                       reaches the end of a month), the whole text is used.
     Returns:
         str: Format extracted. None if no header was extracted.
     """
-    # Split lines
-    lines = text.split("\n")
-
     # Get format auto
     try:
-        hformat, dates_codes = _extract_header_format_from_lines(lines)
+        header = None
+        if sample and len(text) > SAMPLE_WINDOWS * SAMPLE_WINDOW_SIZE:
+            header = _extract_header_format_from_windows(_spread_windows(text))
+        if header is None:
+            header = _extract_header_format_from_lines(text.split("\n"))
+        hformat, dates_codes = header
         logging.info("Format found was %s", hformat)
         return hformat, dates_codes
     except Exception as err:  # noqa
@@ -36,6 +62,85 @@ def extract_header_from_text(text):
     return None
 
 
+def _spread_windows(text):
+    """Yield the lines of windows of text spread over the chat, starting with its head and tail.
+    Args:
+        text (str): Loaded chat as string (whole text).
+    Yields:
+        list: Complete lines found in the window.
+    """
+    last_start = len(text) - SAMPLE_WINDOW_SIZE
+    for fraction in _spread_fractions(SAMPLE_WINDOWS):
+        start = int(fraction * last_start)
+        lines = text[start : start + SAMPLE_WINDOW_SIZE].split("\n")
+        # Drop lines cut by the window edges
+        if start > 0:
+            lines = lines[1:]
+        if start < last_start:
+            lines = lines[:-1]
+        yield lines
+
+
+def _spread_fractions(n):
+    """Positions in [0, 1] ordered so that any prefix is spread over the interval: 0, 1, 1/2, 1/4, 3/4, 1/8...
+    Args:
+        n (int): Number of positions.
+    Returns:
+        list: Positions.
+    """
+    fractions = [0.0, 1.0]
+    denominator = 2
+    while len(fractions) < n:
+        fractions += [k / denominator for k in range(1, denominator, 2)]
+        denominator *= 2
+    return fractions[:n]
+
+
+def _extract_header_format_from_windows(windows):
+    """Extract header from windows of lines, stopping once the modal template is settled.
+    Args:
+        windows (iterable): Lists of lines of the loaded chat.
+    Returns:
+        tuple: Format of the header and its date codes. None if the template did not settle on the windows, as
+               the positions of the date elements cannot be told from them.
+    """
+    elements_list = []
+    template_list = []
+    previous_mode = None
+    for lines in windows:
+        elements, templates = _extract_elements_template_from_lines(lines)
+        elements_list += elements
+        template_list += templates
+        mode = _settled_template(elements_list, template_list)
+        if mode is not None and mode == previous_mode:
+            return _extract_header_format_from_components(elements_list, template_list)
+        previous_mode = mode
+    return None
+
+
+def _settled_template(elements_list, template_list):
+    """Modal template if enough headers agree on it and the day position can be told apart.
+    Args:
+        elements_list (list): List with component list.
+        template_list (list): List with template strings.
+    Returns:
+        str: Modal template, None if not settled yet.
+    """
+    if len(template_list) < MIN_SAMPLE_HEADERS:
+        return None
+    mode, count = Counter(template_list).most_common(1)[0]
+    if count < MODE_SHARE * len(template_list):
+        return None
+    # Day is found as the only one of the first three date elements reaching the end of a month
+    maxima = [
+        max(elements[i] for elements in elements_list if len(elements) > i)
+        for i in range(3)
+    ]
+    if sum(27 < m < 32 for m in maxima) != 1:
+        return None
+    return mode
+
+
 def _extract_header_format_from_lines(lines):
     """Extract header from list of lines.
     Args:
@@ -92,52 +197,48 @@ def _extract_possible_header_from_line(line):
 
 def _extract_header_parts(header):
     """Extract all parts from header (i.e. date elements and name).
+    The name is located first and left out of the tokenization, so digits in usernames (e.g. phone numbers)
+    do not add date elements.
     Args:
         header (str): Header.
     Returns:
         tuple: Contains two elements, (i) list with components and (ii) string template which specifies the formatting
                 of the components.
     """
-
-    def get_last_idx_digit(v, i):
-        if i + 1 < len(v):
-            if v[i + 1].isdigit():
-                return get_last_idx_digit(v, i + 1)
-        return i
-
-    hformat_elements = []
-    hformat_template = ""
-    i = 0
-    while i < len(header):
-        if header[i].isdigit():
-            j = get_last_idx_digit(header, i)
-            hformat_elements.append(int(header[i : j + 1]))
-            hformat_template += "{}"
-            i = j
-        else:
-            if header[i] in ["[", "]"]:
-                hformat_template += "\\" + header[i]
-            else:
-                hformat_template += header[i]
-        i += 1
-    items = re.findall(r"[-|\]]\s[^:]*:", hformat_template)
-    if len(items) != 1:
+    names = list(NAME_REGEX.finditer(header))
+    if len(names) != 1:
         return None
-    hformat_template = hformat_template.replace(items[0][2:-1], "%name")
-    code = " %p"
-    hformat_template = (
-        hformat_template.replace(" PM", code)
-        .replace(" AM", code)
-        .replace(" A.M.", code)
-        .replace(" P.M.", code)
-        .replace(" am", code)
-        .replace(" pm", code)
-        .replace(" a.m.", code)
-        .replace(" p.m.", code)
-    )
+    name = names[0]
+    # Keep separator and trailing colon out of the name
+    name_start, name_end = name.start() + 2, name.end() - 1
+
+    hformat_elements, prefix_template = _tokenize(header[:name_start])
+    hformat_template = AMPM_REGEX.sub(" %p", prefix_template) + "%name"
+    rest = header[name_end:]
+    if rest != ":":
+        rest_elements, rest_template = _tokenize(rest)
+        hformat_elements += rest_elements
+        hformat_template += rest_template
+    else:
+        hformat_template += rest
     return hformat_elements, hformat_template
 
 
+def _tokenize(text):
+    """Split text in digit runs and separators.
+    Args:
+        text (str): Part of a header.
+    Returns:
+        tuple: Digit runs as int and template with ``{}`` in place of each of them.
+    """
+    # Digit runs land on odd positions, separators on even ones
+    tokens = DIGITS_REGEX.split(text)
+    template = "{}".join(tokens[::2])
+    if "[" in template or "]" in template:
+        template = template.translate(BRACKETS_ESCAPE)
+    return list(map(int, tokens[1::2])), template
+
+
 def _extract_header_format_from_components(elements_list, template_list):
     """Extract header format from list containing elements and list containing templates.
     Args:
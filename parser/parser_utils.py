@@ -1,3 +1,6 @@
+import re
+
+
 class ColnamesDf:
     DATE = "date"
     """Date column"""
@@ -28,3 +31,27 @@ regex_simplifier = {
     "%p": r"(?P<ampm>[AaPp].? ?[Mm].?)",
     "%name": fr"(?P<{COLNAMES_DF.USERNAME}>[^:]*)",
 }
+
+
+def generate_regex(hformat):
+    r"""Generate regular expression from hformat.
+    Args:
+        hformat (str): Simplified syntax for the header, e.g. ``'%y-%m-%d, %H:%M:%S - %name:'``.
+    Returns:
+        str: Regular expression corresponding to the specified syntax.
+    Example:
+        Generate regular expression corresponding to ``'hformat=%y-%m-%d, %H:%M:%S - %name:'``.
+        ..  code-block:: python
+            >>> from whatstk.whatsapp.parser import generate_regex
+            >>> generate_regex('%y-%m-%d, %H:%M:%S - %name:')
+            ('(?P<year>\\d{2,4})-(?P<month>\\d{1,2})-(?P<day>\\d{1,2}), (?P<hour>\\d{1,2}):(?P<minutes>\\d{2}):(?
+            P<seconds>\\d{2}) - (?P<username>[^:]*): ', '(?P<year>\\d{2,4})-(?P<month>\\d{1,2})-(?P<day>\\d{1,2}), (?
+            P<hour>\\d{1,2}):(?P<minutes>\\d{2}):(?P<seconds>\\d{2}) - ')
+    """
+    items = re.findall(r"\%\w*", hformat)
+    for i in items:
+        hformat = hformat.replace(i, regex_simplifier[i])
+
+    hformat = hformat + " "
+    hformat_x = hformat.split("(?P<username>[^:]*)")[0]
+    return hformat, hformat_x
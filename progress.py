@@ -0,0 +1,124 @@
+import os
+import re
+import time
+import shutil
+import hashlib
+import tempfile
+
+# Folder where the progress of uploads is tracked, shared by every worker process
+PROGRESS_DIR = os.getenv(
+    "PROGRESS_DIR", os.path.join(tempfile.gettempdir(), "chatdash_progress")
+)
+
+# Stages of the analysis of an upload, in order, with the message shown while each one runs
+PIPELINE_STAGES = [
+    ("parse", "Reading your chat..."),
+    ("aggregate", "Counting messages..."),
+    ("messages", "Drawing the message totals..."),
+    ("patterns", "Drawing the chatting patterns..."),
+    ("word_cloud", "Drawing the word cloud..."),
+    ("quotes", "Picking some quotes..."),
+]
+
+FAILED = "failed"
+
+# Seconds without any stage done after which an analysis is considered failed, and its markers deleted
+PROGRESS_TIMEOUT = int(os.getenv("PROGRESS_TIMEOUT", "600"))
+
+UPLOAD_ID = re.compile(r"[0-9a-f]{40}")
+
+
+def upload_id(filename, last_modified, nonce):
+    """Id of an upload, known to the browser as soon as the file is picked.
+    Args:
+        filename (str): Name of the uploaded file.
+        last_modified (int): Last modification time of the uploaded file.
+        nonce (str): Random string drawn by the browser for this upload, so that two users uploading a file
+            with the same name and modification time do not share their progress.
+    Returns:
+        str: Hex digest of the three.
+    """
+    return hashlib.sha1(f"{filename}:{last_modified}:{nonce}".encode()).hexdigest()
+
+
+def start(upload):
+    """Forget the progress of a previous analysis of the same upload, and the markers of abandoned ones.
+    The folder of the markers is created right away, so an analysis whose worker dies before any stage is done
+    is reported as failed after PROGRESS_TIMEOUT.
+    """
+    forget(upload)
+    prune()
+    folder = _folder(upload)
+    if folder is None:
+        return
+    try:
+        os.makedirs(folder, exist_ok=True)
+    except OSError:
+        pass
+
+
+def forget(upload):
+    """Delete the markers of an upload, once its progress is no longer shown."""
+    folder = _folder(upload)
+    if folder is not None:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+def prune():
+    """Delete the markers of the uploads without any stage done for PROGRESS_TIMEOUT (e.g. the browser was closed
+    before the analysis finished).
+    """
+    deadline = time.time() - PROGRESS_TIMEOUT
+    try:
+        with os.scandir(PROGRESS_DIR) as entries:
+            stale = [
+                entry.path for entry in entries if entry.stat().st_mtime < deadline
+            ]
+    except OSError:
+        return
+    for folder in stale:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+def done(upload, stage):
+    """Mark a stage (see PIPELINE_STAGES, or FAILED) of the analysis of an upload as done.
+    A stage is an empty marker file, so concurrent workers never have to update a shared file.
+    """
+    folder = _folder(upload)
+    if folder is None:
+        return
+    try:
+        os.makedirs(folder, exist_ok=True)
+        open(os.path.join(folder, stage), "w").close()
+    except OSError:
+        pass
+
+
+def status(upload):
+    """Progress of the analysis of an upload.
+    Args:
+        upload (str): Id of the upload, see ``upload_id``.
+    Returns:
+        tuple: Number of stages done, total number of stages, message of the running stage (None when
+               finished) and whether the analysis failed.
+    """
+    folder = _folder(upload)
+    try:
+        finished = set(os.listdir(folder))
+        # Folders get a new modification time whenever a marker is added
+        stalled = os.stat(folder).st_mtime < time.time() - PROGRESS_TIMEOUT
+    except (OSError, TypeError):
+        finished, stalled = set(), False
+    n_done = sum(stage in finished for stage, _ in PIPELINE_STAGES)
+    running = [text for stage, text in PIPELINE_STAGES if stage not in finished]
+    failed = FAILED in finished or (stalled and bool(running))
+    return n_done, len(PIPELINE_STAGES), running[0] if running else None, failed
+
+
+def _folder(upload):
+    """Folder of the markers of an upload, None for anything but an id from ``upload_id`` (the id comes back
+    from the browser, so it is never trusted as a path).
+    """
+    if not isinstance(upload, str) or not UPLOAD_ID.fullmatch(upload):
+        return None
+    return os.path.join(PROGRESS_DIR, upload)
@@ -1,8 +1,9 @@
 import time
 import base64
-from matplotlib import cm
+from functools import lru_cache
 from io import BytesIO as _BytesIO
-from wordcloud import STOPWORDS
+
+import numpy as np
 
 # Variables
 HTML_IMG_SRC_PARAMETERS = "data:image/png;base64, "
@@ -50,10 +51,62 @@ DATE_ENDINGS = {
     "23": "23rd",
 }
 HOURS = [t for t in range(24)]
-CMAP = cm.get_cmap("RdYlBu")
 
-stopwords = set(STOPWORDS)
-stopwords.update(
+# Anchors of the RdYlBu colormap (ColorBrewer), evenly spaced between 0 and 1
+RDYLBU_ANCHORS = [
+    (165, 0, 38),
+    (215, 48, 39),
+    (244, 109, 67),
+    (253, 174, 97),
+    (254, 224, 144),
+    (255, 255, 191),
+    (224, 243, 248),
+    (171, 217, 233),
+    (116, 173, 209),
+    (69, 117, 180),
+    (49, 54, 149),
+]
+
+# Number of colors in the color table, as in matplotlib's colormaps
+COLOR_TABLE_SIZE = 256
+
+
+def _color_table(anchors, size):
+    """Linear interpolation of the anchors on size colors, as matplotlib's ``LinearSegmentedColormap.from_list``."""
+    colors = np.asarray(anchors, dtype=float) / 255
+    x = np.linspace(0, 1, len(colors)) * (size - 1)
+    xind = (size - 1) * np.linspace(0, 1, size)
+    ind = np.searchsorted(x, xind)[1:-1]
+    distance = ((xind[1:-1] - x[ind - 1]) / (x[ind] - x[ind - 1]))[:, None]
+    table = np.concatenate(
+        [
+            colors[:1],
+            distance * (colors[ind] - colors[ind - 1]) + colors[ind - 1],
+            colors[-1:],
+        ]
+    )
+    return np.clip(table, 0.0, 1.0)
+
+
+RDYLBU = _color_table(RDYLBU_ANCHORS, COLOR_TABLE_SIZE)
+
+
+def get_colors(n):
+    """Colors of n authors, evenly picked from the RdYlBu color table.
+    Args:
+        n (int): Number of authors.
+    Returns:
+        list: Colors as "rgb(r, g, b)" strings.
+    """
+    idx = np.minimum(
+        (np.arange(1, n + 1) / n * COLOR_TABLE_SIZE).astype(int), COLOR_TABLE_SIZE - 1
+    )
+    rgb = (RDYLBU[idx] * 255).astype(np.uint8)
+    return ["rgb({}, {}, {})".format(r, g, b) for r, g, b in rgb]
+
+
+# Words left out of the word cloud, on top of wordcloud's own stop words
+EXTRA_STOPWORDS = frozenset(
     [
         "os",
         "tb",
@@ -241,6 +294,15 @@ stopwords.update(
     ]
 )
 
+
+@lru_cache(maxsize=None)
+def get_stopwords():
+    """Stop words of the word cloud. wordcloud is only imported when the first word cloud is drawn."""
+    from wordcloud import STOPWORDS
+
+    return set(STOPWORDS).union(EXTRA_STOPWORDS)
+
+
 GIF_OMITTED_LANG = {"pt": "GIF omitido", "en": "GIF omitted", "fr": "GIF retiré"}
 
 AUDIO_OMITTED_LANG = {"pt": "áudio ocultado", "en": "audio omitted", "fr": "audio omis"}